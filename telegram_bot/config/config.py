@@ -11,9 +11,104 @@ class Config:
     ADMIN_IDS: List[int] = [int(x) for x in os.getenv("ADMIN_IDS", "123456789").split(",")]
     LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
 
+    # Хранилище состояний: "memory" или "redis" (общее для всех реплик, через REDIS_URL)
+    STORAGE_BACKEND: str = os.getenv("STORAGE_BACKEND", "memory")
+    # Через сколько секунд бездействия незавершённый диалог (FSM) удаляется
+    FSM_TTL: int = int(os.getenv("FSM_TTL", str(24 * 60 * 60)))
+
+    # Интервал фоновой очистки просроченных корзин, сек (0 - полагаться только на TTL-индекс)
+    CART_SWEEPER_INTERVAL: int = int(os.getenv("CART_SWEEPER_INTERVAL", "0"))
+    # Изменения корзины одним pipeline-обновлением (MongoDB 4.2+); false - чтение и
+    # условная перезапись по версии, для хранилищ без pipeline-обновлений (mongomock)
+    CART_PIPELINE_UPDATES: bool = os.getenv("CART_PIPELINE_UPDATES", "true").lower() == "true"
+
+    # Кэш каталога в памяти процесса (TTL - страховка на случай пропущенных изменений)
+    PRODUCT_CACHE_SIZE: int = int(os.getenv("PRODUCT_CACHE_SIZE", "5000"))
+    CATALOG_QUERY_CACHE_SIZE: int = int(os.getenv("CATALOG_QUERY_CACHE_SIZE", "1000"))
+    PRODUCT_CACHE_TTL: int = int(os.getenv("PRODUCT_CACHE_TTL", "3600"))
+    # Интервал опроса изменений каталога, если change streams недоступны, сек
+    CATALOG_POLL_INTERVAL: int = int(os.getenv("CATALOG_POLL_INTERVAL", "30"))
+
+    # Сколько клавиатур товаров держать в LRU-кэше
+    KEYBOARD_CACHE_SIZE: int = int(os.getenv("KEYBOARD_CACHE_SIZE", "2048"))
+
+    # Отметки активности пользователей копятся в памяти и пишутся в MongoDB пачкой:
+    # раз в USER_ACTIVITY_FLUSH_INTERVAL сек или при накоплении USER_ACTIVITY_BUFFER_SIZE
+    USER_ACTIVITY_FLUSH_INTERVAL: float = float(os.getenv("USER_ACTIVITY_FLUSH_INTERVAL", "5"))
+    USER_ACTIVITY_BUFFER_SIZE: int = int(os.getenv("USER_ACTIVITY_BUFFER_SIZE", "1000"))
+
+    # Ограничение частоты запросов по группам обработчиков (catalog, cart, orders, default):
+    # "группа=токенов_в_сек/запас" на каждого пользователя и общий на всех пользователей
+    THROTTLE_USER_LIMITS: str = os.getenv("THROTTLE_USER_LIMITS", "catalog=2/5,cart=1/3,orders=1/3,default=3/10")
+    THROTTLE_GLOBAL_LIMITS: str = os.getenv("THROTTLE_GLOBAL_LIMITS", "catalog=200/400,cart=100/200,orders=100/200")
+    # Что делать с запросом сверх лимита: "reply" - короткий ответ на нажатие кнопки, "drop" - молча пропустить
+    THROTTLE_MODE: str = os.getenv("THROTTLE_MODE", "reply")
+
+    # Окно дедупликации обновлений: сколько секунд помнить update_id и id нажатий кнопок,
+    # и сколько записей держать в памяти (при STORAGE_BACKEND=memory)
+    DEDUP_WINDOW: int = int(os.getenv("DEDUP_WINDOW", "600"))
+    DEDUP_MAX_SIZE: int = int(os.getenv("DEDUP_MAX_SIZE", "100000"))
+
+    # Эндпоинт метрик Prometheus (/metrics); 0 - не запускать
+    METRICS_PORT: int = int(os.getenv("METRICS_PORT", "0"))
+    METRICS_HOST: str = os.getenv("METRICS_HOST", "127.0.0.1")
+
+    # Шардирование: число процессов-обработчиков (0 или 1 - всё в одном процессе).
+    # Обновления распределяются по user id, порядок обновлений одного пользователя сохраняется
+    SHARD_WORKERS: int = int(os.getenv("SHARD_WORKERS", "0"))
+    # Ёмкость очереди каждого процесса и число обновлений, обрабатываемых им одновременно
+    SHARD_QUEUE_SIZE: int = int(os.getenv("SHARD_QUEUE_SIZE", "1000"))
+    SHARD_WORKER_CONCURRENCY: int = int(os.getenv("SHARD_WORKER_CONCURRENCY", "100"))
+    # Упавший процесс-обработчик перезапускается; больше SHARD_MAX_RESTARTS падений одного
+    # процесса за SHARD_RESTART_WINDOW секунд - остановка всего бота
+    SHARD_MAX_RESTARTS: int = int(os.getenv("SHARD_MAX_RESTARTS", "5"))
+    SHARD_RESTART_WINDOW: int = int(os.getenv("SHARD_RESTART_WINDOW", "60"))
+
+    # Лимиты исходящих сообщений Telegram: в целом по боту и на один чат (сообщений/сек, запас)
+    OUTBOUND_GLOBAL_RATE: float = float(os.getenv("OUTBOUND_GLOBAL_RATE", "30"))
+    OUTBOUND_CHAT_RATE: float = float(os.getenv("OUTBOUND_CHAT_RATE", "1"))
+    OUTBOUND_CHAT_BURST: float = float(os.getenv("OUTBOUND_CHAT_BURST", "3"))
+    # Сколько раз повторять запрос после RetryAfter
+    OUTBOUND_MAX_RETRIES: int = int(os.getenv("OUTBOUND_MAX_RETRIES", "3"))
+
+    # Рассылки: сколько сообщений отправляется одновременно (темп задаёт очередь исходящих),
+    # через сколько получателей сохранять прогресс и на сколько секунд процесс захватывает рассылку
+    BROADCAST_CONCURRENCY: int = int(os.getenv("BROADCAST_CONCURRENCY", "100"))
+    BROADCAST_CHECKPOINT_EVERY: int = int(os.getenv("BROADCAST_CHECKPOINT_EVERY", "500"))
+    BROADCAST_LEASE: float = float(os.getenv("BROADCAST_LEASE", "60"))
+
+    # Отслеживание заказов: уведомлять покупателей о смене статуса (при нескольких репликах -
+    # только на одной), окно объединения быстрых смен статуса, сек, и интервал опроса изменений
+    # заказов, если change streams недоступны, сек
+    ORDER_NOTIFICATIONS: bool = os.getenv("ORDER_NOTIFICATIONS", "true").lower() == "true"
+    ORDER_STATUS_MERGE_WINDOW: float = float(os.getenv("ORDER_STATUS_MERGE_WINDOW", "10"))
+    ORDER_POLL_INTERVAL: int = int(os.getenv("ORDER_POLL_INTERVAL", "15"))
+    # Сколько историй статусов заказов держать в памяти
+    ORDER_TRACKING_CACHE_SIZE: int = int(os.getenv("ORDER_TRACKING_CACHE_SIZE", "50000"))
+
+    # Кэш заказов для просмотра деталей: сколько заказов держать в памяти, сколько секунд
+    # помнить незавершённый заказ и сколько хранить завершённые в Redis (при STORAGE_BACKEND=redis)
+    ORDER_CACHE_SIZE: int = int(os.getenv("ORDER_CACHE_SIZE", "10000"))
+    ORDER_CACHE_ACTIVE_TTL: float = float(os.getenv("ORDER_CACHE_ACTIVE_TTL", "60"))
+    ORDER_CACHE_REDIS_TTL: int = int(os.getenv("ORDER_CACHE_REDIS_TTL", str(30 * 24 * 60 * 60)))
+
+    # Кэш избранного: сколько пользователей держать в памяти и сколько секунд помнить их избранное
+    # (в памяти и в Redis при STORAGE_BACKEND=redis)
+    FAVORITES_CACHE_SIZE: int = int(os.getenv("FAVORITES_CACHE_SIZE", "10000"))
+    FAVORITES_CACHE_TTL: int = int(os.getenv("FAVORITES_CACHE_TTL", "3600"))
+
+    # Кэш профилей пользователей (язык, уведомления) для middleware профиля
+    USER_PROFILE_CACHE_SIZE: int = int(os.getenv("USER_PROFILE_CACHE_SIZE", "50000"))
+    USER_PROFILE_CACHE_TTL: int = int(os.getenv("USER_PROFILE_CACHE_TTL", "300"))
+
     # Telegram settings
     WEBHOOK_URL: str = os.getenv("WEBHOOK_URL", "")
     WEBHOOK_PATH: str = os.getenv("WEBHOOK_PATH", "/webhook")
+    WEBHOOK_SECRET: str = os.getenv("WEBHOOK_SECRET", "")
+    WEBHOOK_HOST: str = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+    WEBHOOK_PORT: int = int(os.getenv("WEBHOOK_PORT", "8080"))
+    # Отвечать методом API прямо в теле ответа на webhook (без отдельного запроса)
+    WEBHOOK_IN_REQUEST: bool = os.getenv("WEBHOOK_IN_REQUEST", "false").lower() == "true"
 
     # Bot settings
     BOT_USERNAME: str = "ziggler_kz_bot"
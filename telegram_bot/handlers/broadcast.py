@@ -0,0 +1,41 @@
+from aiogram import Bot, Router, F
+from aiogram.filters import Command, CommandObject
+from aiogram.types import Message
+
+from config.config import config
+from services.broadcast_service import BroadcastService, broadcaster, format_campaign_report
+
+router = Router(name="broadcast")
+# Рассылками управляют только администраторы
+router.message.filter(F.from_user.id.in_(config.ADMIN_IDS))
+
+@router.message(Command("broadcast"))
+async def cmd_broadcast(message: Message, bot: Bot):
+    """Запустить рассылку всем пользователям с включёнными уведомлениями"""
+    parts = message.html_text.split(maxsplit=1)
+    if len(parts) < 2:
+        await message.answer(
+            "Использование: <code>/broadcast текст</code>\n"
+            "Текст отправляется с HTML-разметкой пользователям с включёнными уведомлениями."
+        )
+        return
+
+    campaign = await BroadcastService.create_campaign(parts[1], created_by=message.from_user.id)
+    await broadcaster.start(bot, campaign["_id"])
+    await message.answer(
+        f"📣 Рассылка <code>{campaign['_id']}</code> запущена, получателей: {campaign['total']}.\n"
+        f"Прогресс: <code>/broadcast_status {campaign['_id']}</code>"
+    )
+
+@router.message(Command("broadcast_status"))
+async def cmd_broadcast_status(message: Message, command: CommandObject):
+    """Прогресс рассылки: доставлено, заблокировали бота, ошибки"""
+    campaign = await BroadcastService.get_campaign((command.args or "").strip())
+    if not campaign:
+        await message.answer("❌ Рассылка не найдена")
+        return
+    await message.answer(format_campaign_report(campaign))
+
+def register_broadcast_handlers(dp):
+    """Регистрация обработчиков рассылок"""
+    dp.include_router(router)
@@ -1,15 +1,76 @@
 from aiogram import Router, F
-from aiogram.types import Message, CallbackQuery
+from aiogram.types import Message, CallbackQuery, InlineKeyboardButton, InlineKeyboardMarkup
 from aiogram.filters import Command
-from keyboards.main_menu import get_back_to_menu_keyboard
-from services.cart_service import CartService
+from aiogram.utils.keyboard import InlineKeyboardBuilder
+from keyboards.main_menu import copy_keyboard, get_back_to_menu_keyboard
+from services.cart_service import CartService, cart_item_name
 from services.product_service import ProductService
+from typing import Dict, List, Optional
+from utils.templates import get_template, render
 
-router = Router()
+router = Router(name="cart")
+
+# Бесплатная доставка от FREE_DELIVERY_THRESHOLD
+FREE_DELIVERY_THRESHOLD = 100000
+DELIVERY_COST = 5000
+
+def format_cart(cart: dict, products: Dict[str, dict], language: Optional[str] = None) -> str:
+    """Текст корзины по её позициям и актуальным данным товаров (products по id)"""
+    item_template = get_template("cart_item", language)
+    unavailable_text = render("cart_item_unavailable", language)
+
+    out: List[str] = [render("cart_header", language)]
+    for cart_item in cart["items"]:
+        product = products.get(str(cart_item["productId"]))
+        price = cart_item["price"]
+        available = product is not None and product.get("isActive", True)
+
+        item_template.render_to(out, {
+            "name": product["name"] if product else cart_item_name(cart_item),
+            "unavailable": "" if available else unavailable_text,
+            "size": cart_item["size"],
+            "color": cart_item["color"],
+            "quantity": cart_item["quantity"],
+            "price": price,
+            "total": price * cart_item["quantity"]
+        })
+
+    total = cart["totalPrice"]
+    get_template("cart_total", language).render_to(out, {"total": total})
+    if total < FREE_DELIVERY_THRESHOLD:
+        get_template("cart_delivery", language).render_to(out, {"cost": DELIVERY_COST, "to_pay": total + DELIVERY_COST})
+    else:
+        get_template("cart_free_delivery", language).render_to(out, {"threshold": FREE_DELIVERY_THRESHOLD})
+
+    return "".join(out)
+
+async def render_cart(cart: dict, language: Optional[str] = None) -> str:
+    """Текст корзины; актуальные данные товаров подгружаются одним запросом"""
+    products = await ProductService.get_products_by_ids(item["productId"] for item in cart["items"])
+    return format_cart(cart, products, language)
+
+def _build_cart_keyboard() -> InlineKeyboardMarkup:
+    builder = InlineKeyboardBuilder()
+
+    builder.add(
+        InlineKeyboardButton(text="✅ Оформить заказ", callback_data="checkout"),
+        InlineKeyboardButton(text="🗑️ Очистить корзину", callback_data="clear_cart")
+    )
+    builder.add(
+        InlineKeyboardButton(text="⬅️ Продолжить покупки", callback_data="catalog")
+    )
+
+    return builder.as_markup()
+
+CART_KEYBOARD = _build_cart_keyboard()
+
+def get_cart_keyboard() -> InlineKeyboardMarkup:
+    """Клавиатура корзины (копия образца, построенного один раз)"""
+    return copy_keyboard(CART_KEYBOARD)
 
 @router.message(F.text == "🛒 Корзина")
 @router.message(Command("cart"))
-async def cmd_cart(message: Message):
+async def cmd_cart(message: Message, language: Optional[str] = None):
     """Показать корзину пользователя"""
     user_id = message.from_user.id
 
@@ -25,47 +86,11 @@ async def cmd_cart(message: Message):
         await message.answer(text, reply_markup=get_back_to_menu_keyboard())
         return
 
-    # Формируем текст корзины
-    text = "🛒 <b>Ваша корзина</b>\n\n"
-    cart['totalPrice'] = 0
-
-    for cart_item in cart["items"]:
-        product = cart_item["product"]
-        price = product.get("price", 0)
-        item_total = price * cart_item["quantity"]
-        cart['totalPrice'] += item_total
-
-        text += (
-            f"• <b>{product['name']}</b>\n"
-            f"   Размер: {cart_item['size']}, Цвет: {cart_item['color']}\n"
-            f"   Количество: {cart_item['quantity']} × {price:,} ₸ = {item_total:,} ₸\n\n"
-        )
-
-    text += f"💰 <b>Итого: {cart['totalPrice']:,} ₸</b>\n\n"
-
-    if cart['totalPrice'] < 100000:  # Бесплатная доставка от 100к
-        delivery_cost = 5000
-        text += f"🚚 Доставка: {delivery_cost:,} ₸\n"
-        text += f"💰 <b>К оплате: {cart['totalPrice'] + delivery_cost:,} ₸</b>\n\n"
-    else:
-        text += "🚚 Доставка: <b>Бесплатно</b> (от 100,000 ₸)\n\n"
-
-    # Создаем клавиатуру для корзины
-    from aiogram.utils.keyboard import InlineKeyboardBuilder
-    builder = InlineKeyboardBuilder()
-
-    builder.add(
-        InlineKeyboardButton(text="✅ Оформить заказ", callback_data="checkout"),
-        InlineKeyboardButton(text="🗑️ Очистить корзину", callback_data="clear_cart")
-    )
-    builder.add(
-        InlineKeyboardButton(text="⬅️ Продолжить покупки", callback_data="catalog")
-    )
-
-    await message.answer(text, reply_markup=builder.as_markup())
+    text = await render_cart(cart, language)
+    await message.answer(text, reply_markup=get_cart_keyboard())
 
 @router.callback_query(F.data == "cart")
-async def callback_cart(callback: CallbackQuery):
+async def callback_cart(callback: CallbackQuery, language: Optional[str] = None):
     """Показать корзину через callback"""
     user_id = callback.from_user.id
 
@@ -81,42 +106,8 @@ async def callback_cart(callback: CallbackQuery):
         await callback.answer()
         return
 
-    # Формируем текст корзины (аналогично cmd_cart)
-    text = "🛒 <b>Ваша корзина</b>\n\n"
-
-    for cart_item in cart["items"]:
-        product = cart_item["product"]
-        price = product.get("price", 0)
-        item_total = price * cart_item["quantity"]
-
-        text += (
-            f"• <b>{product['name']}</b>\n"
-            f"   Размер: {cart_item['size']}, Цвет: {cart_item['color']}\n"
-            f"   Количество: {cart_item['quantity']} × {price:,} ₸ = {item_total:,} ₸\n\n"
-        )
-
-    text += f"💰 <b>Итого: {cart['totalPrice']:,} ₸</b>\n\n"
-
-    if cart['totalPrice'] < 100000:
-        delivery_cost = 5000
-        text += f"🚚 Доставка: {delivery_cost:,} ₸\n"
-        text += f"💰 <b>К оплате: {cart['totalPrice'] + delivery_cost:,} ₸</b>\n\n"
-    else:
-        text += "🚚 Доставка: <b>Бесплатно</b> (от 100,000 ₸)\n\n"
-
-    from aiogram.types import InlineKeyboardButton
-    from aiogram.utils.keyboard import InlineKeyboardBuilder
-    builder = InlineKeyboardBuilder()
-
-    builder.add(
-        InlineKeyboardButton(text="✅ Оформить заказ", callback_data="checkout"),
-        InlineKeyboardButton(text="🗑️ Очистить корзину", callback_data="clear_cart")
-    )
-    builder.add(
-        InlineKeyboardButton(text="⬅️ Продолжить покупки", callback_data="catalog")
-    )
-
-    await callback.message.edit_text(text, reply_markup=builder.as_markup())
+    text = await render_cart(cart, language)
+    await callback.message.edit_text(text, reply_markup=get_cart_keyboard())
     await callback.answer()
 
 @router.callback_query(F.data == "clear_cart")
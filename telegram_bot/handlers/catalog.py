@@ -1,12 +1,15 @@
 from aiogram import Router, F
-from aiogram.types import CallbackQuery, Message
+from aiogram.types import CallbackQuery, Message, InlineKeyboardButton, InlineKeyboardMarkup
 from aiogram.filters import Command
+from bson import ObjectId
 from keyboards.main_menu import get_categories_keyboard, get_back_to_menu_keyboard, get_product_actions_keyboard
 from services.product_service import ProductService
 from services.cart_service import CartService
-from typing import List, Dict, Any
+from services.favorites_service import FavoritesService
+from typing import List, Dict, Any, Optional
+from utils.templates import get_template, render
 
-router = Router()
+router = Router(name="catalog")
 
 @router.message(F.text == "📦 Каталог")
 @router.message(Command("catalog"))
@@ -30,27 +33,42 @@ async def callback_catalog(callback: CallbackQuery):
     await callback.message.edit_text(text, reply_markup=get_categories_keyboard())
     await callback.answer()
 
+# Коды категорий из callback_data -> названия категорий в MongoDB
+CATEGORY_NAMES = {
+    "classic": "Классические костюмы",
+    "slim": "Slim Fit костюмы",
+    "casual": "Casual костюмы",
+    "festive": "Праздничные костюмы",
+    "sales": "Акции"
+}
+
 @router.callback_query(F.data.startswith("category_"))
-async def callback_category(callback: CallbackQuery):
+async def callback_category(callback: CallbackQuery, language: Optional[str] = None):
     """Показать товары категории"""
     category_code = callback.data.replace("category_", "")
-
-    # Маппинг кодов категорий на ID (пока захардкожено, позже из БД)
-    category_map = {
-        "classic": 1,
-        "slim": 2,
-        "casual": 3,
-        "festive": 4,
-        "sales": 5
-    }
-
-    category_id = category_map.get(category_code)
-    if not category_id:
+    await show_category_page(callback, category_code, language=language)
+
+@router.callback_query(F.data.startswith("catpage_"))
+async def callback_category_page(callback: CallbackQuery, language: Optional[str] = None):
+    """Следующий товар категории (keyset-пагинация по токену продолжения)"""
+    category_code, _, cursor = callback.data.replace("catpage_", "").partition("_")
+    await show_category_page(callback, category_code, cursor or None, language)
+
+async def show_category_page(
+    callback: CallbackQuery, category_code: str, cursor: Optional[str] = None, language: Optional[str] = None
+):
+    """Показать товар категории, начиная с позиции cursor"""
+    category_name = CATEGORY_NAMES.get(category_code)
+    if not category_name:
         await callback.answer("Категория не найдена")
         return
 
-    # Получаем товары категории
-    result = await ProductService.get_all_products(category=category_name, limit=10)
+    # Получаем товары категории (по одному товару на экран)
+    try:
+        result = await ProductService.get_all_products(category=category_name, limit=1, cursor=cursor)
+    except ValueError:
+        await callback.answer("Список товаров устарел, откройте категорию заново")
+        return
     products = result["products"]
 
     if not products:
@@ -59,61 +77,55 @@ async def callback_category(callback: CallbackQuery):
         await callback.answer()
         return
 
-    # Показываем первый товар
     product = products[0]
-    text = format_product_card(product)
-
-    # Получаем доступные размеры и цвета
-    sizes, colors = get_product_variants(product)
-
-    # Добавляем информацию о вариантах
-    if sizes:
-        text += f"\n📏 <b>Размеры:</b> {' '.join(sizes)}"
-    if colors:
-        text += f"\n🎨 <b>Цвета:</b> {' '.join([c['emoji'] for c in colors])}"
-
-    # Сохраняем информацию о товарах в состоянии для навигации
-    # TODO: Добавить state management для навигации между товарами
-
-    await callback.message.edit_text(
-        text,
-        reply_markup=get_product_actions_keyboard(product.id)
-    )
+    text = format_product_card(product, language, with_variants=True)
+
+    # Состояние избранного берётся из кэша, без запроса к БД на каждую карточку
+    in_favorites = await FavoritesService.is_favorite(callback.from_user.id, str(product["_id"]))
+    keyboard = get_product_actions_keyboard(str(product["_id"]), in_favorites)
+    if result["has_more"]:
+        keyboard = InlineKeyboardMarkup(inline_keyboard=[
+            [InlineKeyboardButton(
+                text="➡️ Следующий товар",
+                callback_data=f"catpage_{category_code}_{result['next_cursor']}"
+            )],
+            *keyboard.inline_keyboard
+        ])
+
+    await callback.message.edit_text(text, reply_markup=keyboard)
     await callback.answer()
 
-def format_product_card(product: dict) -> str:
-    """Форматирование карточки товара"""
-    price_text = f"{product['price']:,} ₸"
-
-    # MongoDB doesn't have discount_price field in our current schema
-    price_text = f"💰 {price_text}"
+def format_product_card(product: dict, language: Optional[str] = None, with_variants: bool = False) -> str:
+    """Форматирование карточки товара (с доступными размерами и цветами, если with_variants)"""
+    out: List[str] = []
 
+    rating = product.get('rating', 0)
     rating_text = ""
-    if product.get('rating', 0) > 0:
-        stars = "⭐" * int(product['rating'])
-        rating_text = f"⭐ {product['rating']:.1f}/5 ({product.get('reviewCount', 0)} отзывов)"
-
-    text = f"""
-<b>{product['name']}</b>
-
-{rating_text}
-
-{price_text}
-
-📝 <b>Описание:</b>
-{product.get('description', 'Описание товара отсутствует')}
-
-⚡ <b>Характеристики:</b>
-"""
+    if rating > 0:
+        rating_text = render("product_rating", language, rating=rating, reviews=product.get('reviewCount', 0))
 
     # Add material info if available
     materials = product.get('materials', [])
+    materials_text = ""
     if materials:
-        text += f"• Материалы: {', '.join(materials)}\n"
+        materials_text = render("product_materials", language, materials=", ".join(materials))
 
-    text += "• Страна: Выполнено в Корее\n• Рекомендация: Брать на размер больше"
+    get_template("product_card", language).render_to(out, {
+        "name": product['name'],
+        "rating": rating_text,
+        "price": product['price'],
+        "description": product.get('description') or render("product_no_description", language),
+        "materials": materials_text
+    })
 
-    return text.strip()
+    if with_variants:
+        sizes, colors = get_product_variants(product)
+        if sizes:
+            get_template("product_sizes", language).render_to(out, {"sizes": " ".join(sizes)})
+        if colors:
+            get_template("product_colors", language).render_to(out, {"colors": " ".join(c['emoji'] for c in colors)})
+
+    return "".join(out)
 
 def get_product_variants(product: dict) -> tuple[List[str], List[Dict[str, Any]]]:
     """Получить доступные размеры и цвета товара из MongoDB документа"""
@@ -168,10 +180,27 @@ async def callback_add_to_cart(callback: CallbackQuery):
 @router.callback_query(F.data.startswith("favorite_"))
 async def callback_toggle_favorite(callback: CallbackQuery):
     """Добавить/убрать из избранного"""
-    product_id = int(callback.data.replace("favorite_", ""))
+    product_id = callback.data.replace("favorite_", "")
+    if not ObjectId.is_valid(product_id):
+        await callback.answer("Товар не найден")
+        return
 
-    # TODO: Реализовать логику избранного
-    await callback.answer("❤️ Добавлено в избранное!", show_alert=True)
+    in_favorites = await FavoritesService.toggle_favorite(callback.from_user.id, product_id)
+
+    # Кнопка на карточке товара меняется вместе с состоянием
+    markup = callback.message.reply_markup
+    if markup and any(button.callback_data == callback.data for row in markup.inline_keyboard for button in row):
+        heart_text = "💔 Убрать из избранного" if in_favorites else "❤️ В избранное"
+        markup = InlineKeyboardMarkup(inline_keyboard=[
+            [
+                button.model_copy(update={"text": heart_text}) if button.callback_data == callback.data else button
+                for button in row
+            ]
+            for row in markup.inline_keyboard
+        ])
+        await callback.message.edit_reply_markup(reply_markup=markup)
+
+    await callback.answer("❤️ Добавлено в избранное!" if in_favorites else "💔 Удалено из избранного")
 
 def register_catalog_handlers(dp):
     """Регистрация обработчиков каталога"""
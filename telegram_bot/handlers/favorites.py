@@ -1,30 +1,88 @@
 from aiogram import Router, F
-from aiogram.types import Message, CallbackQuery
+from aiogram.types import Message, CallbackQuery, InlineKeyboardButton, InlineKeyboardMarkup
 from aiogram.filters import Command
-from keyboards.main_menu import get_back_to_menu_keyboard
-from models.database import Favorite, Product, get_session
-from sqlalchemy import select
+from aiogram.utils.keyboard import InlineKeyboardBuilder
+from bson import ObjectId
+from keyboards.main_menu import get_back_to_menu_keyboard, get_product_actions_keyboard
+from services.cart_service import CartService
+from services.favorites_service import FavoritesService
+from services.product_service import ProductService
+from typing import List, Optional, Tuple
+from utils.templates import get_template, render
+
+router = Router(name="favorites")
+
+# Сколько товаров показывать на одной странице избранного: по три кнопки на товар,
+# так что клавиатура и текст остаются в пределах лимитов Telegram
+FAVORITES_PAGE_SIZE = 10
+
+def format_favorites(
+    products: List[dict], language: Optional[str] = None, total: Optional[int] = None, start: int = 1
+) -> str:
+    """Текст страницы избранного; start - номер первого товара страницы.
+
+    Названия товаров экранируются шаблоном.
+    """
+    item_template = get_template("favorites_item", language)
+    rating_template = get_template("favorites_item_rating", language)
+
+    out: List[str] = [render("favorites_header", language, count=len(products) if total is None else total)]
+    for i, product in enumerate(products, start):
+        item_template.render_to(out, {"index": i, "name": product["name"], "price": product["price"]})
+        if product.get("rating"):
+            rating_template.render_to(out, {"rating": product["rating"], "reviews": product.get("reviewCount", 0)})
+        out.append("\n")
+    return "".join(out)
+
+def get_favorites_keyboard(products: List[dict], start: int = 1, total: Optional[int] = None) -> InlineKeyboardMarkup:
+    """Клавиатура страницы избранного: просмотр, в корзину и удаление для каждого товара"""
+    builder = InlineKeyboardBuilder()
 
-router = Router()
+    for i, product in enumerate(products, start):
+        product_id = str(product["_id"])
+        builder.add(
+            InlineKeyboardButton(text=f"👀 Посмотреть #{i}", callback_data=f"view_fav_{product_id}"),
+            InlineKeyboardButton(text=f"🛒 В корзину #{i}", callback_data=f"add_fav_to_cart_{product_id}")
+        )
+        builder.add(
+            InlineKeyboardButton(text=f"💔 Удалить #{i}", callback_data=f"remove_fav_{product_id}_{start}")
+        )
+
+    # Переход между страницами, если избранное не помещается в одну
+    navigation = []
+    if start > 1:
+        navigation.append(InlineKeyboardButton(
+            text="◀️ Назад", callback_data=f"favorites_page_{max(start - FAVORITES_PAGE_SIZE, 1)}"
+        ))
+    if total is not None and start - 1 + len(products) < total:
+        navigation.append(InlineKeyboardButton(
+            text="Далее ▶️", callback_data=f"favorites_page_{start + len(products)}"
+        ))
+    builder.add(*navigation)
+    builder.add(
+        InlineKeyboardButton(text="⬅️ Главное меню", callback_data="main_menu")
+    )
+
+    builder.adjust(*[2, 1] * len(products), *([len(navigation)] if navigation else []), 1)
+    return builder.as_markup()
+
+def _parse_product_id(data: str, prefix: str) -> Optional[str]:
+    product_id = data.replace(prefix, "").partition("_")[0]
+    return product_id if ObjectId.is_valid(product_id) else None
+
+def _favorites_page(products: List[dict], start: int) -> Tuple[List[dict], int]:
+    """Товары страницы, начинающейся с позиции start (за концом списка - последняя страница)"""
+    if start > len(products):
+        start = max(len(products) - FAVORITES_PAGE_SIZE, 0) + 1
+    return products[start - 1:start - 1 + FAVORITES_PAGE_SIZE], start
 
 @router.message(F.text == "❤️ Избранное")
 @router.message(Command("favorites"))
-async def cmd_favorites(message: Message):
+async def cmd_favorites(message: Message, language: Optional[str] = None):
     """Показать избранные товары"""
-    user_id = message.from_user.id
-
-    async with get_session() as session:
-        result = await session.execute(
-            select(Favorite, Product).join(
-                Product, Favorite.product_id == Product.id
-            ).where(
-                Favorite.user_id == user_id,
-                Product.is_active == True
-            ).order_by(Favorite.added_at.desc())
-        )
-        favorites = result.all()
+    products = await FavoritesService.get_favorite_products(message.from_user.id)
 
-    if not favorites:
+    if not products:
         text = (
             "❤️ <b>Избранное пусто</b>\n\n"
             "Добавляйте товары в избранное, нажимая ❤️ на карточке товара.\n\n"
@@ -33,70 +91,31 @@ async def cmd_favorites(message: Message):
         await message.answer(text, reply_markup=get_back_to_menu_keyboard())
         return
 
-    text = f"❤️ <b>Избранное ({len(favorites)} товаров)</b>\n\n"
-
-    from aiogram.utils.keyboard import InlineKeyboardBuilder
-    from aiogram.types import InlineKeyboardButton
-
-    builder = InlineKeyboardBuilder()
-
-    for i, (favorite, product) in enumerate(favorites, 1):
-        price = product.discount_price or product.price
-        price_text = f"{price:,} ₸"
-
-        if product.discount_price and product.discount_price < product.price:
-            discount_percent = int((1 - product.discount_price / product.price) * 100)
-            price_text += f" (-{discount_percent}%)"
-
-        text += (
-            f"{i}. <b>{product.name}</b>\n"
-            f"   💰 {price_text}\n"
-            f"   ⭐ {product.rating:.1f}/5 ({product.review_count} отзывов)\n\n"
-        )
-
-        # Добавляем кнопки для каждого товара
-        builder.add(
-            InlineKeyboardButton(
-                text=f"👀 Посмотреть #{i}",
-                callback_data=f"view_fav_{product.id}"
-            ),
-            InlineKeyboardButton(
-                text=f"🛒 В корзину #{i}",
-                callback_data=f"add_fav_to_cart_{product.id}"
-            )
-        )
-        builder.add(
-            InlineKeyboardButton(
-                text=f"💔 Удалить #{i}",
-                callback_data=f"remove_fav_{product.id}"
-            )
-        )
-
-    builder.add(
-        InlineKeyboardButton(text="⬅️ Главное меню", callback_data="main_menu")
+    page, start = _favorites_page(products, 1)
+    await message.answer(
+        format_favorites(page, language, total=len(products)),
+        reply_markup=get_favorites_keyboard(page, start, len(products))
     )
 
-    builder.adjust(2, 1)  # 2 кнопки в первом ряду, 1 во втором
-
-    await message.answer(text, reply_markup=builder.as_markup())
-
 @router.callback_query(F.data == "favorites")
-async def callback_favorites(callback: CallbackQuery):
+async def callback_favorites(callback: CallbackQuery, language: Optional[str] = None):
     """Показать избранное через callback"""
-    user_id = callback.from_user.id
-
-    async with get_session() as session:
-        result = await session.execute(
-            select(Favorite, Product).join(
-                Product, Favorite.product_id == Product.id
-            ).where(
-                Favorite.user_id == user_id,
-                Product.is_active == True
-            ).order_by(Favorite.added_at.desc())
-        )
-        favorites = result.all()
+    await show_favorites_page(callback, language=language)
+
+@router.callback_query(F.data.startswith("favorites_page_"))
+async def callback_favorites_page(callback: CallbackQuery, language: Optional[str] = None):
+    """Другая страница избранного"""
+    start = callback.data.replace("favorites_page_", "")
+    if not start.isdigit() or int(start) < 1:
+        await callback.answer("Список устарел, откройте избранное заново")
+        return
+    await show_favorites_page(callback, int(start), language)
+
+async def show_favorites_page(callback: CallbackQuery, start: int = 1, language: Optional[str] = None):
+    """Показать страницу избранного, начиная с товара номер start"""
+    products = await FavoritesService.get_favorite_products(callback.from_user.id)
 
-    if not favorites:
+    if not products:
         text = (
             "❤️ <b>Избранное пусто</b>\n\n"
             "Добавляйте товары в избранное, нажимая ❤️ на карточке товара."
@@ -105,94 +124,67 @@ async def callback_favorites(callback: CallbackQuery):
         await callback.answer()
         return
 
-    text = f"❤️ <b>Избранное ({len(favorites)} товаров)</b>\n\n"
-
-    from aiogram.utils.keyboard import InlineKeyboardBuilder
-    from aiogram.types import InlineKeyboardButton
-
-    builder = InlineKeyboardBuilder()
-
-    for i, (favorite, product) in enumerate(favorites, 1):
-        price = product.discount_price or product.price
-        price_text = f"{price:,} ₸"
-
-        if product.discount_price and product.discount_price < product.price:
-            discount_percent = int((1 - product.discount_price / product.price) * 100)
-            price_text += f" (-{discount_percent}%)"
-
-        text += (
-            f"{i}. <b>{product.name}</b>\n"
-            f"   💰 {price_text}\n"
-            f"   ⭐ {product.rating:.1f}/5 ({product.review_count} отзывов)\n\n"
-        )
-
-        builder.add(
-            InlineKeyboardButton(text=f"👀 Посмотреть #{i}", callback_data=f"view_fav_{product.id}"),
-            InlineKeyboardButton(text=f"🛒 В корзину #{i}", callback_data=f"add_fav_to_cart_{product.id}")
-        )
-        builder.add(
-            InlineKeyboardButton(text=f"💔 Удалить #{i}", callback_data=f"remove_fav_{product.id}")
-        )
-
-    builder.add(
-        InlineKeyboardButton(text="⬅️ Главное меню", callback_data="main_menu")
+    page, start = _favorites_page(products, start)
+    await callback.message.edit_text(
+        format_favorites(page, language, total=len(products), start=start),
+        reply_markup=get_favorites_keyboard(page, start, len(products))
     )
-
-    builder.adjust(2, 1)
-
-    await callback.message.edit_text(text, reply_markup=builder.as_markup())
     await callback.answer()
 
 @router.callback_query(F.data.startswith("remove_fav_"))
-async def callback_remove_favorite(callback: CallbackQuery):
+async def callback_remove_favorite(callback: CallbackQuery, language: Optional[str] = None):
     """Удалить товар из избранного"""
-    product_id = int(callback.data.replace("remove_fav_", ""))
-    user_id = callback.from_user.id
-
-    async with get_session() as session:
-        await session.execute(
-            select(Favorite).where(
-                Favorite.user_id == user_id,
-                Favorite.product_id == product_id
-            ).delete()
-        )
-        await session.commit()
+    product_id = _parse_product_id(callback.data, "remove_fav_")
+    if product_id is None:
+        await callback.answer("Товар не найден")
+        return
 
-    await callback.answer("💔 Удалено из избранного")
+    await FavoritesService.remove_favorite(callback.from_user.id, product_id)
 
-    # Обновляем сообщение
-    await callback_favorites(callback)
+    # Обновляем ту же страницу (ответ на нажатие отправит show_favorites_page);
+    # у кнопок старых сообщений страницы нет - показываем первую
+    start = callback.data.replace(f"remove_fav_{product_id}", "").lstrip("_")
+    await show_favorites_page(callback, int(start) if start.isdigit() and int(start) > 0 else 1, language)
 
-@router.callback_query(F.data.startswith("view_fav_"))
-async def callback_view_favorite(callback: CallbackQuery):
-    """Показать товар из избранного"""
-    product_id = int(callback.data.replace("view_fav_", ""))
+@router.callback_query(F.data.startswith("add_fav_to_cart_"))
+async def callback_add_favorite_to_cart(callback: CallbackQuery):
+    """Добавить товар из избранного в корзину"""
+    product_id = _parse_product_id(callback.data, "add_fav_to_cart_")
+    if product_id is None:
+        await callback.answer("Товар не найден")
+        return
 
-    async with get_session() as session:
-        result = await session.execute(
-            select(Product).where(Product.id == product_id)
+    try:
+        # Как и из каталога, пока с размером и цветом по умолчанию
+        cart = await CartService.add_to_cart(
+            product_id=product_id,
+            size="M",
+            color="Черный",
+            quantity=1,
+            user_id=callback.from_user.id
         )
-        product = result.scalar_one_or_none()
+    except ValueError:
+        await callback.answer("❌ Товар больше не доступен", show_alert=True)
+        return
+
+    await callback.answer(f"✅ Товар добавлен в корзину! ({cart['totalItems']} товаров)", show_alert=True)
+
+@router.callback_query(F.data.startswith("view_fav_"))
+async def callback_view_favorite(callback: CallbackQuery, language: Optional[str] = None):
+    """Показать товар из избранного"""
+    product_id = _parse_product_id(callback.data, "view_fav_")
+    product = await ProductService.get_product_by_id(product_id) if product_id else None
 
     if not product:
         await callback.answer("Товар не найден")
         return
 
-    # Импортируем функцию форматирования из catalog.py
-    from handlers.catalog import format_product_card, get_product_variants
-    from keyboards.main_menu import get_product_actions_keyboard
-
-    text = format_product_card(product)
-    sizes, colors = await get_product_variants(session, product.id)
-
-    if sizes:
-        text += f"\n📏 <b>Размеры:</b> {' '.join(sizes)}"
-    if colors:
-        text += f"\n🎨 <b>Цвета:</b> {' '.join([c['emoji'] for c in colors])}"
+    from handlers.catalog import format_product_card
 
+    in_favorites = await FavoritesService.is_favorite(callback.from_user.id, product_id)
     await callback.message.edit_text(
-        text,
-        reply_markup=get_product_actions_keyboard(product.id, in_favorites=True)
+        format_product_card(product, language, with_variants=True),
+        reply_markup=get_product_actions_keyboard(product_id, in_favorites)
     )
     await callback.answer()
 
@@ -1,19 +1,103 @@
-from aiogram import Router, F
-from aiogram.types import Message, CallbackQuery
+from aiogram import Bot, Router, F
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import Message, CallbackQuery, InlineKeyboardButton, InlineKeyboardMarkup
 from aiogram.filters import Command
+from aiogram.utils.keyboard import InlineKeyboardBuilder
 from keyboards.main_menu import get_back_to_menu_keyboard
+from services.broadcast_service import BroadcastService
+from services.order_cache import order_snapshots
 from services.order_service import OrderService
+from services.order_tracking import order_tracker
+from services.user_service import UserService
+from typing import List, Optional
+from utils.outbound import Priority
+from utils.templates import get_template, render
+
+router = Router(name="orders")
+
+# Сколько заказов показывать на одной странице истории
+ORDERS_PAGE_SIZE = 10
+
+def format_orders_list(orders: List[dict], language: Optional[str] = None, total: Optional[int] = None, start: int = 1) -> str:
+    """Текст страницы списка заказов; start - номер первого заказа страницы"""
+    item_template = get_template("order_list_item", language)
+
+    out: List[str] = [render("orders_header", language, count=len(orders) if total is None else total)]
+    for i, order in enumerate(orders, start):
+        item_template.render_to(out, {
+            "index": i,
+            "number": order["orderNumber"],
+            "date": order["createdAt"].strftime('%d.%m.%Y %H:%M'),
+            "emoji": get_status_emoji(order["orderStatus"]),
+            "status": get_status_text(order["orderStatus"], language),
+            "total": order["total"]
+        })
+
+    return "".join(out)
+
+def format_order_details(order: dict, language: Optional[str] = None) -> str:
+    """Текст с деталями заказа и его товарами"""
+    customer_info = order.get("customerInfo") or {}
+    email = customer_info.get("email")
+    notes = order.get("notes")
+
+    out: List[str] = []
+    get_template("order_details", language).render_to(out, {
+        "number": order["orderNumber"],
+        "date": order["createdAt"].strftime('%d.%m.%Y %H:%M'),
+        "emoji": get_status_emoji(order["orderStatus"]),
+        "status": get_status_text(order["orderStatus"], language),
+        "total": order["total"],
+        "address": (order.get("shippingAddress") or {}).get("street", ""),
+        "phone": customer_info.get("phone", ""),
+        "email": render("order_email", language, email=email) if email else "",
+        "notes": render("order_notes", language, notes=notes) if notes else ""
+    })
 
-router = Router()
+    # Товары уже встроены в заказ
+    item_template = get_template("order_item", language)
+    for item in order["items"]:
+        item_template.render_to(out, {
+            "name": item["product"]["name"],
+            "size": item["size"],
+            "color": item["color"],
+            "quantity": item["quantity"],
+            "price": item["price"]
+        })
+
+    return "".join(out)
+
+def get_orders_keyboard(orders: List[dict], start: int = 1, next_cursor: Optional[str] = None) -> InlineKeyboardMarkup:
+    """Клавиатура страницы списка заказов (с переходом к более старым, если они есть)"""
+    builder = InlineKeyboardBuilder()
+
+    for i, order in enumerate(orders, start):
+        builder.add(
+            InlineKeyboardButton(text=f"📋 Детали #{i}", callback_data=f"order_details_{order['orderNumber']}"),
+            InlineKeyboardButton(text=f"🚚 Отследить #{i}", callback_data=f"track_order_{order['orderNumber']}")
+        )
+
+    if next_cursor:
+        builder.add(InlineKeyboardButton(
+            text="⏪ Более старые заказы",
+            callback_data=f"orders_page_{start + len(orders)}_{next_cursor}"
+        ))
+    builder.add(
+        InlineKeyboardButton(text="⬅️ Главное меню", callback_data="main_menu")
+    )
+
+    builder.adjust(*[2] * len(orders), 1)
+    return builder.as_markup()
 
 @router.message(F.text == "📋 Заказы")
 @router.message(Command("orders"))
-async def cmd_orders(message: Message):
+async def cmd_orders(message: Message, language: Optional[str] = None):
     """Показать заказы пользователя"""
     user_id = message.from_user.id
 
-    # Получаем заказы пользователя
-    orders = await OrderService.getUserOrders(user_id)
+    # Первая страница заказов (только поля для списка)
+    page = await OrderService.get_user_orders(user_id, limit=ORDERS_PAGE_SIZE, with_total=True)
+    orders = page["orders"]
 
     if not orders:
         text = (
@@ -24,50 +108,37 @@ async def cmd_orders(message: Message):
         await message.answer(text, reply_markup=get_back_to_menu_keyboard())
         return
 
-    text = f"📋 <b>Мои заказы ({len(orders)})</b>\n\n"
-
-    from aiogram.utils.keyboard import InlineKeyboardBuilder
-    from aiogram.types import InlineKeyboardButton
-
-    builder = InlineKeyboardBuilder()
-
-    for i, order in enumerate(orders, 1):
-        status_emoji = get_status_emoji(order.status)
-        status_text = get_status_text(order.status)
-
-        text += (
-            f"{i}. <b>Заказ #{order.id}</b>\n"
-            f"   📅 {order.created_at.strftime('%d.%m.%Y %H:%M')}\n"
-            f"   {status_emoji} {status_text}\n"
-            f"   💰 {order.total_price:,} ₸\n\n"
-        )
-
-        builder.add(
-            InlineKeyboardButton(
-                text=f"📋 Детали #{i}",
-                callback_data=f"order_details_{order.id}"
-            ),
-            InlineKeyboardButton(
-                text=f"🚚 Отследить #{i}",
-                callback_data=f"track_order_{order.id}"
-            )
-        )
-
-    builder.add(
-        InlineKeyboardButton(text="⬅️ Главное меню", callback_data="main_menu")
+    await message.answer(
+        format_orders_list(orders, language, total=page["total"]),
+        reply_markup=get_orders_keyboard(orders, next_cursor=page["next_cursor"])
     )
 
-    builder.adjust(2, 1)
-
-    await message.answer(text, reply_markup=builder.as_markup())
-
 @router.callback_query(F.data == "orders")
-async def callback_orders(callback: CallbackQuery):
+async def callback_orders(callback: CallbackQuery, language: Optional[str] = None):
     """Показать заказы через callback"""
+    await show_orders_page(callback, language=language)
+
+@router.callback_query(F.data.startswith("orders_page_"))
+async def callback_orders_page(callback: CallbackQuery, language: Optional[str] = None):
+    """Более старые заказы (keyset-пагинация по токену продолжения)"""
+    start, _, cursor = callback.data.replace("orders_page_", "").partition("_")
+    if not start.isdigit():
+        await callback.answer("Список заказов устарел, откройте его заново")
+        return
+    await show_orders_page(callback, cursor or None, int(start), language)
+
+async def show_orders_page(
+    callback: CallbackQuery, cursor: Optional[str] = None, start: int = 1, language: Optional[str] = None
+):
+    """Показать страницу заказов, начиная с позиции cursor"""
     user_id = callback.from_user.id
 
-    # Получаем заказы пользователя
-    orders = await OrderService.getUserOrders(user_id)
+    try:
+        page = await OrderService.get_user_orders(user_id, limit=ORDERS_PAGE_SIZE, cursor=cursor, with_total=True)
+    except ValueError:
+        await callback.answer("Список заказов устарел, откройте его заново")
+        return
+    orders = page["orders"]
 
     if not orders:
         text = (
@@ -78,84 +149,27 @@ async def callback_orders(callback: CallbackQuery):
         await callback.answer()
         return
 
-    text = f"📋 <b>Мои заказы ({len(orders)})</b>\n\n"
-
-    from aiogram.utils.keyboard import InlineKeyboardBuilder
-    from aiogram.types import InlineKeyboardButton
-
-    builder = InlineKeyboardBuilder()
-
-    for i, order in enumerate(orders, 1):
-        status_emoji = get_status_emoji(order.status)
-        status_text = get_status_text(order.status)
-
-        text += (
-            f"{i}. <b>Заказ #{order.id}</b>\n"
-            f"   📅 {order.created_at.strftime('%d.%m.%Y %H:%M')}\n"
-            f"   {status_emoji} {status_text}\n"
-            f"   💰 {order.total_price:,} ₸\n\n"
-        )
-
-        builder.add(
-            InlineKeyboardButton(text=f"📋 Детали #{i}", callback_data=f"order_details_{order.id}"),
-            InlineKeyboardButton(text=f"🚚 Отследить #{i}", callback_data=f"track_order_{order.id}")
-        )
-
-    builder.add(
-        InlineKeyboardButton(text="⬅️ Главное меню", callback_data="main_menu")
+    await callback.message.edit_text(
+        format_orders_list(orders, language, total=page["total"], start=start),
+        reply_markup=get_orders_keyboard(orders, start, page["next_cursor"])
     )
-
-    builder.adjust(2, 1)
-
-    await callback.message.edit_text(text, reply_markup=builder.as_markup())
     await callback.answer()
 
 @router.callback_query(F.data.startswith("order_details_"))
-async def callback_order_details(callback: CallbackQuery):
+async def callback_order_details(callback: CallbackQuery, language: Optional[str] = None):
     """Показать детали заказа"""
     order_id = callback.data.replace("order_details_", "")
     user_id = callback.from_user.id
 
     # Получаем заказ
-    order = await OrderService.getOrderById(order_id, user_id)
+    order = await OrderService.get_order_by_id(order_id, user_id)
 
     if not order:
         await callback.answer("Заказ не найден")
         return
+    # Заказ уже прочитан - история для кнопки отслеживания берётся из него
+    order_tracker.apply_status(order)
 
-    # Товары уже встроены в заказ
-    items = order["items"]
-
-    status_emoji = get_status_emoji(order["orderStatus"])
-    status_text = get_status_text(order["orderStatus"])
-
-    text = (
-        f"📋 <b>Заказ #{order['orderNumber']}</b>\n\n"
-        f"📅 Дата: {order['createdAt'].strftime('%d.%m.%Y %H:%M')}\n"
-        f"{status_emoji} Статус: {status_text}\n"
-        f"💰 Сумма: {order['total']:,} ₸\n"
-        f"📍 Адрес: {order['shippingAddress']['street']}\n"
-        f"📱 Телефон: {order['customerInfo']['phone']}\n"
-    )
-
-    if order['customerInfo']['email']:
-        text += f"📧 Email: {order['customerInfo']['email']}\n"
-
-    if order['notes']:
-        text += f"📝 Примечание: {order['notes']}\n"
-
-    text += "\n<b>Товары:</b>\n"
-
-    for item in items:
-        product = item["product"]
-        text += (
-            f"• {product['name']}\n"
-            f"   Размер: {item['size']}, Цвет: {item['color']}\n"
-            f"   Количество: {item['quantity']} × {item['price']:,} ₸\n\n"
-        )
-
-    from aiogram.types import InlineKeyboardButton
-    from aiogram.utils.keyboard import InlineKeyboardBuilder
     builder = InlineKeyboardBuilder()
 
     builder.add(
@@ -163,63 +177,120 @@ async def callback_order_details(callback: CallbackQuery):
         InlineKeyboardButton(text="⬅️ Назад к заказам", callback_data="orders")
     )
 
-    await callback.message.edit_text(text, reply_markup=builder.as_markup())
+    await callback.message.edit_text(await get_order_details_text(order, language), reply_markup=builder.as_markup())
     await callback.answer()
 
+async def get_order_details_text(order: dict, language: Optional[str] = None) -> str:
+    """Текст деталей заказа; для закэшированного заказа отрисовывается один раз"""
+    text_key = language or "ru"
+    text = await order_snapshots.get_text(order, text_key)
+    if text is not None:
+        return text
+
+    text = format_order_details(order, language)
+    await order_snapshots.set_text(order, text_key, text)
+    return text
+
 @router.callback_query(F.data.startswith("track_order_"))
-async def callback_track_order(callback: CallbackQuery):
-    """Отследить заказ"""
-    order_id = int(callback.data.replace("track_order_", ""))
-
-    # TODO: Интеграция с системой отслеживания доставки
-    # Пока показываем статический статус
-
-    text = (
-        f"🚚 <b>Отслеживание заказа #{order_id}</b>\n\n"
-        f"📍 <b>Текущий статус:</b> Готовится к отправке\n\n"
-        f"📦 <b>История:</b>\n"
-        f"✅ Заказ подтверждён - {callback.message.date.strftime('%d.%m.%Y %H:%M')}\n"
-        f"⏳ Готовится к отправке - Ожидается\n"
-        f"🚚 В пути - Ожидается\n"
-        f"📬 Доставлен - Ожидается\n\n"
-        f"<i>Статус обновляется автоматически</i>"
-    )
+async def callback_track_order(callback: CallbackQuery, language: Optional[str] = None):
+    """Отследить заказ: история статусов из кэша, без чтения заказа"""
+    order_number = callback.data.replace("track_order_", "")
+
+    history = await order_tracker.get_history(order_number, callback.from_user.id)
+    if history is None:
+        await callback.answer("Заказ не найден")
+        return
 
-    from aiogram.types import InlineKeyboardButton
-    from aiogram.utils.keyboard import InlineKeyboardBuilder
     builder = InlineKeyboardBuilder()
 
     builder.add(
-        InlineKeyboardButton(text="📋 Детали заказа", callback_data=f"order_details_{order_id}"),
+        InlineKeyboardButton(text="📋 Детали заказа", callback_data=f"order_details_{order_number}"),
         InlineKeyboardButton(text="⬅️ Назад к заказам", callback_data="orders")
     )
 
-    await callback.message.edit_text(text, reply_markup=builder.as_markup())
+    try:
+        await callback.message.edit_text(
+            format_order_tracking(order_number, history["statuses"], language), reply_markup=builder.as_markup()
+        )
+    except TelegramBadRequest:
+        # Статус не изменился с прошлого нажатия - сообщение уже актуально
+        pass
     await callback.answer()
 
+def format_order_tracking(order_number: str, statuses: List[tuple], language: Optional[str] = None) -> str:
+    """Текст отслеживания: пройденные статусы и ожидаемые этапы"""
+    current = statuses[-1][0]
+
+    out: List[str] = [render(
+        "order_tracking", language,
+        number=order_number,
+        emoji=get_status_emoji(current),
+        status=get_status_text(current, language)
+    )]
+    step_template = get_template("order_tracking_step", language)
+    for status, changed_at in statuses:
+        step_template.render_to(out, {
+            "status": get_status_text(status, language),
+            "date": changed_at.strftime('%d.%m.%Y %H:%M') if changed_at else ""
+        })
+
+    current = _STATUS_ALIASES.get(current, current)
+    if current in _STATUS_FLOW:
+        expected_template = get_template("order_tracking_expected", language)
+        for status in _STATUS_FLOW[_STATUS_FLOW.index(current) + 1:]:
+            expected_template.render_to(out, {"status": get_status_text(status, language)})
+
+    out.append(render("order_tracking_footer", language))
+    return "".join(out)
+
+async def notify_order_status(bot: Bot, user_id: int, order_number: str, status: str) -> None:
+    """Сообщить покупателю о новом статусе заказа (если уведомления включены)"""
+    user = await UserService.get_user_profile(user_id)
+    if user is not None and not user.get("notificationsEnabled", True):
+        return
+    language = (user or {}).get("language")
+
+    builder = InlineKeyboardBuilder()
+    builder.add(InlineKeyboardButton(text="🚚 Отследить заказ", callback_data=f"track_order_{order_number}"))
+
+    text = render(
+        "order_status_update", language,
+        number=order_number,
+        emoji=get_status_emoji(status),
+        status=get_status_text(status, language)
+    )
+    await BroadcastService.deliver(
+        bot, user_id, text, priority=Priority.NOTIFICATION, reply_markup=builder.as_markup()
+    )
+
 def get_status_emoji(status: str) -> str:
     """Получить emoji для статуса заказа"""
     status_emojis = {
         "pending": "⏳",
         "confirmed": "✅",
         "preparing": "📦",
+        "processing": "📦",
         "shipping": "🚚",
+        "shipped": "🚚",
         "delivered": "📬",
-        "cancelled": "❌"
+        "cancelled": "❌",
+        "returned": "↩️"
     }
     return status_emojis.get(status, "❓")
 
-def get_status_text(status: str) -> str:
-    """Получить текстовое описание статуса"""
-    status_texts = {
-        "pending": "Ожидает подтверждения",
-        "confirmed": "Подтверждён",
-        "preparing": "Готовится",
-        "shipping": "В пути",
-        "delivered": "Доставлен",
-        "cancelled": "Отменён"
-    }
-    return status_texts.get(status, "Неизвестный статус")
+# Синонимы статусов из схемы сайта
+_STATUS_ALIASES = {"processing": "preparing", "shipped": "shipping"}
+
+# Обычный путь заказа; отменённый или возвращённый заказ из него выходит
+_STATUS_FLOW = ["pending", "confirmed", "preparing", "shipping", "delivered"]
+
+def get_status_text(status: str, language: Optional[str] = None) -> str:
+    """Получить текстовое описание статуса на языке пользователя"""
+    status = _STATUS_ALIASES.get(status, status)
+    try:
+        return render(f"status_{status}", language)
+    except KeyError:
+        return render("status_unknown", language)
 
 def register_orders_handlers(dp):
     """Регистрация обработчиков заказов"""
@@ -1,42 +1,27 @@
 from aiogram import Router, F
-from aiogram.types import Message, CallbackQuery
+from aiogram.types import Message, CallbackQuery, InlineKeyboardButton, InlineKeyboardMarkup
 from aiogram.filters import Command
-from keyboards.main_menu import get_back_to_menu_keyboard
-from models.database import User, get_session
-from sqlalchemy import select
+from aiogram.utils.keyboard import InlineKeyboardBuilder
+from keyboards.main_menu import copy_keyboard
+from services.user_service import UserService
+from typing import Optional
 
-router = Router()
+router = Router(name="settings")
 
-@router.message(F.text == "⚙️ Настройки")
-@router.message(Command("settings"))
-async def cmd_settings(message: Message):
-    """Показать настройки пользователя"""
-    user_id = message.from_user.id
-
-    async with get_session() as session:
-        result = await session.execute(
-            select(User).where(User.telegram_id == user_id)
-        )
-        user = result.scalar_one_or_none()
-
-    if not user:
-        await message.answer("Пользователь не найден. Попробуйте перезапустить бота командой /start")
-        return
-
-    text = (
+def format_settings(profile: dict) -> str:
+    """Текст экрана настроек по профилю пользователя"""
+    return (
         f"⚙️ <b>Настройки профиля</b>\n\n"
         f"👤 <b>Личные данные:</b>\n"
-        f"   Имя: {user.full_name or 'Не указано'}\n"
-        f"   Телефон: {user.phone or 'Не указан'}\n"
-        f"   Email: {user.email or 'Не указан'}\n\n"
-        f"🌐 <b>Язык:</b> {get_language_name(user.language)}\n"
-        f"🔔 <b>Уведомления:</b> {'Включены' if user.notifications_enabled else 'Отключены'}\n\n"
+        f"   Имя: {profile.get('fullName') or 'Не указано'}\n"
+        f"   Телефон: {profile.get('phone') or 'Не указан'}\n"
+        f"   Email: {profile.get('email') or 'Не указан'}\n\n"
+        f"🌐 <b>Язык:</b> {get_language_name(profile.get('language'))}\n"
+        f"🔔 <b>Уведомления:</b> {'Включены' if profile.get('notificationsEnabled', True) else 'Отключены'}\n\n"
         f"Выберите действие:"
     )
 
-    from aiogram.utils.keyboard import InlineKeyboardBuilder
-    from aiogram.types import InlineKeyboardButton
-
+def _build_settings_keyboard() -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
 
     builder.add(
@@ -52,77 +37,48 @@ async def cmd_settings(message: Message):
     )
 
     builder.adjust(2, 2, 1)
+    return builder.as_markup()
 
-    await message.answer(text, reply_markup=builder.as_markup())
+SETTINGS_KEYBOARD = _build_settings_keyboard()
 
-@router.callback_query(F.data == "settings")
-async def callback_settings(callback: CallbackQuery):
-    """Показать настройки через callback"""
-    user_id = callback.from_user.id
-
-    async with get_session() as session:
-        result = await session.execute(
-            select(User).where(User.telegram_id == user_id)
-        )
-        user = result.scalar_one_or_none()
+def get_settings_keyboard() -> InlineKeyboardMarkup:
+    """Клавиатура настроек (копия образца, построенного один раз)"""
+    return copy_keyboard(SETTINGS_KEYBOARD)
 
-    if not user:
-        await callback.answer("Пользователь не найден")
+@router.message(F.text == "⚙️ Настройки")
+@router.message(Command("settings"))
+async def cmd_settings(message: Message, user_profile: Optional[dict] = None):
+    """Показать настройки пользователя"""
+    if not user_profile:
+        await message.answer("Пользователь не найден. Попробуйте перезапустить бота командой /start")
         return
 
-    text = (
-        f"⚙️ <b>Настройки профиля</b>\n\n"
-        f"👤 <b>Личные данные:</b>\n"
-        f"   Имя: {user.full_name or 'Не указано'}\n"
-        f"   Телефон: {user.phone or 'Не указано'}\n"
-        f"   Email: {user.email or 'Не указан'}\n\n"
-        f"🌐 <b>Язык:</b> {get_language_name(user.language)}\n"
-        f"🔔 <b>Уведомления:</b> {'Включены' if user.notifications_enabled else 'Отключены'}\n\n"
-        f"Выберите действие:"
-    )
-
-    from aiogram.utils.keyboard import InlineKeyboardBuilder
-    from aiogram.types import InlineKeyboardButton
-
-    builder = InlineKeyboardBuilder()
-
-    builder.add(
-        InlineKeyboardButton(text="👤 Изменить данные", callback_data="edit_profile"),
-        InlineKeyboardButton(text="📍 Адреса доставки", callback_data="delivery_addresses")
-    )
-    builder.add(
-        InlineKeyboardButton(text="🌐 Изменить язык", callback_data="change_language"),
-        InlineKeyboardButton(text="🔔 Уведомления", callback_data="toggle_notifications")
-    )
-    builder.add(
-        InlineKeyboardButton(text="⬅️ Главное меню", callback_data="main_menu")
-    )
+    await message.answer(format_settings(user_profile), reply_markup=get_settings_keyboard())
 
-    builder.adjust(2, 2, 1)
+@router.callback_query(F.data == "settings")
+async def callback_settings(callback: CallbackQuery, user_profile: Optional[dict] = None):
+    """Показать настройки через callback"""
+    if not user_profile:
+        await callback.answer("Пользователь не найден")
+        return
 
-    await callback.message.edit_text(text, reply_markup=builder.as_markup())
+    await callback.message.edit_text(format_settings(user_profile), reply_markup=get_settings_keyboard())
     await callback.answer()
 
 @router.callback_query(F.data == "toggle_notifications")
 async def callback_toggle_notifications(callback: CallbackQuery):
     """Включить/выключить уведомления"""
-    user_id = callback.from_user.id
-
-    async with get_session() as session:
-        result = await session.execute(
-            select(User).where(User.telegram_id == user_id)
-        )
-        user = result.scalar_one_or_none()
-
-        if user:
-            user.notifications_enabled = not user.notifications_enabled
-            await session.commit()
+    # Одно атомарное обновление: быстрые повторные нажатия не теряются
+    profile = await UserService.toggle_notifications(callback.from_user.id)
+    if not profile:
+        await callback.answer("Пользователь не найден")
+        return
 
-            status = "включены" if user.notifications_enabled else "отключены"
-            await callback.answer(f"🔔 Уведомления {status}", show_alert=True)
+    status = "включены" if profile["notificationsEnabled"] else "отключены"
+    await callback.answer(f"🔔 Уведомления {status}", show_alert=True)
 
-            # Обновляем сообщение настроек
-            await callback_settings(callback)
+    # Обновляем сообщение настроек по новому состоянию профиля
+    await callback.message.edit_text(format_settings(profile), reply_markup=get_settings_keyboard())
 
 @router.callback_query(F.data == "change_language")
 async def callback_change_language(callback: CallbackQuery):
@@ -132,9 +88,6 @@ async def callback_change_language(callback: CallbackQuery):
         "Выберите язык интерфейса:"
     )
 
-    from aiogram.utils.keyboard import InlineKeyboardBuilder
-    from aiogram.types import InlineKeyboardButton
-
     builder = InlineKeyboardBuilder()
 
     builder.add(
@@ -155,23 +108,20 @@ async def callback_change_language(callback: CallbackQuery):
 async def callback_set_language(callback: CallbackQuery):
     """Установить язык"""
     lang_code = callback.data.replace("set_lang_", "")
-    user_id = callback.from_user.id
-
-    async with get_session() as session:
-        result = await session.execute(
-            select(User).where(User.telegram_id == user_id)
-        )
-        user = result.scalar_one_or_none()
+    if lang_code not in LANGUAGES:
+        await callback.answer("Язык не поддерживается")
+        return
 
-        if user:
-            user.language = lang_code
-            await session.commit()
+    profile = await UserService.update_user_settings(callback.from_user.id, {"language": lang_code})
+    if not profile:
+        await callback.answer("Пользователь не найден")
+        return
 
-            lang_name = get_language_name(lang_code)
-            await callback.answer(f"🌐 Язык изменён на {lang_name}", show_alert=True)
+    lang_name = get_language_name(lang_code)
+    await callback.answer(f"🌐 Язык изменён на {lang_name}", show_alert=True)
 
-            # Возвращаемся к настройкам
-            await callback_settings(callback)
+    # Возвращаемся к настройкам
+    await callback.message.edit_text(format_settings(profile), reply_markup=get_settings_keyboard())
 
 @router.callback_query(F.data == "edit_profile")
 async def callback_edit_profile(callback: CallbackQuery):
@@ -181,9 +131,6 @@ async def callback_edit_profile(callback: CallbackQuery):
         "Выберите, что хотите изменить:"
     )
 
-    from aiogram.utils.keyboard import InlineKeyboardBuilder
-    from aiogram.types import InlineKeyboardButton
-
     builder = InlineKeyboardBuilder()
 
     builder.add(
@@ -208,9 +155,6 @@ async def callback_delivery_addresses(callback: CallbackQuery):
         "<i>Функция в разработке</i>"
     )
 
-    from aiogram.types import InlineKeyboardButton
-    from aiogram.utils.keyboard import InlineKeyboardBuilder
-
     builder = InlineKeyboardBuilder()
     builder.add(
         InlineKeyboardButton(text="➕ Добавить адрес", callback_data="add_address"),
@@ -220,14 +164,15 @@ async def callback_delivery_addresses(callback: CallbackQuery):
     await callback.message.edit_text(text, reply_markup=builder.as_markup())
     await callback.answer()
 
-def get_language_name(lang_code: str) -> str:
+LANGUAGES = {
+    "ru": "Русский",
+    "kk": "Қазақша",
+    "en": "English"
+}
+
+def get_language_name(lang_code: Optional[str]) -> str:
     """Получить название языка по коду"""
-    languages = {
-        "ru": "Русский",
-        "kk": "Қазақша",
-        "en": "English"
-    }
-    return languages.get(lang_code, "Русский")
+    return LANGUAGES.get(lang_code, "Русский")
 
 def register_settings_handlers(dp):
     """Регистрация обработчиков настроек"""
@@ -1,8 +1,18 @@
+from functools import lru_cache
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton, ReplyKeyboardMarkup, KeyboardButton
 from aiogram.utils.keyboard import InlineKeyboardBuilder
+from config.config import config
 
-def get_main_menu_buttons() -> InlineKeyboardMarkup:
-    """Inline кнопки главного меню"""
+# Статические клавиатуры строятся один раз при импорте. Модели aiogram изменяемы
+# (в 3.4.1 frozen=False), поэтому обработчики получают копию образца: глубокое
+# копирование в несколько раз дешевле сборки через InlineKeyboardBuilder, а
+# изменение полученной клавиатуры не затрагивает другие обработчики.
+
+def copy_keyboard(markup):
+    """Независимая копия заранее построенной клавиатуры"""
+    return markup.model_copy(deep=True)
+
+def _build_main_menu_buttons() -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
 
     builder.add(
@@ -21,8 +31,7 @@ def get_main_menu_buttons() -> InlineKeyboardMarkup:
     builder.adjust(2)  # 2 кнопки в ряд
     return builder.as_markup()
 
-def get_main_keyboard() -> ReplyKeyboardMarkup:
-    """Reply клавиатура с основными командами"""
+def _build_main_keyboard() -> ReplyKeyboardMarkup:
     keyboard = [
         [KeyboardButton(text="📦 Каталог"), KeyboardButton(text="❤️ Избранное")],
         [KeyboardButton(text="🛒 Корзина"), KeyboardButton(text="📋 Заказы")],
@@ -30,8 +39,7 @@ def get_main_keyboard() -> ReplyKeyboardMarkup:
     ]
     return ReplyKeyboardMarkup(keyboard=keyboard, resize_keyboard=True)
 
-def get_categories_keyboard() -> InlineKeyboardMarkup:
-    """Клавиатура с категориями товаров"""
+def _build_categories_keyboard() -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
 
     builder.add(
@@ -52,14 +60,38 @@ def get_categories_keyboard() -> InlineKeyboardMarkup:
     builder.adjust(2, 2, 1, 1)  # 2-2-1-1 кнопки в ряд
     return builder.as_markup()
 
-def get_back_to_menu_keyboard() -> InlineKeyboardMarkup:
-    """Клавиатура с кнопкой возврата в главное меню"""
+def _build_back_to_menu_keyboard() -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
     builder.add(InlineKeyboardButton(text="⬅️ Главное меню", callback_data="main_menu"))
     return builder.as_markup()
 
-def get_product_actions_keyboard(product_id: int, in_favorites: bool = False) -> InlineKeyboardMarkup:
-    """Клавиатура действий с товаром"""
+MAIN_MENU_BUTTONS = _build_main_menu_buttons()
+MAIN_KEYBOARD = _build_main_keyboard()
+CATEGORIES_KEYBOARD = _build_categories_keyboard()
+BACK_TO_MENU_KEYBOARD = _build_back_to_menu_keyboard()
+
+def get_main_menu_buttons() -> InlineKeyboardMarkup:
+    """Inline кнопки главного меню"""
+    return copy_keyboard(MAIN_MENU_BUTTONS)
+
+def get_main_keyboard() -> ReplyKeyboardMarkup:
+    """Reply клавиатура с основными командами"""
+    return copy_keyboard(MAIN_KEYBOARD)
+
+def get_categories_keyboard() -> InlineKeyboardMarkup:
+    """Клавиатура с категориями товаров"""
+    return copy_keyboard(CATEGORIES_KEYBOARD)
+
+def get_back_to_menu_keyboard() -> InlineKeyboardMarkup:
+    """Клавиатура с кнопкой возврата в главное меню"""
+    return copy_keyboard(BACK_TO_MENU_KEYBOARD)
+
+def get_product_actions_keyboard(product_id: str, in_favorites: bool = False) -> InlineKeyboardMarkup:
+    """Клавиатура действий с товаром (копия образца, кэшированного по товару и состоянию избранного)"""
+    return copy_keyboard(_build_product_actions_keyboard(product_id, in_favorites))
+
+@lru_cache(maxsize=config.KEYBOARD_CACHE_SIZE)
+def _build_product_actions_keyboard(product_id: str, in_favorites: bool) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
 
     heart_text = "💔 Убрать из избранного" if in_favorites else "❤️ В избранное"
@@ -0,0 +1,366 @@
+#!/usr/bin/env python3
+"""
+Нагрузочный тест бота: синтетические обновления прогоняются через
+Dispatcher.feed_update с теми же middleware и обработчиками, что в боевом
+запуске. Запросы к Telegram уходят в заглушку сессии, данные - в отдельную
+базу (локальный mongod, временный mongod из pymongo_inmemory или mongomock).
+
+Примеры:
+    python loadtest.py --db mongod --mongo-uri mongodb://localhost:27017
+    python loadtest.py --db inmemory --updates 20000 --users 1000
+"""
+
+import argparse
+import asyncio
+import datetime
+import importlib
+import itertools
+import math
+import os
+import random
+import sys
+import time
+from collections import Counter, defaultdict
+from typing import Any, Dict, List
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from aiogram import Bot, Dispatcher
+from aiogram.client.default import DefaultBotProperties
+from aiogram.client.session.base import BaseSession
+from aiogram.enums import ParseMode
+from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.methods import SendMessage
+from aiogram.types import CallbackQuery, Chat, Message, Update, User
+from bson import ObjectId
+
+from config.config import config
+
+# Доля каждого сценария в потоке обновлений
+SCENARIOS = {
+    "start": 5,
+    "catalog": 15,
+    "category": 25,
+    "add_to_cart": 20,
+    "cart": 20,
+    "orders": 10,
+    "order_details": 5
+}
+
+CATEGORIES = {
+    "classic": "Классические костюмы",
+    "slim": "Slim Fit костюмы",
+    "casual": "Casual костюмы",
+    "festive": "Праздничные костюмы",
+    "sales": "Акции"
+}
+
+# Модули, которые берут коллекции из lib.mongodb; на время теста они смотрят в тестовую базу
+SERVICE_MODULES = [
+    "services.broadcast_service",
+    "services.cart_service",
+    "services.catalog_cache",
+    "services.favorites_service",
+    "services.order_service",
+    "services.order_tracking",
+    "services.product_service",
+    "services.search_index",
+    "services.user_service"
+]
+
+BOT_USER = User(id=42, is_bot=True, first_name="Ziggler")
+
+class StubSession(BaseSession):
+    """Сессия Bot API без сети: считает вызовы и отвечает правдоподобными объектами"""
+
+    def __init__(self, latency: float = 0.0):
+        super().__init__()
+        self.latency = latency
+        self.calls: Counter = Counter()
+        self._message_ids = itertools.count(1)
+
+    async def make_request(self, bot: Bot, method, timeout=None) -> Any:
+        self.calls[method.__api_method__] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if isinstance(method, SendMessage):
+            return Message(
+                message_id=next(self._message_ids),
+                date=datetime.datetime.now(),
+                chat=Chat(id=method.chat_id, type="private"),
+                from_user=BOT_USER,
+                text=method.text
+            )
+        return True
+
+    async def stream_content(self, url, headers=None, timeout=30, chunk_size=65536, raise_for_status=True):
+        yield b""
+
+    async def close(self) -> None:
+        pass
+
+def open_database(args):
+    """Тестовая база и функция её освобождения"""
+    if args.db == "mongomock":
+        from mongomock_motor import AsyncMongoMockClient
+        # mongomock не выполняет pipeline-обновления корзины
+        config.CART_PIPELINE_UPDATES = False
+        return AsyncMongoMockClient()[args.db_name], lambda: None
+
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    if args.db == "inmemory":
+        from pymongo_inmemory import Mongod
+        from pymongo_inmemory.context import Context
+        mongod = Mongod(Context())
+        mongod.start()
+        client = AsyncIOMotorClient(mongod.connection_string)
+
+        def release():
+            client.close()
+            mongod.stop()
+        return client[args.db_name], release
+
+    client = AsyncIOMotorClient(args.mongo_uri)
+    return client[args.db_name], client.close
+
+def bind_database(db) -> None:
+    """Подменить get_*_collection в модулях сервисов на коллекции тестовой базы"""
+    for module_name in SERVICE_MODULES:
+        module = importlib.import_module(module_name)
+        for attribute in dir(module):
+            if attribute.startswith("get_") and attribute.endswith("_collection"):
+                collection_name = attribute[len("get_"):-len("_collection")]
+                setattr(module, attribute, lambda name=collection_name: db[name])
+
+# Коллекция-отметка: база создана нагрузочным тестом и её можно очищать
+LOADTEST_MARKER = "loadtest_marker"
+
+async def check_database(db, db_name: str, reset_db: bool) -> None:
+    """Не дать очистить рабочую или чужую непустую базу без --reset-db"""
+    if reset_db:
+        return
+    if db_name == os.getenv("MONGODB_DB", "ziggler"):
+        raise SystemExit(f"❌ {db_name} - рабочая база бота; укажите другую --db-name или --reset-db")
+
+    names = set(await db.list_collection_names())
+    if LOADTEST_MARKER in names:
+        return
+    for name in names:
+        if await db[name].estimated_document_count():
+            raise SystemExit(
+                f"❌ База {db_name} не пуста и создана не нагрузочным тестом "
+                f"(коллекция {name}); она будет очищена только с --reset-db"
+            )
+
+async def seed(db, products_count: int, user_ids: List[int]) -> List[str]:
+    """Наполнить тестовую базу каталогом и заказами, вернуть id товаров"""
+    await db[LOADTEST_MARKER].update_one(
+        {"_id": "loadtest"}, {"$set": {"seededAt": datetime.datetime.utcnow()}}, upsert=True
+    )
+    for name in ("categories", "products", "orders", "carts", "users"):
+        await db[name].delete_many({})
+
+    now = datetime.datetime.utcnow()
+    await db.categories.insert_many([
+        {"name": name, "slug": code, "isActive": True, "updatedAt": now} for code, name in CATEGORIES.items()
+    ])
+
+    products = []
+    for i in range(products_count):
+        products.append({
+            "_id": ObjectId(),
+            "name": f"Костюм {random.choice(['Classic', 'Slim', 'Premium', 'Business'])} №{i}",
+            "description": "Шерстяной костюм премиум качества, однобортный пиджак и брюки прямого кроя.",
+            "category": list(CATEGORIES.values())[i % len(CATEGORIES)],
+            "price": random.randrange(49990, 249990, 1000),
+            "rating": round(random.uniform(3.5, 5.0), 1),
+            "reviewCount": random.randrange(0, 200),
+            "materials": ["Шерсть", "Вискоза"],
+            "sizes": [{"name": size, "inStock": True} for size in ("S", "M", "L", "XL")],
+            "colors": [{"name": "Черный", "hexCode": "#000000", "inStock": True}],
+            "tags": ["костюм", "мужской"],
+            "isActive": True,
+            "createdAt": now,
+            "updatedAt": now
+        })
+    await db.products.insert_many(products)
+
+    orders = []
+    for user_id in user_ids:
+        for n in range(random.randrange(0, 6)):
+            product = random.choice(products)
+            orders.append({
+                "orderNumber": f"ZG{user_id}{n:02d}",
+                "userId": user_id,
+                "items": [{
+                    "productId": product["_id"],
+                    "product": {"name": product["name"]},
+                    "size": "M",
+                    "color": "Черный",
+                    "quantity": 1,
+                    "price": product["price"],
+                    "totalPrice": product["price"]
+                }],
+                "orderStatus": random.choice(["pending", "confirmed", "shipped", "delivered"]),
+                "total": product["price"],
+                "customerInfo": {"fullName": "Тест", "phone": "+77001234567", "email": ""},
+                "shippingAddress": {"street": "ул. Абая, 1"},
+                "createdAt": now - datetime.timedelta(days=n),
+                "updatedAt": now
+            })
+    if orders:
+        await db.orders.insert_many(orders)
+
+    return [str(product["_id"]) for product in products]
+
+def generate_updates(count: int, user_ids: List[int], product_ids: List[str]) -> List[Update]:
+    """Поток обновлений в пропорциях SCENARIOS"""
+    names = list(SCENARIOS)
+    weights = list(SCENARIOS.values())
+    updates = []
+
+    for update_id in range(1, count + 1):
+        scenario = random.choices(names, weights)[0]
+        user = User(id=random.choice(user_ids), is_bot=False, first_name="Load", last_name="Test", language_code="ru")
+        chat = Chat(id=user.id, type="private")
+        now = datetime.datetime.now()
+
+        if scenario in ("start", "cart", "orders") and random.random() < 0.5:
+            text = {"start": "/start", "cart": "🛒 Корзина", "orders": "📋 Заказы"}[scenario]
+            message = Message(message_id=update_id, date=now, chat=chat, from_user=user, text=text)
+            updates.append(Update(update_id=update_id, message=message))
+            continue
+
+        data = {
+            "start": "main_menu",
+            "catalog": "catalog",
+            "category": f"category_{random.choice(list(CATEGORIES))}",
+            "add_to_cart": f"add_to_cart_{random.choice(product_ids)}",
+            "cart": "cart",
+            "orders": "orders",
+            # У пользователя от 0 до 5 заказов: часть нажатий попадает на несуществующий
+            "order_details": f"order_details_ZG{user.id}{random.randrange(0, 6):02d}"
+        }[scenario]
+        bot_message = Message(message_id=update_id, date=now, chat=chat, from_user=BOT_USER, text="…")
+        callback = CallbackQuery(
+            id=str(update_id), from_user=user, chat_instance=str(user.id), message=bot_message, data=data
+        )
+        updates.append(Update(update_id=update_id, callback_query=callback))
+
+    return updates
+
+def percentile(sorted_values: List[float], share: float) -> float:
+    """Перцентиль по отсортированной выборке (nearest-rank)"""
+    if not sorted_values:
+        return 0.0
+    rank = math.ceil(share * len(sorted_values))
+    return sorted_values[max(0, rank - 1)]
+
+def build_dispatcher(latencies: Dict[str, List[float]], errors: Counter) -> Dispatcher:
+    """Диспетчер в боевой сборке плюс замер времени каждого обработчика"""
+    from handlers import register_all_handlers
+    from middlewares import register_all_middlewares
+
+    dp = Dispatcher(storage=MemoryStorage())
+    register_all_middlewares(dp)
+    register_all_handlers(dp)
+
+    async def timing(handler, event, data):
+        name = data["handler"].callback.__name__
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            errors[name] += 1
+            raise
+        finally:
+            latencies[name].append(time.perf_counter() - started)
+
+    # Замер ставится последним, ближе всего к обработчику
+    dp.message.middleware(timing)
+    dp.callback_query.middleware(timing)
+    return dp
+
+async def run(args) -> None:
+    if not args.throttling:
+        config.THROTTLE_USER_LIMITS = ""
+        config.THROTTLE_GLOBAL_LIMITS = ""
+
+    from services.user_service import user_activity
+
+    db, release = open_database(args)
+    try:
+        await check_database(db, args.db_name, args.reset_db)
+        bind_database(db)
+
+        random.seed(args.seed)
+        user_ids = [100000 + i for i in range(args.users)]
+        print(f"🗄️ Наполнение базы: {args.products} товаров, {args.users} пользователей...")
+        product_ids = await seed(db, args.products, user_ids)
+        updates = generate_updates(args.updates, user_ids, product_ids)
+
+        latencies: Dict[str, List[float]] = defaultdict(list)
+        errors: Counter = Counter()
+        dp = build_dispatcher(latencies, errors)
+        session = StubSession(latency=args.api_latency / 1000)
+        bot = Bot(token="42:LOADTEST", session=session, default=DefaultBotProperties(parse_mode=ParseMode.HTML))
+
+        queue: asyncio.Queue = asyncio.Queue()
+        for update in updates:
+            queue.put_nowait(update)
+
+        async def worker():
+            while not queue.empty():
+                update = queue.get_nowait()
+                try:
+                    await dp.feed_update(bot, update)
+                except Exception:
+                    pass
+
+        print(f"🚀 {len(updates)} обновлений, {args.concurrency} одновременно...")
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+
+        await user_activity.flush()
+        handled = sum(len(values) for values in latencies.values())
+
+        print("-" * 72)
+        print(f"Обновлений: {len(updates)}, обработано: {handled}, за {elapsed:.2f} с")
+        print(f"Пропускная способность: {len(updates) / elapsed:.0f} обновлений/с")
+        print(f"Запросы к Bot API: {dict(session.calls)}")
+        print("-" * 72)
+        print(f"{'Обработчик':<28}{'кол-во':>8}{'ошибки':>8}{'p50, мс':>9}{'p95, мс':>9}{'p99, мс':>9}")
+        for name, values in sorted(latencies.items()):
+            values.sort()
+            print(
+                f"{name:<28}{len(values):>8}{errors[name]:>8}"
+                f"{percentile(values, 0.50) * 1000:>9.2f}"
+                f"{percentile(values, 0.95) * 1000:>9.2f}"
+                f"{percentile(values, 0.99) * 1000:>9.2f}"
+            )
+    finally:
+        release()
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Нагрузочный тест обработчиков бота")
+    parser.add_argument("--db", choices=["mongod", "inmemory", "mongomock"], default="mongod",
+                        help="mongod - сервер по --mongo-uri, inmemory - временный mongod (pymongo_inmemory), "
+                             "mongomock - без сервера (корзина - через чтение и условную перезапись)")
+    parser.add_argument("--mongo-uri", default=os.getenv("MONGODB_URI", "mongodb://localhost:27017"))
+    parser.add_argument("--db-name", default="ziggler_loadtest",
+                        help="база очищается перед тестом, если пуста или создана нагрузочным тестом")
+    parser.add_argument("--reset-db", action="store_true",
+                        help="разрешить очистку непустой базы, созданной не нагрузочным тестом")
+    parser.add_argument("--updates", type=int, default=5000)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--products", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--api-latency", type=float, default=0.0, help="задержка ответа Bot API, мс")
+    parser.add_argument("--throttling", action="store_true", help="оставить ограничение частоты запросов")
+    parser.add_argument("--seed", type=int, default=1)
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    asyncio.run(run(parse_args()))
@@ -0,0 +1,27 @@
+from aiogram import Dispatcher
+from .deduplication import DeduplicationMiddleware
+from .metrics import HandlerMetricsMiddleware
+from .throttling import ThrottlingMiddleware
+from .user_activity import UserActivityMiddleware
+from .user_profile import UserProfileMiddleware
+
+def register_all_middlewares(dp: Dispatcher):
+    """Регистрация всех middleware"""
+    # Дубликаты отбрасываются раньше любой другой работы
+    dp.update.outer_middleware(DeduplicationMiddleware())
+    dp.update.outer_middleware(UserActivityMiddleware())
+
+    # Лимиты проверяются, когда обработчик уже найден (известна его группа)
+    throttling = ThrottlingMiddleware()
+    dp.message.middleware(throttling)
+    dp.callback_query.middleware(throttling)
+
+    # Профиль нужен только обработчикам, прошедшим ограничение частоты
+    user_profile = UserProfileMiddleware()
+    dp.message.middleware(user_profile)
+    dp.callback_query.middleware(user_profile)
+
+    # Время работы обработчиков (без отброшенных ограничением частоты)
+    handler_metrics = HandlerMetricsMiddleware()
+    dp.message.middleware(handler_metrics)
+    dp.callback_query.middleware(handler_metrics)
@@ -0,0 +1,87 @@
+from typing import Any, Awaitable, Callable, Dict, List
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update
+from redis.asyncio import Redis
+from config.config import config
+from utils.cache import TTLCache
+from utils.metrics import DUPLICATE_UPDATES
+from utils.redis import get_redis
+
+class MemoryDedupWindow:
+    """Недавно обработанные ключи в памяти процесса (ограничено по времени и размеру)"""
+
+    def __init__(self, ttl: int, max_size: int):
+        self._seen = TTLCache(maxsize=max_size, ttl=ttl)
+
+    async def add(self, key: str) -> bool:
+        """Запомнить ключ; False, если он уже был в окне"""
+        if key in self._seen:
+            return False
+        self._seen.set(key, True)
+        return True
+
+    async def discard(self, key: str) -> None:
+        self._seen.pop(key)
+
+class RedisDedupWindow:
+    """Недавно обработанные ключи в Redis - окно общее для всех реплик"""
+
+    def __init__(self, redis: Redis, ttl: int, prefix: str = "dedup"):
+        self.redis = redis
+        self.ttl = ttl
+        self.prefix = prefix
+
+    async def add(self, key: str) -> bool:
+        """Запомнить ключ; False, если он уже был в окне"""
+        return bool(await self.redis.set(f"{self.prefix}:{key}", 1, nx=True, ex=self.ttl))
+
+    async def discard(self, key: str) -> None:
+        await self.redis.delete(f"{self.prefix}:{key}")
+
+def _update_keys(update: Update) -> List[str]:
+    """Ключи, по которым повтор обновления распознаётся как дубликат"""
+    keys = [f"u:{update.update_id}"]
+    if update.callback_query is not None:
+        # Повторная доставка нажатия может прийти с другим update_id
+        keys.append(f"cb:{update.callback_query.id}")
+    return keys
+
+class DeduplicationMiddleware(BaseMiddleware):
+    """Отбрасывает повторно доставленные обновления до обработчиков и запросов в БД.
+
+    Telegram повторяет webhook при медленном ответе, а после перезапуска в
+    режиме polling обновления могут прийти ещё раз. Если обработка упала,
+    ключи удаляются, чтобы повторная доставка могла её повторить.
+    """
+
+    def __init__(self, window=None):
+        if window is None:
+            if config.STORAGE_BACKEND == "redis":
+                window = RedisDedupWindow(get_redis(), ttl=config.DEDUP_WINDOW)
+            else:
+                window = MemoryDedupWindow(ttl=config.DEDUP_WINDOW, max_size=config.DEDUP_MAX_SIZE)
+        self.window = window
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        keys = _update_keys(event)
+        added = []
+        for key in keys:
+            if not await self.window.add(key):
+                # Дубликат: откатываем уже записанные ключи этого обновления
+                for added_key in added:
+                    await self.window.discard(added_key)
+                DUPLICATE_UPDATES.inc()
+                return None
+            added.append(key)
+
+        try:
+            return await handler(event, data)
+        except Exception:
+            for key in keys:
+                await self.window.discard(key)
+            raise
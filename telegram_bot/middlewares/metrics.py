@@ -0,0 +1,50 @@
+import time
+from typing import Any, Awaitable, Callable, Dict
+from aiogram import BaseMiddleware, Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.methods import Response, TelegramMethod
+from aiogram.methods.base import TelegramType
+from aiogram.types import TelegramObject
+from utils.metrics import HANDLER_DURATION, TELEGRAM_REQUEST_DURATION
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """Замеряет время работы каждого обработчика (метка - имя функции обработчика)"""
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        handler_object = data.get("handler")
+        name = handler_object.callback.__name__ if handler_object is not None else "unknown"
+
+        started = time.perf_counter()
+        status = "ok"
+        try:
+            return await handler(event, data)
+        except Exception:
+            status = "error"
+            raise
+        finally:
+            HANDLER_DURATION.labels(name, status).observe(time.perf_counter() - started)
+
+class TelegramMetricsMiddleware(BaseRequestMiddleware):
+    """Замеряет исходящие запросы к Telegram Bot API (метка - метод API)"""
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType]
+    ) -> Response[TelegramType]:
+        started = time.perf_counter()
+        status = "ok"
+        try:
+            return await make_request(bot, method)
+        except Exception as e:
+            # TelegramRetryAfter, TelegramForbiddenError, TelegramNetworkError, ...
+            status = type(e).__name__
+            raise
+        finally:
+            TELEGRAM_REQUEST_DURATION.labels(method.__api_method__, status).observe(time.perf_counter() - started)
@@ -0,0 +1,61 @@
+from typing import Any, Awaitable, Callable, Dict, Optional
+from aiogram import BaseMiddleware
+from aiogram.dispatcher.flags import get_flag
+from aiogram.types import CallbackQuery, TelegramObject, User
+from config.config import config
+from utils.metrics import THROTTLED_UPDATES
+from utils.rate_limit import MemoryRateLimiter, RedisRateLimiter, parse_limits
+from utils.redis import get_redis
+
+THROTTLED_TEXT = "⏳ Слишком много запросов, подождите немного"
+
+class ThrottlingMiddleware(BaseMiddleware):
+    """Ограничение частоты запросов корзинами токенов.
+
+    Группа обработчика - флаг ``throttling_key`` или имя его роутера
+    (catalog, cart, orders); для каждой группы действуют лимит на
+    пользователя и общий лимит на всех пользователей. Запрос сверх лимита
+    не доходит до обработчика: нажатие кнопки получает короткий ответ
+    (THROTTLE_MODE=reply), сообщения пропускаются молча.
+    """
+
+    def __init__(self, limiter=None, user_limits: Optional[Dict] = None, global_limits: Optional[Dict] = None):
+        if limiter is None:
+            limiter = RedisRateLimiter(get_redis()) if config.STORAGE_BACKEND == "redis" else MemoryRateLimiter()
+        self.limiter = limiter
+        self.user_limits = parse_limits(config.THROTTLE_USER_LIMITS) if user_limits is None else user_limits
+        self.global_limits = parse_limits(config.THROTTLE_GLOBAL_LIMITS) if global_limits is None else global_limits
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        user: User = data.get("event_from_user")
+        if user is None:
+            return await handler(event, data)
+
+        group = get_flag(data, "throttling_key")
+        if group is None:
+            router = data.get("event_router")
+            group = router.name if router is not None else None
+        if group not in self.user_limits and group not in self.global_limits:
+            group = "default"
+
+        # Сначала лимит пользователя: спамящий пользователь не тратит общий лимит
+        limits = []
+        user_limit = self.user_limits.get(group)
+        if user_limit:
+            limits.append((f"{group}:{user.id}", user_limit))
+        global_limit = self.global_limits.get(group)
+        if global_limit:
+            limits.append((f"{group}:global", global_limit))
+
+        if not limits or await self.limiter.acquire(limits):
+            return await handler(event, data)
+
+        THROTTLED_UPDATES.labels(group).inc()
+        if isinstance(event, CallbackQuery) and config.THROTTLE_MODE == "reply":
+            await event.answer(THROTTLED_TEXT)
+        return None
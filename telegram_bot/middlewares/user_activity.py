@@ -0,0 +1,26 @@
+from typing import Any, Awaitable, Callable, Dict
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, User
+from services.user_service import user_activity
+
+class UserActivityMiddleware(BaseMiddleware):
+    """Отмечает активность пользователя и его профиль Telegram.
+
+    Запись в MongoDB не делается на каждое обновление: отметки копятся в
+    буфере user_activity и сбрасываются пачкой фоновой задачей.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        user: User = data.get("event_from_user")
+        if user is not None and not user.is_bot:
+            user_activity.touch(user.id, {
+                "username": user.username,
+                "first_name": user.first_name,
+                "last_name": user.last_name
+            })
+        return await handler(event, data)
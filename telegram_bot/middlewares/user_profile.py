@@ -0,0 +1,25 @@
+from typing import Any, Awaitable, Callable, Dict
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, User
+from services.user_service import UserService
+
+class UserProfileMiddleware(BaseMiddleware):
+    """Передаёт обработчикам профиль пользователя и его язык.
+
+    Профиль читается один раз на обновление (обычно из кэша user_profiles)
+    и доступен обработчикам как аргументы ``user_profile`` и ``language``.
+    Для ещё не сохранённого пользователя оба значения - None.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        if "user_profile" not in data:
+            user: User = data.get("event_from_user")
+            profile = await UserService.get_user_profile(user.id) if user is not None else None
+            data["user_profile"] = profile
+            data["language"] = profile.get("language") if profile else None
+        return await handler(event, data)
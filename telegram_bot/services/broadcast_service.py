@@ -0,0 +1,297 @@
+from lib.mongodb import get_users_collection
+from typing import Deque, Dict, List, Optional, Tuple
+from collections import deque
+from aiogram import Bot
+from aiogram.exceptions import TelegramAPIError, TelegramForbiddenError
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import ReturnDocument
+from config.config import config
+from utils.metrics import BROADCAST_MESSAGES, instrument_service
+from utils.outbound import Priority, outbound_priority
+import asyncio
+import datetime
+import logging
+import time
+import uuid
+
+DELIVERED = "delivered"
+BLOCKED = "blocked"
+FAILED = "failed"
+
+# Only the Telegram id is needed to send a message
+RECIPIENT_PROJECTION = {"_id": 1, "telegramId": 1}
+
+def get_broadcasts_collection():
+    """Broadcast campaigns live next to the users collection"""
+    return get_users_collection().database["broadcasts"]
+
+def _recipients_query(after_id: Optional[ObjectId] = None) -> Dict:
+    query = {"notificationsEnabled": True}
+    if after_id is not None:
+        query["_id"] = {"$gt": after_id}
+    return query
+
+def _object_id(value) -> Optional[ObjectId]:
+    try:
+        return ObjectId(value)
+    except (InvalidId, TypeError):
+        return None
+
+@instrument_service
+class BroadcastService:
+    @staticmethod
+    async def ensure_indexes() -> None:
+        """Recipients are scanned in _id order among users with notifications enabled"""
+        try:
+            await get_users_collection().create_index([("notificationsEnabled", 1), ("_id", 1)])
+            await get_broadcasts_collection().create_index([("status", 1), ("leaseUntil", 1)])
+        except Exception as e:
+            logging.warning(f"Broadcast indexes not created: {e}")
+
+    @staticmethod
+    async def create_campaign(text: str, created_by: int) -> Dict:
+        """Create a broadcast campaign to all users with notifications enabled"""
+        now = datetime.datetime.utcnow()
+        campaign = {
+            "text": text,
+            "createdBy": created_by,
+            "status": "running",
+            "total": await get_users_collection().count_documents(_recipients_query()),
+            # Checkpoint: every recipient up to this _id has been processed
+            "lastUserId": None,
+            DELIVERED: 0,
+            BLOCKED: 0,
+            FAILED: 0,
+            "leaseOwner": None,
+            "leaseUntil": None,
+            "createdAt": now,
+            "updatedAt": now
+        }
+        result = await get_broadcasts_collection().insert_one(campaign)
+        campaign["_id"] = result.inserted_id
+        return campaign
+
+    @staticmethod
+    async def get_campaign(campaign_id: str) -> Optional[Dict]:
+        """Get campaign by ID"""
+        object_id = _object_id(campaign_id)
+        if object_id is None:
+            return None
+        return await get_broadcasts_collection().find_one({"_id": object_id})
+
+    @staticmethod
+    async def claim_campaign(campaign_id: ObjectId, owner: str, lease: float) -> Optional[Dict]:
+        """Take a running campaign whose lease is free or expired; None if another process owns it"""
+        now = datetime.datetime.utcnow()
+        return await get_broadcasts_collection().find_one_and_update(
+            {
+                "_id": campaign_id,
+                "status": "running",
+                "$or": [{"leaseOwner": owner}, {"leaseUntil": None}, {"leaseUntil": {"$lt": now}}]
+            },
+            {"$set": {"leaseOwner": owner, "leaseUntil": now + datetime.timedelta(seconds=lease)}},
+            return_document=ReturnDocument.AFTER
+        )
+
+    @staticmethod
+    async def get_orphaned_campaign_ids() -> List[ObjectId]:
+        """Running campaigns nobody is sending (the sending process stopped)"""
+        now = datetime.datetime.utcnow()
+        cursor = get_broadcasts_collection().find(
+            {"status": "running", "$or": [{"leaseUntil": None}, {"leaseUntil": {"$lt": now}}]},
+            {"_id": 1}
+        )
+        return [campaign["_id"] async for campaign in cursor]
+
+    @staticmethod
+    async def save_progress(
+        campaign_id: ObjectId,
+        owner: str,
+        last_user_id: Optional[ObjectId],
+        counts: Dict[str, int],
+        lease: Optional[float] = None,
+        finished: bool = False
+    ) -> bool:
+        """Atomically move the checkpoint and add the counts; False if the lease was lost"""
+        now = datetime.datetime.utcnow()
+        update = {
+            "$set": {"updatedAt": now},
+            "$inc": {result: counts.get(result, 0) for result in (DELIVERED, BLOCKED, FAILED)}
+        }
+        if last_user_id is not None:
+            update["$set"]["lastUserId"] = last_user_id
+        if finished:
+            update["$set"].update({"status": "done", "finishedAt": now, "leaseOwner": None, "leaseUntil": None})
+        elif lease is None:
+            # Stopping: the campaign can be taken over immediately
+            update["$set"].update({"leaseOwner": None, "leaseUntil": None})
+        else:
+            update["$set"]["leaseUntil"] = now + datetime.timedelta(seconds=lease)
+
+        result = await get_broadcasts_collection().update_one({"_id": campaign_id, "leaseOwner": owner}, update)
+        return result.matched_count == 1
+
+    @staticmethod
+    async def deliver(bot: Bot, chat_id: int, text: str, priority: Priority = Priority.BROADCAST, **kwargs) -> str:
+        """Send one message through the outbound queue, returns delivered/blocked/failed"""
+        try:
+            with outbound_priority(priority):
+                await bot.send_message(chat_id, text, **kwargs)
+        except TelegramForbiddenError:
+            result = BLOCKED
+        except TelegramAPIError as e:
+            logging.debug(f"Message to {chat_id} not sent: {e}")
+            result = FAILED
+        except Exception as e:
+            # Network errors and timeouts fail this message, not the whole campaign
+            logging.warning(f"Message to {chat_id} not sent: {e!r}")
+            result = FAILED
+        else:
+            result = DELIVERED
+        BROADCAST_MESSAGES.labels(result).inc()
+        return result
+
+class Broadcaster:
+    """Sends broadcast campaigns.
+
+    Recipients are streamed from a cursor with a minimal projection, so
+    memory use does not depend on the number of users. At most
+    ``concurrency`` messages are in flight; the actual sending rate is set
+    by the outbound queue. The checkpoint is the last recipient up to
+    which all sends have completed; together with the counts it is saved
+    in one update, so a campaign resumed after a crash neither skips nor
+    double counts anyone (at most the in-flight messages are sent twice).
+
+    A campaign is owned by one process through a lease renewed with every
+    checkpoint, so with several replicas or shard workers each campaign is
+    sent once, and an abandoned one is picked up by another process.
+    """
+
+    def __init__(self, concurrency: int, checkpoint_every: int, lease: float):
+        self.concurrency = concurrency
+        self.checkpoint_every = checkpoint_every
+        self.lease = lease
+        self.owner = uuid.uuid4().hex
+        self._tasks: Dict[ObjectId, asyncio.Task] = {}
+
+    async def start(self, bot: Bot, campaign_id: ObjectId) -> bool:
+        """Start sending a campaign in the background if it can be claimed"""
+        if campaign_id in self._tasks:
+            return True
+        campaign = await BroadcastService.claim_campaign(campaign_id, self.owner, self.lease)
+        if campaign is None:
+            return False
+
+        task = asyncio.create_task(self._run(bot, campaign))
+        self._tasks[campaign_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(campaign_id, None))
+        return True
+
+    async def _run(self, bot: Bot, campaign: Dict) -> None:
+        campaign_id = campaign["_id"]
+        logging.info(f"Broadcast {campaign_id} started after {campaign.get('lastUserId')}")
+
+        # Sends in cursor order; the head is always the oldest unfinished one
+        pending: Deque[Tuple[ObjectId, asyncio.Task]] = deque()
+        counts = {DELIVERED: 0, BLOCKED: 0, FAILED: 0}
+        checkpoint: Optional[ObjectId] = None
+        processed = 0
+        saved_at = time.monotonic()
+
+        def collect() -> None:
+            nonlocal checkpoint, processed
+            while pending and pending[0][1].done() and not pending[0][1].cancelled():
+                user_id, task = pending.popleft()
+                # deliver() reports errors as results; anything escaping it still counts as failed
+                counts[FAILED if task.exception() is not None else task.result()] += 1
+                checkpoint = user_id
+                processed += 1
+
+        async def save(**kwargs) -> bool:
+            nonlocal processed, saved_at
+            saved = await BroadcastService.save_progress(campaign_id, self.owner, checkpoint, counts, **kwargs)
+            for result in counts:
+                counts[result] = 0
+            processed = 0
+            saved_at = time.monotonic()
+            return saved
+
+        cursor = get_users_collection().find(
+            _recipients_query(campaign.get("lastUserId")), RECIPIENT_PROJECTION
+        ).sort("_id", 1).batch_size(self.checkpoint_every)
+        try:
+            async for user in cursor:
+                while len(pending) >= self.concurrency:
+                    await asyncio.wait([pending[0][1]])
+                    collect()
+                pending.append((user["_id"], asyncio.create_task(
+                    BroadcastService.deliver(bot, user["telegramId"], campaign["text"])
+                )))
+                collect()
+
+                if processed >= self.checkpoint_every or time.monotonic() - saved_at > self.lease / 3:
+                    if not await save(lease=self.lease):
+                        logging.warning(f"Broadcast {campaign_id}: lease lost, stopping")
+                        return
+
+            if pending:
+                await asyncio.wait([task for _, task in pending])
+                collect()
+            await save(finished=True)
+        except BaseException:
+            # Keep the completed sends; the unfinished ones are repeated on resume
+            collect()
+            try:
+                await asyncio.shield(save())
+            except Exception as e:
+                logging.error(f"Broadcast {campaign_id} checkpoint not saved: {e}")
+            raise
+        finally:
+            for _, task in pending:
+                task.cancel()
+            await cursor.close()
+
+        campaign = await BroadcastService.get_campaign(str(campaign_id))
+        logging.info(
+            f"Broadcast {campaign_id} finished: delivered {campaign[DELIVERED]}, "
+            f"blocked {campaign[BLOCKED]}, failed {campaign[FAILED]}"
+        )
+        await BroadcastService.deliver(
+            bot, campaign["createdBy"], format_campaign_report(campaign), priority=Priority.NOTIFICATION
+        )
+
+    async def run_resumer(self, bot: Bot, interval: float) -> None:
+        """Periodically pick up campaigns abandoned by stopped processes"""
+        while True:
+            try:
+                for campaign_id in await BroadcastService.get_orphaned_campaign_ids():
+                    await self.start(bot, campaign_id)
+            except Exception as e:
+                logging.error(f"Broadcast resume failed: {e}")
+            await asyncio.sleep(interval)
+
+    async def close(self) -> None:
+        """Stop sending; campaigns are checkpointed and released for other processes"""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+def format_campaign_report(campaign: Dict) -> str:
+    """Campaign progress for the admin"""
+    processed = campaign[DELIVERED] + campaign[BLOCKED] + campaign[FAILED]
+    status = "завершена" if campaign["status"] == "done" else "идёт"
+    return (
+        f"📣 <b>Рассылка {campaign['_id']}</b>: {status}\n\n"
+        f"Обработано: {processed} из {campaign['total']}\n"
+        f"✅ Доставлено: {campaign[DELIVERED]}\n"
+        f"🚫 Бот заблокирован: {campaign[BLOCKED]}\n"
+        f"⚠️ Ошибки: {campaign[FAILED]}"
+    )
+
+broadcaster = Broadcaster(
+    concurrency=config.BROADCAST_CONCURRENCY,
+    checkpoint_every=config.BROADCAST_CHECKPOINT_EVERY,
+    lease=config.BROADCAST_LEASE
+)
@@ -1,24 +1,232 @@
-from lib.mongodb import get_carts_collection, get_products_collection
+from lib.mongodb import get_carts_collection
+from services.product_service import ProductService
 from typing import Optional, Dict, List
 from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError, OperationFailure
+from config.config import config
+from utils.metrics import instrument_service
+import asyncio
 import datetime
+import logging
 
+CART_TTL = datetime.timedelta(days=7)
+# Attempts of the read-and-replace fallback before giving up under contention
+CART_REPLACE_ATTEMPTS = 5
+# IndexOptionsConflict, IndexKeySpecsConflict: an index on the same keys already exists
+INDEX_CONFLICT_CODES = (85, 86)
+
+# Aggregation-pipeline stages shared by the atomic cart mutations.
+# An expired (or just upserted) cart starts over with no items and a fresh expiry.
+_CART_IS_ALIVE = {"$gt": ["$expiresAt", "$$NOW"]}
+_RESET_EXPIRED = [
+    {"$set": {
+        "items": {"$cond": [_CART_IS_ALIVE, "$items", []]},
+        "createdAt": {"$cond": [_CART_IS_ALIVE, "$createdAt", "$$NOW"]},
+        "expiresAt": {"$cond": [
+            _CART_IS_ALIVE,
+            "$expiresAt",
+            {"$add": ["$$NOW", int(CART_TTL.total_seconds() * 1000)]}
+        ]}
+    }}
+]
+_RECALCULATE_TOTALS = [
+    {"$set": {"items": {"$map": {
+        "input": "$items",
+        "as": "item",
+        "in": {"$mergeObjects": ["$$item", {"totalPrice": {"$multiply": ["$$item.price", "$$item.quantity"]}}]}
+    }}}},
+    {"$set": {
+        "totalItems": {"$sum": "$items.quantity"},
+        "totalPrice": {"$sum": "$items.totalPrice"},
+        "updatedAt": "$$NOW"
+    }}
+]
+
+def calculate_cart_totals(items: List[Dict]) -> Dict:
+    """Cart totals as computed by _RECALCULATE_TOTALS, for code running outside Mongo"""
+    total_items = 0
+    total_price = 0
+    for item in items:
+        total_items += item["quantity"]
+        total_price += item["price"] * item["quantity"]
+    return {"totalItems": total_items, "totalPrice": total_price}
+
+def _reset_expired(cart: Optional[Dict], owner: Dict, now: datetime.datetime) -> Dict:
+    """Python counterpart of _RESET_EXPIRED; a missing cart becomes a new one"""
+    if cart is not None and cart.get("expiresAt") and cart["expiresAt"] > now:
+        return dict(cart)
+    return {**(cart or owner), "items": [], "createdAt": now, "expiresAt": now + CART_TTL}
+
+def _recalculate_totals(cart: Dict, now: datetime.datetime) -> Dict:
+    """Python counterpart of _RECALCULATE_TOTALS"""
+    cart["items"] = [{**item, "totalPrice": item["price"] * item["quantity"]} for item in cart["items"]]
+    cart.update(calculate_cart_totals(cart["items"]), updatedAt=now)
+    return cart
+
+def _is_same_item(item: Dict, product_id: str, size: str, color: str) -> bool:
+    return item["productId"] == ObjectId(product_id) and item["size"] == size and item["color"] == color
+
+async def _replace_cart(query: Dict, change, upsert: bool = False) -> Optional[Dict]:
+    """Fallback for stores without pipeline updates: read, change, replace if unchanged.
+
+    ``change(cart, now)`` returns the new cart document (cart is None for a
+    missing cart when ``upsert``). The replace is conditional on the
+    ``version`` the cart was read with, so concurrent changes are retried
+    instead of lost. Returns None if there is no cart to change.
+    """
+    collection = get_carts_collection()
+    for _ in range(CART_REPLACE_ATTEMPTS):
+        cart = await collection.find_one(query)
+        if cart is None and not upsert:
+            return None
+
+        new_cart = change(cart, datetime.datetime.utcnow())
+        new_cart["version"] = (cart or {}).get("version", 0) + 1
+        if cart is None:
+            try:
+                await collection.insert_one(new_cart)
+                return new_cart
+            except DuplicateKeyError:
+                # A concurrent request created the cart first
+                continue
+
+        new_cart.pop("_id", None)
+        replaced = await collection.find_one_and_replace(
+            {"_id": cart["_id"], "version": cart.get("version")},
+            new_cart,
+            return_document=ReturnDocument.AFTER
+        )
+        if replaced is not None:
+            return replaced
+    raise RuntimeError("Cart is changed concurrently, try again")
+
+async def _create_user_cart_index(collection) -> None:
+    await collection.create_index(
+        "userId", name="userId_unique", unique=True,
+        partialFilterExpression={"userId": {"$type": "number"}}
+    )
+
+async def _merge_duplicate_carts(collection) -> None:
+    """Merge carts of one user into the latest one, so the unique index can be built.
+
+    Items of carts that have not expired are added to the kept cart; the
+    same product variant has its quantities summed.
+    """
+    duplicates = collection.aggregate([
+        {"$match": {"userId": {"$type": "number"}}},
+        {"$group": {"_id": "$userId", "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}}
+    ])
+    async for group in duplicates:
+        carts = await collection.find({"userId": group["_id"]}).sort("updatedAt", -1).to_list(None)
+        now = datetime.datetime.utcnow()
+        alive = [cart for cart in carts if cart.get("expiresAt") and cart["expiresAt"] > now]
+        kept = dict(alive[0] if alive else carts[0])
+
+        items: List[Dict] = []
+        for cart in alive:
+            for item in cart.get("items", []):
+                for i, merged in enumerate(items):
+                    if (merged["productId"], merged["size"], merged["color"]) == (item["productId"], item["size"], item["color"]):
+                        items[i] = {**merged, "quantity": merged["quantity"] + item["quantity"]}
+                        break
+                else:
+                    items.append(item)
+        if alive:
+            kept["expiresAt"] = max(cart["expiresAt"] for cart in alive)
+        kept = _recalculate_totals({**kept, "items": items}, now)
+        kept["version"] = kept.get("version", 0) + 1
+
+        await collection.replace_one({"_id": kept["_id"]}, kept)
+        await collection.delete_many({"userId": group["_id"], "_id": {"$ne": kept["_id"]}})
+        logging.info(f"Merged {group['count']} carts of user {group['_id']}")
+
+def cart_item_name(item: Dict) -> str:
+    """Item name; items saved before the compact snapshots carry it in the embedded product"""
+    return item.get("name") or item.get("product", {}).get("name", "")
+
+def _owner_query(user_id: Optional[int], session_id: Optional[str]) -> Dict:
+    """Query selecting the cart of a user or a session"""
+    if user_id:
+        return {"userId": user_id}
+    if session_id:
+        return {"sessionId": session_id}
+    return {}
+
+def _item_matches(product_id: str, size: str, color: str) -> Dict:
+    """Pipeline expression: $$item is the given product variant"""
+    return {"$and": [
+        {"$eq": ["$$item.productId", ObjectId(product_id)]},
+        {"$eq": ["$$item.size", size]},
+        {"$eq": ["$$item.color", color]}
+    ]}
+
+@instrument_service
 class CartService:
+    @staticmethod
+    async def ensure_indexes() -> None:
+        """Create cart indexes; expired carts are removed by the Mongo TTL monitor"""
+        collection = get_carts_collection()
+
+        # A unique owner index lets concurrent upserts converge on a single cart.
+        # It replaces the userId_1 index of earlier versions, which is dropped only
+        # once the unique one exists; a failure here must stop startup.
+        await _merge_duplicate_carts(collection)
+        indexes = await collection.index_information()
+        try:
+            await _create_user_cart_index(collection)
+        except OperationFailure as e:
+            if e.code not in INDEX_CONFLICT_CODES or "userId_1" not in indexes:
+                raise
+            # Servers allowing one index per key pattern need the legacy index gone first
+            await collection.drop_index("userId_1")
+            try:
+                await _create_user_cart_index(collection)
+            except Exception:
+                await collection.create_index("userId")
+                raise
+        else:
+            if "userId_1" in indexes:
+                logging.info("Replacing carts.userId_1 index with a unique one")
+                await collection.drop_index("userId_1")
+        await collection.create_index("sessionId")
+        try:
+            await collection.create_index("expiresAt", expireAfterSeconds=0)
+        except Exception as e:
+            # E.g. a plain index on expiresAt already exists; the sweeper covers this case
+            logging.warning(f"TTL index on carts.expiresAt not created: {e}")
+
+    @staticmethod
+    async def purge_expired_carts() -> int:
+        """Delete expired carts, returns number of deleted carts"""
+        collection = get_carts_collection()
+        result = await collection.delete_many({"expiresAt": {"$lt": datetime.datetime.utcnow()}})
+        return result.deleted_count
+
+    @staticmethod
+    async def run_expired_carts_sweeper(interval: int) -> None:
+        """Periodically purge expired carts for stores without TTL index support"""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                deleted = await CartService.purge_expired_carts()
+                if deleted:
+                    logging.info(f"Expired carts purged: {deleted}")
+            except Exception as e:
+                logging.error(f"Expired carts sweep failed: {e}")
+
     @staticmethod
     async def get_cart(user_id: Optional[int] = None, session_id: Optional[str] = None) -> Optional[Dict]:
         """Get cart for user or session"""
         collection = get_carts_collection()
 
-        query = {}
-        if user_id:
-            query["userId"] = user_id
-        elif session_id:
-            query["sessionId"] = session_id
-        else:
+        query = _owner_query(user_id, session_id)
+        if not query:
             return None
 
-        # Clean expired carts
-        await collection.delete_many({"expiresAt": {"$lt": datetime.datetime.utcnow()}})
+        # Expired carts are deleted by the TTL index; until then just skip them
+        query["expiresAt"] = {"$gt": datetime.datetime.utcnow()}
 
         cart = await collection.find_one(query)
         return cart
@@ -34,7 +242,7 @@ class CartService:
             "items": [],
             "totalPrice": 0,
             "totalItems": 0,
-            "expiresAt": datetime.datetime.utcnow() + datetime.timedelta(days=7),
+            "expiresAt": datetime.datetime.utcnow() + CART_TTL,
             "createdAt": datetime.datetime.utcnow(),
             "updatedAt": datetime.datetime.utcnow()
         }
@@ -52,52 +260,69 @@ class CartService:
         user_id: Optional[int] = None,
         session_id: Optional[str] = None
     ) -> Dict:
-        """Add product to cart"""
-        cart = await CartService.get_cart(user_id, session_id)
-        if not cart:
-            cart = await CartService.create_cart(user_id, session_id)
+        """Add product to cart (creates the cart if needed) in one atomic update"""
+        owner = _owner_query(user_id, session_id)
+        if not owner:
+            raise ValueError("Cart owner is not specified")
 
-        # Get product
-        products_collection = get_products_collection()
-        product = await products_collection.find_one({"_id": ObjectId(product_id), "isActive": True})
+        # Get product (usually served from the catalog cache)
+        product = await ProductService.get_product_by_id(product_id)
         if not product:
             raise ValueError("Product not found")
 
-        # Check if item already exists
-        existing_item = None
-        for item in cart["items"]:
-            if (str(item["productId"]) == product_id and
-                item["size"] == size and
-                item["color"] == color):
-                existing_item = item
-                break
-
-        if existing_item:
-            existing_item["quantity"] += quantity
-            existing_item["totalPrice"] = existing_item["quantity"] * existing_item["price"]
-        else:
-            cart_item = {
-                "productId": ObjectId(product_id),
-                "product": product,
-                "size": size,
-                "color": color,
-                "quantity": quantity,
-                "price": product["price"],
-                "totalPrice": product["price"] * quantity,
-                "addedAt": datetime.datetime.utcnow()
-            }
-            cart["items"].append(cart_item)
+        # Items keep a compact name/price snapshot; display fields are hydrated on render
+        cart_item = {
+            "productId": ObjectId(product_id),
+            "name": product["name"],
+            "size": size,
+            "color": color,
+            "quantity": quantity,
+            "price": product["price"],
+            "totalPrice": product["price"] * quantity,
+            "addedAt": datetime.datetime.utcnow()
+        }
+        if not config.CART_PIPELINE_UPDATES:
+            def add_item(cart: Optional[Dict], now: datetime.datetime) -> Dict:
+                cart = _reset_expired(cart, owner, now)
+                for i, item in enumerate(cart["items"]):
+                    if _is_same_item(item, product_id, size, color):
+                        cart["items"][i] = {**item, "quantity": item["quantity"] + quantity}
+                        break
+                else:
+                    cart["items"] = [*cart["items"], cart_item]
+                return _recalculate_totals(cart, now)
 
-        # Update totals
-        cart["totalItems"] = sum(item["quantity"] for item in cart["items"])
-        cart["totalPrice"] = sum(item["totalPrice"] for item in cart["items"])
-        cart["updatedAt"] = datetime.datetime.utcnow()
+            return await _replace_cart(owner, add_item, upsert=True)
 
-        # Save cart
-        collection = get_carts_collection()
-        await collection.replace_one({"_id": cart["_id"]}, cart)
+        is_same_item = _item_matches(product_id, size, color)
+        has_item = {"$anyElementTrue": [{"$map": {"input": "$items", "as": "item", "in": is_same_item}}]}
 
-        return cart
+        pipeline = [
+            *_RESET_EXPIRED,
+            # Increase quantity of the existing item or append a new one
+            {"$set": {"items": {"$cond": [
+                has_item,
+                {"$map": {
+                    "input": "$items",
+                    "as": "item",
+                    "in": {"$cond": [
+                        is_same_item,
+                        {"$mergeObjects": ["$$item", {"quantity": {"$add": ["$$item.quantity", quantity]}}]},
+                        "$$item"
+                    ]}
+                }},
+                {"$concatArrays": ["$items", [{"$literal": cart_item}]]}
+            ]}}},
+            *_RECALCULATE_TOTALS
+        ]
+
+        collection = get_carts_collection()
+        return await collection.find_one_and_update(
+            owner,
+            pipeline,
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
 
     @staticmethod
     async def update_cart_item(
@@ -108,33 +333,47 @@ class CartService:
         user_id: Optional[int] = None,
         session_id: Optional[str] = None
     ) -> Dict:
-        """Update cart item quantity"""
-        cart = await CartService.get_cart(user_id, session_id)
-        if not cart:
+        """Update cart item quantity (removes the item if quantity <= 0) in one atomic update"""
+        query = _owner_query(user_id, session_id)
+        if not query:
             raise ValueError("Cart not found")
 
-        # Find and update item
-        for item in cart["items"]:
-            if (str(item["productId"]) == product_id and
-                item["size"] == size and
-                item["color"] == color):
-                if quantity <= 0:
-                    cart["items"].remove(item)
-                else:
-                    item["quantity"] = quantity
-                    item["totalPrice"] = quantity * item["price"]
-                break
-        else:
-            raise ValueError("Item not found in cart")
+        query["expiresAt"] = {"$gt": datetime.datetime.utcnow()}
+        query["items"] = {"$elemMatch": {"productId": ObjectId(product_id), "size": size, "color": color}}
+
+        if not config.CART_PIPELINE_UPDATES:
+            def set_quantity(cart: Dict, now: datetime.datetime) -> Dict:
+                items = []
+                for item in cart["items"]:
+                    if not _is_same_item(item, product_id, size, color):
+                        items.append(item)
+                    elif quantity > 0:
+                        items.append({**item, "quantity": quantity})
+                return _recalculate_totals({**cart, "items": items}, now)
 
-        # Update totals
-        cart["totalItems"] = sum(item["quantity"] for item in cart["items"])
-        cart["totalPrice"] = sum(item["totalPrice"] for item in cart["items"])
-        cart["updatedAt"] = datetime.datetime.utcnow()
+            cart = await _replace_cart(query, set_quantity)
+            if not cart:
+                raise ValueError("Item not found in cart")
+            return cart
+
+        is_same_item = _item_matches(product_id, size, color)
+        if quantity <= 0:
+            items = {"$filter": {"input": "$items", "as": "item", "cond": {"$not": [is_same_item]}}}
+        else:
+            items = {"$map": {
+                "input": "$items",
+                "as": "item",
+                "in": {"$cond": [is_same_item, {"$mergeObjects": ["$$item", {"quantity": quantity}]}, "$$item"]}
+            }}
 
-        # Save cart
         collection = get_carts_collection()
-        await collection.replace_one({"_id": cart["_id"]}, cart)
+        cart = await collection.find_one_and_update(
+            query,
+            [{"$set": {"items": items}}, *_RECALCULATE_TOTALS],
+            return_document=ReturnDocument.AFTER
+        )
+        if not cart:
+            raise ValueError("Item not found in cart")
 
         return cart
 
@@ -143,11 +382,9 @@ class CartService:
         """Clear cart"""
         collection = get_carts_collection()
 
-        query = {}
-        if user_id:
-            query["userId"] = user_id
-        elif session_id:
-            query["sessionId"] = session_id
+        query = _owner_query(user_id, session_id)
+        if not query:
+            return
 
         await collection.update_one(
             query,
@@ -157,7 +394,9 @@ class CartService:
                     "totalPrice": 0,
                     "totalItems": 0,
                     "updatedAt": datetime.datetime.utcnow()
-                }
+                },
+                # A read-and-replace that read the cart before the clear must not restore it
+                "$inc": {"version": 1}
             }
         )
 
@@ -170,8 +409,7 @@ class CartService:
         summary = f"🛒 Корзина ({cart['totalItems']} товаров)\n\n"
 
         for i, item in enumerate(cart["items"], 1):
-            product = item["product"]
-            summary += f"{i}. {product['name']}\n"
+            summary += f"{i}. {cart_item_name(item)}\n"
             summary += f"   Размер: {item['size']}, Цвет: {item['color']}\n"
             summary += f"   Количество: {item['quantity']}\n"
             summary += f"   Цена: {item['totalPrice']:,} ₸\n\n"
@@ -0,0 +1,152 @@
+from lib.mongodb import get_products_collection, get_categories_collection
+from typing import Any, Dict, Hashable, Optional, Set
+from pymongo.errors import OperationFailure
+from config.config import config
+from services.search_index import search_index
+from utils.cache import TTLCache
+import asyncio
+import datetime
+import logging
+
+class CatalogCache:
+    """Process-wide cache of the product catalog.
+
+    Product documents are cached by id and versioned by their ``updatedAt``;
+    list results (pages, featured products, categories) are tagged with the
+    catalog version they were built at and become stale as soon as any
+    product or category changes. Changes come from a Mongo change stream, or
+    from polling the ``updatedAt`` watermark when change streams are not
+    available (standalone mongod in local development); polling finds
+    deleted products by comparing the set of product ids.
+    """
+
+    def __init__(self):
+        self.products = TTLCache(maxsize=config.PRODUCT_CACHE_SIZE, ttl=config.PRODUCT_CACHE_TTL)
+        self.queries = TTLCache(maxsize=config.CATALOG_QUERY_CACHE_SIZE, ttl=config.PRODUCT_CACHE_TTL)
+        self.version = 0
+        # updatedAt of every applied product, kept apart from the TTL-bound product
+        # cache, so a replayed or older copy of a product is recognised as no change
+        self._applied: Dict[str, Optional[datetime.datetime]] = {}
+        self._watermarks: Dict[str, datetime.datetime] = {}
+        self._product_ids: Optional[Set[str]] = None
+
+    def get_product(self, product_id: str) -> Optional[Dict]:
+        return self.products.get(product_id)
+
+    def set_product(self, product: Dict) -> None:
+        self.products.set(str(product["_id"]), product)
+
+    def get_query(self, key: Hashable) -> Any:
+        """Cached list result, or None if missing or built before the last catalog change"""
+        entry = self.queries.get(key)
+        if entry is None or entry[0] != self.version:
+            return None
+        return entry[1]
+
+    def set_query(self, key: Hashable, value: Any, version: int) -> None:
+        """Cache a list result built at ``version`` (read before querying Mongo)"""
+        if version == self.version:
+            self.queries.set(key, (version, value))
+
+    def apply_product_change(self, product_id: str, product: Optional[Dict]) -> None:
+        """Apply a changed (or deleted, if ``product`` is None) product document"""
+        if product is not None:
+            updated_at = product.get("updatedAt")
+            if product_id in self._applied and updated_at is not None:
+                applied_at = self._applied[product_id]
+                if applied_at is not None and updated_at <= applied_at:
+                    # Replay of an applied change (polling with $gte) or an older copy
+                    return
+            self._applied[product_id] = updated_at
+            self.products.set(product_id, product)
+            search_index.upsert(product)
+        else:
+            self._applied.pop(product_id, None)
+            self.products.pop(product_id)
+            search_index.remove(product_id)
+        self.version += 1
+
+    def invalidate(self) -> None:
+        """Drop all cached list results"""
+        self.version += 1
+
+    async def run_watcher(self, poll_interval: int) -> None:
+        """Keep the cache in sync: change stream if supported, otherwise updatedAt polling"""
+        while True:
+            try:
+                await self._watch_change_stream()
+            except OperationFailure as e:
+                logging.info(f"Catalog change stream unavailable ({e}), polling every {poll_interval}s")
+                break
+            except Exception as e:
+                logging.error(f"Catalog change stream failed: {e}")
+            await asyncio.sleep(poll_interval)
+
+        while True:
+            try:
+                await self.poll_changes()
+            except Exception as e:
+                logging.error(f"Catalog polling failed: {e}")
+            await asyncio.sleep(poll_interval)
+
+    async def _watch_change_stream(self) -> None:
+        products_collection = get_products_collection()
+        categories_collection = get_categories_collection()
+        pipeline = [{"$match": {"ns.coll": {"$in": [products_collection.name, categories_collection.name]}}}]
+
+        async with products_collection.database.watch(pipeline, full_document="updateLookup") as stream:
+            # Anything cached before the stream was opened may already be stale
+            self.invalidate()
+            async for change in stream:
+                if change["ns"]["coll"] == categories_collection.name:
+                    self.invalidate()
+                elif "documentKey" in change:
+                    self.apply_product_change(str(change["documentKey"]["_id"]), change.get("fullDocument"))
+
+    async def poll_changes(self) -> None:
+        """Apply products and categories changed since the last poll"""
+        products_collection = get_products_collection()
+        categories_collection = get_categories_collection()
+
+        if not self._watermarks:
+            # First poll only establishes the watermarks and the known product ids
+            for collection in (products_collection, categories_collection):
+                self._watermarks[collection.name] = await _latest_update(collection)
+            async for product in products_collection.find(
+                {"updatedAt": self._watermarks[products_collection.name]}, {"updatedAt": 1}
+            ):
+                self._applied[str(product["_id"])] = product["updatedAt"]
+            self._product_ids = await _product_ids(products_collection)
+            return
+
+        # $gte: documents saved within the watermark millisecond are not lost;
+        # re-applying an already applied product is a no-op (see apply_product_change)
+        watermark = self._watermarks[products_collection.name]
+        async for product in products_collection.find({"updatedAt": {"$gte": watermark}}):
+            self.apply_product_change(str(product["_id"]), product)
+            watermark = max(watermark, product.get("updatedAt") or watermark)
+        self._watermarks[products_collection.name] = watermark
+
+        # Deletes leave no updatedAt behind: compare the ids (covered by the _id index)
+        product_ids = await _product_ids(products_collection)
+        for product_id in self._product_ids - product_ids:
+            self.apply_product_change(product_id, None)
+        self._product_ids = product_ids
+
+        latest = await _latest_update(categories_collection)
+        if latest > self._watermarks[categories_collection.name]:
+            self._watermarks[categories_collection.name] = latest
+            self.invalidate()
+
+async def _latest_update(collection) -> datetime.datetime:
+    """Latest updatedAt in the collection"""
+    latest = await collection.find({}, {"updatedAt": 1}).sort("updatedAt", -1).limit(1).to_list(length=1)
+    if not latest or not latest[0].get("updatedAt"):
+        return datetime.datetime.min
+    return latest[0]["updatedAt"]
+
+async def _product_ids(collection) -> Set[str]:
+    """Ids of all products in the collection"""
+    return {str(product["_id"]) async for product in collection.find({}, {"_id": 1})}
+
+catalog_cache = CatalogCache()
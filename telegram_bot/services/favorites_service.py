@@ -0,0 +1,154 @@
+from lib.mongodb import get_users_collection
+from typing import Dict, List, Optional
+from bson import ObjectId
+from pymongo import ReturnDocument
+from redis.asyncio import Redis
+from config.config import config
+from services.product_service import ProductService
+from utils.cache import TTLCache
+from utils.metrics import instrument_service
+from utils.redis import get_redis
+import datetime
+import logging
+
+# Ordered set of favorite product ids (oldest first): dict keys give O(1) membership
+FavoriteIds = Dict[str, None]
+
+def get_favorites_collection():
+    """One document per user: {userId, productIds: [ObjectId, ...]}"""
+    return get_users_collection().database["favorites"]
+
+class FavoritesCache:
+    """Per-user favorite id sets in process memory, backed by Redis.
+
+    In Redis a set is stored as the concatenated 12-byte ObjectIds, so a
+    user with hundreds of favorites costs a few kilobytes. Every change is
+    written through from the updated Mongo document.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, use_redis: bool, prefix: str = "fav"):
+        self.sets = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.ttl = ttl
+        self.use_redis = use_redis
+        self.prefix = prefix
+
+    def _redis(self) -> Optional[Redis]:
+        return get_redis() if self.use_redis else None
+
+    async def get(self, user_id: int) -> Optional[FavoriteIds]:
+        ids = self.sets.get(user_id)
+        if ids is not None or self._redis() is None:
+            return ids
+
+        try:
+            raw = await self._redis().get(f"{self.prefix}:{user_id}")
+        except Exception as e:
+            logging.warning(f"Favorites not read from Redis: {e}")
+            return None
+        if raw is None:
+            return None
+        ids = dict.fromkeys(str(ObjectId(raw[i:i + 12])) for i in range(0, len(raw), 12))
+        self.sets.set(user_id, ids)
+        return ids
+
+    async def set(self, user_id: int, product_ids: List[ObjectId]) -> FavoriteIds:
+        ids = dict.fromkeys(str(product_id) for product_id in product_ids)
+        self.sets.set(user_id, ids)
+        if self._redis() is not None:
+            try:
+                await self._redis().set(
+                    f"{self.prefix}:{user_id}",
+                    b"".join(product_id.binary for product_id in product_ids),
+                    ex=int(self.ttl)
+                )
+            except Exception as e:
+                logging.warning(f"Favorites not written to Redis: {e}")
+        return ids
+
+favorites_cache = FavoritesCache(
+    maxsize=config.FAVORITES_CACHE_SIZE,
+    ttl=config.FAVORITES_CACHE_TTL,
+    use_redis=config.STORAGE_BACKEND == "redis"
+)
+
+@instrument_service
+class FavoritesService:
+    @staticmethod
+    async def ensure_indexes() -> None:
+        """Unique userId index: one favorites document per user"""
+        try:
+            await get_favorites_collection().create_index("userId", unique=True)
+        except Exception as e:
+            logging.warning(f"Unique favorites.userId index not created: {e}")
+
+    @staticmethod
+    async def get_favorite_ids(user_id: int) -> FavoriteIds:
+        """User favorite product ids (oldest first), from cache when possible"""
+        ids = await favorites_cache.get(user_id)
+        if ids is not None:
+            return ids
+
+        document = await get_favorites_collection().find_one({"userId": user_id}, {"productIds": 1})
+        return await favorites_cache.set(user_id, (document or {}).get("productIds", []))
+
+    @staticmethod
+    async def is_favorite(user_id: int, product_id: str) -> bool:
+        """Check whether the product is in user favorites"""
+        return product_id in await FavoritesService.get_favorite_ids(user_id)
+
+    @staticmethod
+    async def add_favorite(user_id: int, product_id: str) -> FavoriteIds:
+        """Add product to favorites (appended, no duplicates)"""
+        return await _update_favorites(user_id, {
+            "$addToSet": {"productIds": ObjectId(product_id)},
+            "$set": {"updatedAt": datetime.datetime.utcnow()}
+        })
+
+    @staticmethod
+    async def remove_favorite(user_id: int, product_id: str) -> FavoriteIds:
+        """Remove product from favorites"""
+        return await _update_favorites(user_id, {
+            "$pull": {"productIds": ObjectId(product_id)},
+            "$set": {"updatedAt": datetime.datetime.utcnow()}
+        })
+
+    @staticmethod
+    async def toggle_favorite(user_id: int, product_id: str) -> bool:
+        """Add the product if absent, remove it otherwise; returns the new state"""
+        product_oid = ObjectId(product_id)
+        product_ids = {"$ifNull": ["$productIds", []]}
+        ids = await _update_favorites(user_id, [
+            {"$set": {
+                "productIds": {"$cond": [
+                    {"$in": [product_oid, product_ids]},
+                    {"$filter": {"input": product_ids, "cond": {"$ne": ["$$this", product_oid]}}},
+                    {"$concatArrays": [product_ids, [product_oid]]}
+                ]},
+                "updatedAt": "$$NOW"
+            }}
+        ])
+        return product_id in ids
+
+    @staticmethod
+    async def get_favorite_products(user_id: int) -> List[Dict]:
+        """Active favorite products, newest first, hydrated with at most one $in query"""
+        ids = await FavoritesService.get_favorite_ids(user_id)
+        if not ids:
+            return []
+
+        products = await ProductService.get_products_by_ids(ids)
+        return [
+            products[product_id] for product_id in reversed(ids)
+            if product_id in products and products[product_id].get("isActive")
+        ]
+
+async def _update_favorites(user_id: int, update) -> FavoriteIds:
+    """Apply an update to the user favorites document and refresh the cache from the result"""
+    document = await get_favorites_collection().find_one_and_update(
+        {"userId": user_id},
+        update,
+        projection={"productIds": 1},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    return await favorites_cache.set(user_id, document.get("productIds", []))
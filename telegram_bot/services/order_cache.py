@@ -0,0 +1,124 @@
+from typing import Dict, Optional, Set
+from redis.asyncio import Redis
+from config.config import config
+from utils.cache import TTLCache
+from utils.redis import get_redis
+import asyncio
+import bson
+import logging
+
+# Statuses after which an order does not change any more (except delivered -> returned,
+# which the order tracker reports through invalidate)
+TERMINAL_STATUSES = {"delivered", "cancelled", "returned"}
+
+def order_version(order: Dict) -> tuple:
+    """Status and update time of an order; rendered texts are valid only for the same version"""
+    return order.get("orderStatus"), order.get("updatedAt")
+
+class OrderSnapshotCache:
+    """Cache of full order documents and their rendered detail texts.
+
+    Orders in a terminal status are kept without expiry, limited only by
+    the LRU size, and optionally spilled to Redis so that other replicas
+    and restarts reuse them. Active orders are kept in memory for
+    ``active_ttl`` seconds and dropped as soon as their status changes.
+    """
+
+    def __init__(self, maxsize: int, active_ttl: float, redis_ttl: int, use_redis: bool, prefix: str = "order"):
+        self.entries = TTLCache(maxsize=maxsize)
+        self.active_ttl = active_ttl
+        self.redis_ttl = redis_ttl
+        self.use_redis = use_redis
+        self.prefix = prefix
+        self._deletes: Set[asyncio.Task] = set()
+
+    def _redis(self) -> Optional[Redis]:
+        return get_redis() if self.use_redis else None
+
+    def _key(self, order_number: str) -> str:
+        return f"{self.prefix}:{order_number}"
+
+    async def get(self, order_number: str) -> Optional[Dict]:
+        """Cached entry {"order", "texts": {language: text}} or None"""
+        entry = self.entries.get(order_number)
+        if entry is not None or self._redis() is None:
+            return entry
+
+        try:
+            stored = await self._redis().hgetall(self._key(order_number))
+        except Exception as e:
+            logging.warning(f"Order snapshot not read from Redis: {e}")
+            return None
+        if not stored.get(b"doc"):
+            return None
+
+        entry = {
+            "order": bson.decode(stored.pop(b"doc")),
+            "texts": {field.decode()[len("text:"):]: text.decode() for field, text in stored.items()}
+        }
+        self.entries.set(order_number, entry)
+        return entry
+
+    async def put(self, order: Dict) -> Dict:
+        """Cache a freshly read order"""
+        entry = {"order": order, "texts": {}}
+        if order.get("orderStatus") not in TERMINAL_STATUSES:
+            self.entries.set(order["orderNumber"], entry, ttl=self.active_ttl)
+            return entry
+
+        self.entries.set(order["orderNumber"], entry)
+        # A new document replaces the hash, texts rendered from an older one go with it
+        await self._spill(order["orderNumber"], {"doc": bson.encode(order)}, replace=True)
+        return entry
+
+    async def get_text(self, order: Dict, language: str) -> Optional[str]:
+        """Rendered details of this version of the order, if cached"""
+        entry = await self.get(order["orderNumber"])
+        if entry is None or order_version(entry["order"]) != order_version(order):
+            return None
+        return entry["texts"].get(language)
+
+    async def set_text(self, order: Dict, language: str, text: str) -> None:
+        """Remember the rendered details of a cached order"""
+        entry = self.entries.get(order["orderNumber"])
+        if entry is None or order_version(entry["order"]) != order_version(order):
+            # The cached snapshot is of another version: the text would not match it
+            return
+        entry["texts"][language] = text
+        if entry["order"].get("orderStatus") in TERMINAL_STATUSES:
+            await self._spill(order["orderNumber"], {f"text:{language}": text})
+
+    async def _spill(self, order_number: str, fields: Dict, replace: bool = False) -> None:
+        redis = self._redis()
+        if redis is None:
+            return
+        try:
+            async with redis.pipeline(transaction=False) as pipe:
+                if replace:
+                    pipe.delete(self._key(order_number))
+                pipe.hset(self._key(order_number), mapping=fields)
+                pipe.expire(self._key(order_number), self.redis_ttl)
+                await pipe.execute()
+        except Exception as e:
+            logging.warning(f"Order snapshot not written to Redis: {e}")
+
+    def invalidate(self, order_number: str) -> None:
+        """Forget an order whose status has changed"""
+        self.entries.pop(order_number)
+        if self._redis() is not None:
+            task = asyncio.create_task(self._delete(order_number))
+            self._deletes.add(task)
+            task.add_done_callback(self._deletes.discard)
+
+    async def _delete(self, order_number: str) -> None:
+        try:
+            await self._redis().delete(self._key(order_number))
+        except Exception as e:
+            logging.warning(f"Order snapshot not deleted from Redis: {e}")
+
+order_snapshots = OrderSnapshotCache(
+    maxsize=config.ORDER_CACHE_SIZE,
+    active_ttl=config.ORDER_CACHE_ACTIVE_TTL,
+    redis_ttl=config.ORDER_CACHE_REDIS_TTL,
+    use_redis=config.STORAGE_BACKEND == "redis"
+)
@@ -1,27 +1,95 @@
 from lib.mongodb import get_orders_collection
-from typing import List, Optional, Dict
-import datetime
+from typing import Optional, Dict
+from services.order_cache import order_snapshots
+from utils.metrics import instrument_service
+from utils.pagination import decode_cursor, encode_cursor
+import asyncio
+import logging
 
+# Fields of the one-line order summary; items and product snapshots stay in the database
+ORDER_SUMMARY_PROJECTION = {"orderNumber": 1, "orderStatus": 1, "total": 1, "createdAt": 1}
+
+# Newest first; _id breaks ties between orders created in the same millisecond
+ORDER_LIST_SORT = [("createdAt", -1), ("_id", -1)]
+
+@instrument_service
 class OrderService:
     @staticmethod
-    async def get_user_orders(user_id: int, limit: int = 20) -> List[Dict]:
-        """Get user orders"""
+    async def ensure_indexes() -> None:
+        """Index serving the order history of a user, newest first"""
+        try:
+            await get_orders_collection().create_index([("userId", 1), *ORDER_LIST_SORT])
+        except Exception as e:
+            logging.warning(f"Orders index on (userId, createdAt) not created: {e}")
+
+    @staticmethod
+    async def get_user_orders(
+        user_id: int,
+        limit: int = 10,
+        cursor: Optional[str] = None,
+        with_total: bool = False
+    ) -> Dict:
+        """Get a page of user order summaries, newest first (keyset pagination).
+
+        ``cursor`` is the ``next_cursor`` of the previous page and leads to
+        older orders. Only ORDER_SUMMARY_PROJECTION fields are returned; the
+        full order is loaded by get_order_by_id. The number of all user
+        orders is returned as ``total`` with ``with_total=True``.
+        """
         collection = get_orders_collection()
 
-        orders = await collection.find(
-            {"userId": user_id}
-        ).sort("createdAt", -1).limit(limit).to_list(length=limit)
+        query = {"userId": user_id}
+        if cursor:
+            last_id, created_at = decode_cursor(cursor)
+            query["$or"] = [
+                {"createdAt": {"$lt": created_at}},
+                {"createdAt": created_at, "_id": {"$lt": last_id}}
+            ]
+
+        # One extra document tells whether there are older orders
+        find = collection.find(query, ORDER_SUMMARY_PROJECTION).sort(ORDER_LIST_SORT).limit(limit + 1).to_list(length=limit + 1)
+        if with_total:
+            orders, total = await asyncio.gather(find, collection.count_documents({"userId": user_id}))
+        else:
+            orders = await find
 
-        return orders
+        has_more = len(orders) > limit
+        orders = orders[:limit]
+
+        page = {
+            "orders": orders,
+            "next_cursor": encode_cursor(orders[-1]["_id"], orders[-1]["createdAt"]) if has_more else None,
+            "has_more": has_more
+        }
+        if with_total:
+            page["total"] = total
+        return page
 
     @staticmethod
     async def get_order_by_id(order_id: str, user_id: int) -> Optional[Dict]:
-        """Get order by ID for user"""
+        """Get order by ID for user (served from the snapshot cache when possible)"""
+        entry = await order_snapshots.get(order_id)
+        if entry is not None:
+            order = entry["order"]
+            return order if order.get("userId") == user_id else None
+
         collection = get_orders_collection()
 
         order = await collection.find_one({
             "orderNumber": order_id,
             "userId": user_id
         })
+        if order is not None:
+            await order_snapshots.put(order)
 
         return order
+
+    @staticmethod
+    async def get_order_status(order_id: str, user_id: int) -> Optional[Dict]:
+        """Get order number, owner and status fields of a user's order"""
+        collection = get_orders_collection()
+
+        return await collection.find_one(
+            {"orderNumber": order_id, "userId": user_id},
+            {"orderNumber": 1, "userId": 1, "orderStatus": 1, "createdAt": 1, "updatedAt": 1}
+        )
@@ -0,0 +1,187 @@
+from lib.mongodb import get_orders_collection
+from typing import Awaitable, Callable, Dict, Optional, Set
+from pymongo.errors import OperationFailure
+from config.config import config
+from services.order_cache import TERMINAL_STATUSES, order_snapshots
+from services.order_service import OrderService
+from utils.cache import TTLCache
+import asyncio
+import datetime
+import logging
+
+# Only what tracking needs; full orders are never read by the tracker
+TRACKING_PROJECTION = {"orderNumber": 1, "userId": 1, "orderStatus": 1, "createdAt": 1, "updatedAt": 1}
+
+# Notification callback: (user id, order number, new status)
+Notifier = Callable[[int, str, str], Awaitable[None]]
+
+class OrderTracker:
+    """Order status history and customer notifications about status changes.
+
+    Status changes come from a change stream on the orders collection, or
+    from polling the ``updatedAt`` watermark when change streams are not
+    available (standalone mongod in local development). Every order seen
+    gets a cached status history, so the track button is rendered without
+    reading the order again.
+
+    A transition is announced to the customer after ``merge_window``
+    seconds; transitions in between are merged into one message with the
+    latest status, and nothing is sent if the order is back to the status
+    it had before.
+    """
+
+    def __init__(self, cache_size: int, merge_window: float):
+        # No TTL: the cache is kept in sync with every status change
+        self.history = TTLCache(maxsize=cache_size)
+        self.merge_window = merge_window
+        self.notify: Optional[Notifier] = None
+        self._pending: Dict[str, Dict] = {}
+        self._senders: Set[asyncio.Task] = set()
+        self._watermark: Optional[datetime.datetime] = None
+        self._resume_token: Optional[Dict] = None
+
+    async def get_history(self, order_number: str, user_id: int) -> Optional[Dict]:
+        """Cached status history of a user's order: {"userId", "statuses": [(status, changed at)]}"""
+        entry = self.history.get(order_number)
+        if entry is None:
+            order = await OrderService.get_order_status(order_number, user_id)
+            if order is None:
+                return None
+            entry = self._remember(order)
+        if entry["userId"] != user_id:
+            return None
+        return entry
+
+    def _remember(self, order: Dict) -> Dict:
+        entry = {
+            "userId": order["userId"],
+            "statuses": [(order["orderStatus"], order.get("updatedAt") or order.get("createdAt"))]
+        }
+        self.history.set(order["orderNumber"], entry)
+        return entry
+
+    def apply_status(self, order: Dict, changed: bool = False) -> None:
+        """Apply the current status of an order.
+
+        ``changed`` - the status is known to have just been set (change
+        stream update); an order not seen before then still counts as a
+        transition, otherwise it is only remembered.
+        """
+        order_number = order.get("orderNumber")
+        status = order.get("orderStatus")
+        if not order_number or not status:
+            return
+
+        entry = self.history.get(order_number)
+        if entry is None:
+            self._remember(order)
+            if changed:
+                order_snapshots.invalidate(order_number)
+                self._queue_notification(order_number, order["userId"], None, status)
+            return
+
+        previous, changed_at = entry["statuses"][-1]
+        if previous == status:
+            return
+        if changed_at and order.get("updatedAt") and order["updatedAt"] < changed_at:
+            # An older copy of the order (e.g. from a cache) must not roll the history back
+            return
+        order_snapshots.invalidate(order_number)
+        entry["statuses"].append((status, order.get("updatedAt") or datetime.datetime.utcnow()))
+        self._queue_notification(order_number, entry["userId"], previous, status)
+
+    def _queue_notification(self, order_number: str, user_id: int, previous: Optional[str], status: str) -> None:
+        if self.notify is None:
+            return
+        pending = self._pending.get(order_number)
+        if pending is not None:
+            # A notification is already waiting: it will carry the latest status
+            pending["status"] = status
+            return
+
+        self._pending[order_number] = {"userId": user_id, "previous": previous, "status": status}
+        task = asyncio.create_task(self._send_later(order_number))
+        self._senders.add(task)
+        task.add_done_callback(self._senders.discard)
+
+    async def _send_later(self, order_number: str) -> None:
+        await asyncio.sleep(self.merge_window)
+        await self._send(order_number)
+
+    async def _send(self, order_number: str) -> None:
+        pending = self._pending.pop(order_number, None)
+        if pending is None or pending["status"] == pending["previous"]:
+            return
+        try:
+            await self.notify(pending["userId"], order_number, pending["status"])
+        except Exception as e:
+            logging.error(f"Order {order_number} status notification failed: {e}")
+
+    async def run_watcher(self, poll_interval: int) -> None:
+        """Follow order changes: change stream if supported, otherwise updatedAt polling"""
+        while True:
+            try:
+                await self._watch_change_stream()
+            except OperationFailure as e:
+                logging.info(f"Orders change stream unavailable ({e}), polling every {poll_interval}s")
+                break
+            except Exception as e:
+                logging.error(f"Orders change stream failed: {e}")
+            await asyncio.sleep(poll_interval)
+
+        while True:
+            try:
+                await self.poll_changes()
+            except Exception as e:
+                logging.error(f"Orders polling failed: {e}")
+            await asyncio.sleep(poll_interval)
+
+    async def _watch_change_stream(self) -> None:
+        pipeline = [
+            {"$match": {"$or": [
+                {"operationType": {"$in": ["insert", "replace"]}},
+                {"operationType": "update", "updateDescription.updatedFields.orderStatus": {"$exists": True}}
+            ]}},
+            {"$project": {"operationType": 1, **{f"fullDocument.{field}": 1 for field in TRACKING_PROJECTION}}}
+        ]
+        async with get_orders_collection().watch(
+            pipeline, full_document="updateLookup", resume_after=self._resume_token
+        ) as stream:
+            async for change in stream:
+                # Reconnects continue from the last seen event
+                self._resume_token = stream.resume_token
+                order = change.get("fullDocument")
+                if order:
+                    self.apply_status(order, changed=change["operationType"] == "update")
+
+    async def poll_changes(self) -> None:
+        """Apply orders changed since the last poll"""
+        collection = get_orders_collection()
+
+        if self._watermark is None:
+            # First poll: remember active orders so their next transition is recognised
+            latest = await collection.find({}, {"updatedAt": 1}).sort("updatedAt", -1).limit(1).to_list(length=1)
+            self._watermark = (latest[0].get("updatedAt") if latest else None) or datetime.datetime.min
+            async for order in collection.find(
+                {"orderStatus": {"$nin": list(TERMINAL_STATUSES)}}, TRACKING_PROJECTION
+            ):
+                self.apply_status(order)
+            return
+
+        # $gte: orders saved within the watermark millisecond are not lost;
+        # an unchanged status is ignored by apply_status
+        watermark = self._watermark
+        async for order in collection.find({"updatedAt": {"$gte": watermark}}, TRACKING_PROJECTION):
+            self.apply_status(order)
+            watermark = max(watermark, order.get("updatedAt") or watermark)
+        self._watermark = watermark
+
+    async def close(self) -> None:
+        """Send merged notifications right away instead of waiting for the window"""
+        for task in list(self._senders):
+            task.cancel()
+        await asyncio.gather(*self._senders, return_exceptions=True)
+        for order_number in list(self._pending):
+            await self._send(order_number)
+
+order_tracker = OrderTracker(config.ORDER_TRACKING_CACHE_SIZE, config.ORDER_STATUS_MERGE_WINDOW)
@@ -1,66 +1,142 @@
 from lib.mongodb import get_products_collection, get_categories_collection
-from typing import List, Dict, Optional
+from typing import Iterable, List, Dict, Optional
 from bson import ObjectId
+from services.catalog_cache import catalog_cache
+from services.search_index import search_index
+from utils.pagination import decode_cursor, encode_cursor
+from utils.metrics import instrument_service
 
+@instrument_service
 class ProductService:
     @staticmethod
-    async def get_all_products(category: Optional[str] = None, limit: int = 10, skip: int = 0) -> Dict:
-        """Get all products with optional filtering"""
+    async def ensure_indexes() -> None:
+        """Create indexes used by catalog queries"""
+        collection = get_products_collection()
+        await collection.create_index([("category", 1), ("_id", 1)])
+        # Used by the catalog cache to poll for changes
+        await collection.create_index("updatedAt")
+
+    @staticmethod
+    async def get_all_products(
+        category: Optional[str] = None,
+        limit: int = 10,
+        cursor: Optional[str] = None,
+        with_total: bool = False
+    ) -> Dict:
+        """Get a page of products ordered by _id (keyset pagination).
+
+        ``cursor`` is the ``next_cursor`` of the previous page. The exact
+        ``total`` is only computed with ``with_total=True`` (one $facet query).
+        """
+        cache_key = ("products", category, limit, cursor, with_total)
+        page = catalog_cache.get_query(cache_key)
+        if page is not None:
+            return page
+        version = catalog_cache.version
+
         collection = get_products_collection()
 
         query = {"isActive": True}
         if category:
             query["category"] = category
 
-        total = await collection.count_documents(query)
-        products = await collection.find(query).skip(skip).limit(limit).to_list(length=limit)
+        page_query = {}
+        if cursor:
+            last_id, _ = decode_cursor(cursor)
+            page_query["_id"] = {"$gt": last_id}
+
+        # One extra document tells whether there is a next page
+        if with_total:
+            result = await collection.aggregate([
+                {"$match": query},
+                {"$facet": {
+                    "products": [{"$match": page_query}, {"$sort": {"_id": 1}}, {"$limit": limit + 1}],
+                    "total": [{"$count": "count"}]
+                }}
+            ]).to_list(length=1)
+            products = result[0]["products"]
+            total = result[0]["total"][0]["count"] if result[0]["total"] else 0
+        else:
+            products = await collection.find({**query, **page_query}).sort("_id", 1).limit(limit + 1).to_list(length=limit + 1)
 
-        return {
+        has_more = len(products) > limit
+        products = products[:limit]
+
+        page = {
             "products": products,
-            "total": total,
-            "has_more": (skip + limit) < total
+            "next_cursor": encode_cursor(products[-1]["_id"]) if has_more else None,
+            "has_more": has_more
         }
+        if with_total:
+            page["total"] = total
+
+        catalog_cache.set_query(cache_key, page, version)
+        return page
 
     @staticmethod
     async def get_product_by_id(product_id: str) -> Optional[Dict]:
-        """Get product by ID"""
-        collection = get_products_collection()
-        try:
-            product = await collection.find_one({
-                "_id": ObjectId(product_id),
-                "isActive": True
-            })
-            return product
-        except:
+        """Get active product by ID"""
+        if not ObjectId.is_valid(product_id):
             return None
 
+        product = catalog_cache.get_product(product_id)
+        if product is None:
+            collection = get_products_collection()
+            product = await collection.find_one({"_id": ObjectId(product_id)})
+            if product is None:
+                return None
+            catalog_cache.set_product(product)
+
+        return product if product.get("isActive") else None
+
     @staticmethod
-    async def search_products(query: str, limit: int = 10) -> List[Dict]:
-        """Search products by name or description"""
-        collection = get_products_collection()
+    async def get_products_by_ids(product_ids: Iterable) -> Dict[str, Dict]:
+        """Get products (including inactive ones) by ids with one $in query for cache misses"""
+        products = {}
+        missing = []
+        for product_id in {str(product_id) for product_id in product_ids}:
+            product = catalog_cache.get_product(product_id)
+            if product is not None:
+                products[product_id] = product
+            elif ObjectId.is_valid(product_id):
+                missing.append(ObjectId(product_id))
 
-        search_query = {
-            "isActive": True,
-            "$or": [
-                {"name": {"$regex": query, "$options": "i"}},
-                {"description": {"$regex": query, "$options": "i"}},
-                {"tags": {"$in": [query]}}
-            ]
-        }
+        if missing:
+            collection = get_products_collection()
+            async for product in collection.find({"_id": {"$in": missing}}):
+                catalog_cache.set_product(product)
+                products[str(product["_id"])] = product
 
-        products = await collection.find(search_query).limit(limit).to_list(length=limit)
         return products
 
+    @staticmethod
+    async def search_products(query: str, limit: int = 10) -> List[Dict]:
+        """Search active products by name, description and tags (in-memory index)"""
+        await search_index.ensure_loaded()
+        return search_index.search(query, limit)
+
     @staticmethod
     async def get_categories() -> List[Dict]:
         """Get all active categories"""
+        categories = catalog_cache.get_query(("categories",))
+        if categories is not None:
+            return categories
+        version = catalog_cache.version
+
         collection = get_categories_collection()
         categories = await collection.find({"isActive": True}).sort("sortOrder", 1).to_list(length=100)
+
+        catalog_cache.set_query(("categories",), categories, version)
         return categories
 
     @staticmethod
     async def get_featured_products(limit: int = 5) -> List[Dict]:
         """Get featured products (high rating)"""
+        products = catalog_cache.get_query(("featured", limit))
+        if products is not None:
+            return products
+        version = catalog_cache.version
+
         collection = get_products_collection()
 
         products = await collection.find({
@@ -68,4 +144,5 @@ class ProductService:
             "rating": {"$gte": 4.5}
         }).sort("rating", -1).limit(limit).to_list(length=limit)
 
+        catalog_cache.set_query(("featured", limit), products, version)
         return products
@@ -0,0 +1,154 @@
+from lib.mongodb import get_products_collection
+from typing import Dict, Iterable, List, Optional
+import asyncio
+import bisect
+import logging
+import re
+
+# Kazakh-specific letters are folded into their closest Russian counterparts
+_KAZAKH_TO_RUSSIAN = str.maketrans({
+    "ә": "а", "ғ": "г", "қ": "к", "ң": "н", "ө": "о",
+    "ұ": "у", "ү": "у", "һ": "х", "і": "и", "ё": "е"
+})
+
+# Cyrillic is transliterated to Latin so that "костюм" and "kostyum" meet
+_CYRILLIC_TO_LATIN = str.maketrans({
+    "а": "a", "б": "b", "в": "v", "г": "g", "д": "d", "е": "e", "ж": "zh",
+    "з": "z", "и": "i", "й": "i", "к": "k", "л": "l", "м": "m", "н": "n",
+    "о": "o", "п": "p", "р": "r", "с": "s", "т": "t", "у": "u", "ф": "f",
+    "х": "h", "ц": "ts", "ч": "ch", "ш": "sh", "щ": "sch", "ъ": "", "ы": "y",
+    "ь": "", "э": "e", "ю": "yu", "я": "ya"
+})
+
+_TOKEN_RE = re.compile(r"\w+")
+
+# Relevance weight of a token depending on the field it comes from
+FIELD_WEIGHTS = {"name": 3.0, "tags": 2.0, "description": 1.0}
+# Share of the weight a token gets when matched by prefix only
+PREFIX_MATCH_FACTOR = 0.5
+MIN_PREFIX_LENGTH = 2
+
+def normalize(text: str) -> str:
+    """Fold case, ё/е, Kazakh letters and Cyrillic/Latin script into one form"""
+    return text.lower().translate(_KAZAKH_TO_RUSSIAN).translate(_CYRILLIC_TO_LATIN)
+
+def tokenize(text: str) -> List[str]:
+    """Split text into normalized tokens"""
+    return _TOKEN_RE.findall(normalize(text))
+
+class SearchIndex:
+    """In-memory inverted index over active products (name, description, tags).
+
+    Supports prefix matching and relevance ranking; kept up to date
+    incrementally via ``upsert``/``remove``, fed by the catalog cache watcher
+    and its polling fallback.
+    """
+
+    def __init__(self):
+        self._lock = asyncio.Lock()
+        self._reset()
+
+    def _reset(self) -> None:
+        self._postings: Dict[str, Dict[str, float]] = {}
+        self._doc_tokens: Dict[str, Dict[str, float]] = {}
+        self._products: Dict[str, Dict] = {}
+        self._vocabulary: List[str] = []
+        self.loaded = False
+
+    def __len__(self) -> int:
+        return len(self._products)
+
+    def upsert(self, product: Dict) -> None:
+        """Index product or drop it from the index if it is inactive"""
+        product_id = str(product["_id"])
+        self.remove(product_id)
+
+        if not product.get("isActive", False):
+            return
+
+        token_weights: Dict[str, float] = {}
+        fields = {
+            "name": product.get("name") or "",
+            "description": product.get("description") or "",
+            "tags": " ".join(product.get("tags") or [])
+        }
+        for field, text in fields.items():
+            for token in tokenize(text):
+                token_weights[token] = max(token_weights.get(token, 0.0), FIELD_WEIGHTS[field])
+
+        for token, weight in token_weights.items():
+            postings = self._postings.get(token)
+            if postings is None:
+                postings = self._postings[token] = {}
+                bisect.insort(self._vocabulary, token)
+            postings[product_id] = weight
+
+        self._doc_tokens[product_id] = token_weights
+        self._products[product_id] = product
+
+    def remove(self, product_id: str) -> None:
+        """Remove product from the index"""
+        self._products.pop(product_id, None)
+        for token in self._doc_tokens.pop(product_id, {}):
+            postings = self._postings[token]
+            del postings[product_id]
+            if not postings:
+                del self._postings[token]
+                del self._vocabulary[bisect.bisect_left(self._vocabulary, token)]
+
+    def _prefix_tokens(self, prefix: str) -> Iterable[str]:
+        position = bisect.bisect_left(self._vocabulary, prefix)
+        while position < len(self._vocabulary) and self._vocabulary[position].startswith(prefix):
+            yield self._vocabulary[position]
+            position += 1
+
+    def search(self, query: str, limit: int = 10) -> List[Dict]:
+        """Products matching every query token (exactly or by prefix), best first"""
+        query_tokens = tokenize(query)
+        if not query_tokens:
+            return []
+
+        scores: Optional[Dict[str, float]] = None
+        for query_token in query_tokens:
+            token_scores = dict(self._postings.get(query_token, {}))
+            if len(query_token) >= MIN_PREFIX_LENGTH:
+                for token in self._prefix_tokens(query_token):
+                    if token == query_token:
+                        continue
+                    for product_id, weight in self._postings[token].items():
+                        score = weight * PREFIX_MATCH_FACTOR
+                        if score > token_scores.get(product_id, 0.0):
+                            token_scores[product_id] = score
+
+            if scores is None:
+                scores = token_scores
+            else:
+                scores = {
+                    product_id: score + token_scores[product_id]
+                    for product_id, score in scores.items()
+                    if product_id in token_scores
+                }
+            if not scores:
+                return []
+
+        ranked = sorted(
+            scores,
+            key=lambda product_id: (-scores[product_id], -self._products[product_id].get("rating", 0))
+        )
+        return [self._products[product_id] for product_id in ranked[:limit]]
+
+    async def load(self) -> None:
+        """Build the index from all active products"""
+        async with self._lock:
+            collection = get_products_collection()
+            self._reset()
+            async for product in collection.find({"isActive": True}):
+                self.upsert(product)
+            self.loaded = True
+            logging.info(f"Search index built: {len(self)} products")
+
+    async def ensure_loaded(self) -> None:
+        if not self.loaded:
+            await self.load()
+
+search_index = SearchIndex()
@@ -1,40 +1,164 @@
 from lib.mongodb import get_users_collection
-from typing import Optional, Dict
+from typing import Optional, Dict, List
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from config.config import config
+from utils.cache import TTLCache
+from utils.metrics import instrument_service
+import asyncio
 import datetime
+import logging
 
-class UserService:
-    @staticmethod
-    async def create_or_update_user(telegram_data: Dict) -> Dict:
-        """Create or update user from Telegram data"""
-        collection = get_users_collection()
+# Profile fields handlers render from; addresses and history are never loaded per update
+USER_PROFILE_PROJECTION = {
+    "telegramId": 1, "username": 1, "fullName": 1, "phone": 1, "email": 1,
+    "language": 1, "notificationsEnabled": 1
+}
+
+# Settings stored as top-level user fields, written by update_user_settings
+USER_SETTINGS_FIELDS = frozenset({"language", "notificationsEnabled"})
+
+def _profile_fields(telegram_data: Dict) -> Dict:
+    """Profile fields taken from Telegram on every contact"""
+    return {
+        "username": telegram_data.get("username"),
+        "fullName": f"{telegram_data.get('first_name', '')} {telegram_data.get('last_name', '')}".strip()
+    }
 
-        user_data = {
-            "telegramId": telegram_data["id"],
-            "username": telegram_data.get("username"),
-            "fullName": f"{telegram_data.get('first_name', '')} {telegram_data.get('last_name', '')}".strip(),
+def _user_upsert(fields: Dict, now: datetime.datetime) -> Dict:
+    """Update document for a user touch; a new user gets the default settings.
+
+    Settings chosen by the user (language, notifications) are never
+    overwritten, they are only set on insert.
+    """
+    update_fields = dict(fields)
+    if update_fields.keys() - {"lastSeenAt"}:
+        update_fields["updatedAt"] = now
+    return {
+        "$set": update_fields,
+        "$setOnInsert": {
             "language": "ru",
             "notificationsEnabled": True,
-            "updatedAt": datetime.datetime.utcnow()
+            "createdAt": now
         }
+    }
+
+class UserActivityBuffer:
+    """Write-behind buffer for profile and last-seen touches.
+
+    Touches are merged per user in memory (the latest value of each field
+    wins) and written with a single unordered bulk upsert, either every
+    flush interval or as soon as ``max_size`` users are pending.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._pending: Dict[int, Dict] = {}
+        self._full = asyncio.Event()
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def touch(self, telegram_id: int, telegram_data: Optional[Dict] = None) -> None:
+        """Record user activity (and the current Telegram profile, if given)"""
+        fields = self._pending.get(telegram_id)
+        if fields is None:
+            fields = self._pending[telegram_id] = {}
+        if telegram_data is not None:
+            fields.update(_profile_fields(telegram_data))
+        fields["lastSeenAt"] = datetime.datetime.utcnow()
+
+        if len(self._pending) >= self.max_size:
+            self._full.set()
+
+    async def flush(self) -> int:
+        """Write pending touches, returns number of flushed users"""
+        if not self._pending:
+            return 0
+
+        pending, self._pending = self._pending, {}
+        self._full.clear()
+
+        now = datetime.datetime.utcnow()
+        requests = [
+            UpdateOne({"telegramId": telegram_id}, _user_upsert(fields, now), upsert=True)
+            for telegram_id, fields in pending.items()
+        ]
+        try:
+            await get_users_collection().bulk_write(requests, ordered=False)
+        except BulkWriteError as e:
+            # E.g. a duplicate key from a concurrent first /start; such a touch is simply dropped
+            logging.warning(f"User activity flush: {len(e.details.get('writeErrors', []))} writes failed")
+        except Exception:
+            # Keep the touches for the next flush; newer touches win
+            for telegram_id, fields in pending.items():
+                self._pending[telegram_id] = {**fields, **self._pending.get(telegram_id, {})}
+            raise
+        return len(requests)
+
+    async def run_flusher(self, interval: float) -> None:
+        """Flush pending touches periodically or when the buffer is full"""
+        while True:
+            try:
+                await asyncio.wait_for(self._full.wait(), timeout=interval)
+            except asyncio.TimeoutError:
+                pass
+            try:
+                await self.flush()
+            except Exception as e:
+                logging.error(f"User activity flush failed: {e}")
+
+user_activity = UserActivityBuffer(config.USER_ACTIVITY_BUFFER_SIZE)
+
+# Per-user profiles; dropped on every settings write, the TTL bounds staleness across replicas
+user_profiles = TTLCache(maxsize=config.USER_PROFILE_CACHE_SIZE, ttl=config.USER_PROFILE_CACHE_TTL)
+
+@instrument_service
+class UserService:
+    @staticmethod
+    async def ensure_indexes() -> None:
+        """Unique telegramId index: concurrent upserts converge on a single user"""
+        try:
+            await get_users_collection().create_index("telegramId", unique=True)
+        except Exception as e:
+            logging.warning(f"Unique users.telegramId index not created: {e}")
+
+    @staticmethod
+    async def create_or_update_user(telegram_data: Dict) -> Dict:
+        """Create or update user from Telegram data in a single atomic upsert"""
+        collection = get_users_collection()
 
-        # Try to find existing user
-        existing_user = await collection.find_one({"telegramId": telegram_data["id"]})
+        now = datetime.datetime.utcnow()
+        update = _user_upsert({**_profile_fields(telegram_data), "lastSeenAt": now}, now)
 
-        if existing_user:
-            # Update existing user
-            await collection.update_one(
+        user_profiles.pop(telegram_data["id"])
+        try:
+            return await collection.find_one_and_update(
                 {"telegramId": telegram_data["id"]},
-                {"$set": user_data}
+                update,
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            # Another request inserted the user first; now the update matches it
+            return await collection.find_one_and_update(
+                {"telegramId": telegram_data["id"]},
+                update,
+                return_document=ReturnDocument.AFTER
             )
-            user_data["_id"] = existing_user["_id"]
-            user_data["createdAt"] = existing_user["createdAt"]
-            return user_data
-        else:
-            # Create new user
-            user_data["createdAt"] = datetime.datetime.utcnow()
-            result = await collection.insert_one(user_data)
-            user_data["_id"] = result.inserted_id
-            return user_data
+
+    @staticmethod
+    async def get_user_profile(telegram_id: int) -> Optional[Dict]:
+        """User profile (settings and contacts) from cache, read once per TTL otherwise"""
+        profile = user_profiles.get(telegram_id)
+        if profile is not None:
+            return profile
+
+        profile = await get_users_collection().find_one({"telegramId": telegram_id}, USER_PROFILE_PROJECTION)
+        if profile is not None:
+            # Unknown users are not cached: the activity buffer creates them shortly
+            user_profiles.set(telegram_id, profile)
+        return profile
 
     @staticmethod
     async def get_user_by_telegram_id(telegram_id: int) -> Optional[Dict]:
@@ -45,7 +169,7 @@ class UserService:
 
     @staticmethod
     async def update_user_preferences(telegram_id: int, preferences: Dict) -> None:
-        """Update user preferences"""
+        """Replace the user's preferences subdocument"""
         collection = get_users_collection()
 
         await collection.update_one(
@@ -59,8 +183,33 @@ class UserService:
         )
 
     @staticmethod
-    async def add_user_address(telegram_id: int, address: Dict) -> None:
-        """Add address to user"""
+    async def update_user_settings(telegram_id: int, settings: Dict) -> Optional[Dict]:
+        """Update top-level profile settings, e.g. {"language": "kk"}; returns the new profile"""
+        unknown = settings.keys() - USER_SETTINGS_FIELDS
+        if unknown:
+            raise ValueError(f"Unknown user settings: {sorted(unknown)}")
+
+        return await _update_profile(telegram_id, {
+            "$set": {
+                **settings,
+                "updatedAt": datetime.datetime.utcnow()
+            }
+        })
+
+    @staticmethod
+    async def toggle_notifications(telegram_id: int) -> Optional[Dict]:
+        """Flip notificationsEnabled in one atomic update; returns the new profile"""
+        return await _update_profile(telegram_id, [
+            {"$set": {
+                # A missing flag means enabled, so it becomes disabled
+                "notificationsEnabled": {"$eq": [{"$ifNull": ["$notificationsEnabled", True]}, False]},
+                "updatedAt": "$$NOW"
+            }}
+        ])
+
+    @staticmethod
+    async def add_user_address(telegram_id: int, address: Dict) -> Optional[List[Dict]]:
+        """Add address to user in one update; returns the new address list"""
         collection = get_users_collection()
 
         address_data = {
@@ -68,17 +217,35 @@ class UserService:
             **address
         }
 
-        # If this is default address, unset other defaults
+        addresses = {"$ifNull": ["$addresses", []]}
         if address_data.get("isDefault"):
-            await collection.update_one(
-                {"telegramId": telegram_id},
-                {"$unset": {"addresses.$[].isDefault": False}}
-            )
+            # The new default address replaces the previous one
+            addresses = {"$map": {"input": addresses, "in": {"$mergeObjects": ["$$this", {"isDefault": False}]}}}
 
-        await collection.update_one(
+        user = await collection.find_one_and_update(
             {"telegramId": telegram_id},
-            {
-                "$push": {"addresses": address_data},
-                "$set": {"updatedAt": datetime.datetime.utcnow()}
-            }
+            [
+                {"$set": {
+                    # $literal: user input starting with "$" must not be read as a field path
+                    "addresses": {"$concatArrays": [addresses, {"$literal": [address_data]}]},
+                    "updatedAt": "$$NOW"
+                }}
+            ],
+            projection={"addresses": 1},
+            return_document=ReturnDocument.AFTER
         )
+        return None if user is None else user["addresses"]
+
+async def _update_profile(telegram_id: int, update) -> Optional[Dict]:
+    """Apply a settings update and put the resulting profile into the cache"""
+    profile = await get_users_collection().find_one_and_update(
+        {"telegramId": telegram_id},
+        update,
+        projection=USER_PROFILE_PROJECTION,
+        return_document=ReturnDocument.AFTER
+    )
+    if profile is None:
+        user_profiles.pop(telegram_id)
+    else:
+        user_profiles.set(telegram_id, profile)
+    return profile
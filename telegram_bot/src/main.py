@@ -1,34 +1,195 @@
 import asyncio
+import functools
 import logging
+from typing import Set
+from aiohttp import web
 from aiogram import Bot, Dispatcher
 from aiogram.client.default import DefaultBotProperties
 from aiogram.enums import ParseMode
+from aiogram.fsm.storage.base import BaseStorage
+from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
 
 from config.config import config
 from handlers import register_all_handlers
+from handlers.orders import notify_order_status
 from lib.mongodb import MongoDB
+from middlewares import register_all_middlewares
+from middlewares.metrics import TelegramMetricsMiddleware
+from services.broadcast_service import BroadcastService, broadcaster
+from services.cart_service import CartService
+from services.catalog_cache import catalog_cache
+from services.favorites_service import FavoritesService
+from services.order_service import OrderService
+from services.order_tracking import order_tracker
+from services.product_service import ProductService
+from services.search_index import search_index
+from services.user_service import UserService, user_activity
+from src.sharding import run_sharded
+from utils.fsm_storage import CompactRedisStorage
 from utils.logger import setup_logger
+from utils.metrics import start_metrics_server
+from utils.outbound import OutboundSchedulerMiddleware, outbound_scheduler
+from utils.redis import close_redis, get_redis
 
-async def main():
-    # Настройка логирования
-    setup_logger()
+# Фоновые задачи, живущие всё время работы бота
+background_tasks: Set[asyncio.Task] = set()
 
-    # Подключение к MongoDB
-    await MongoDB.connect()
+def create_storage() -> BaseStorage:
+    """FSM-хранилище согласно STORAGE_BACKEND"""
+    if config.STORAGE_BACKEND == "redis":
+        return CompactRedisStorage(get_redis(), ttl=config.FSM_TTL)
+    return MemoryStorage()
 
-    # Инициализация бота и диспетчера
+async def on_startup(bot: Bot):
+    """Подготовка БД и запуск фоновых задач"""
+    await CartService.ensure_indexes()
+    await ProductService.ensure_indexes()
+    await UserService.ensure_indexes()
+    await OrderService.ensure_indexes()
+    await BroadcastService.ensure_indexes()
+    await FavoritesService.ensure_indexes()
+
+    if config.CART_SWEEPER_INTERVAL:
+        background_tasks.add(asyncio.create_task(
+            CartService.run_expired_carts_sweeper(config.CART_SWEEPER_INTERVAL)
+        ))
+
+    # Поисковый индекс и кэш каталога обновляются по изменениям товаров
+    await search_index.load()
+    background_tasks.add(asyncio.create_task(
+        catalog_cache.run_watcher(config.CATALOG_POLL_INTERVAL)
+    ))
+
+    # Отметки активности пользователей пишутся пачками
+    background_tasks.add(asyncio.create_task(
+        user_activity.run_flusher(config.USER_ACTIVITY_FLUSH_INTERVAL)
+    ))
+
+    # История статусов заказов и уведомления покупателей о смене статуса
+    if config.ORDER_NOTIFICATIONS:
+        order_tracker.notify = functools.partial(notify_order_status, bot)
+    background_tasks.add(asyncio.create_task(
+        order_tracker.run_watcher(config.ORDER_POLL_INTERVAL)
+    ))
+
+    # Продолжаем рассылки, прерванные остановкой этого или другого процесса
+    background_tasks.add(asyncio.create_task(
+        broadcaster.run_resumer(bot, config.BROADCAST_LEASE)
+    ))
+
+async def on_shutdown():
+    """Остановка фоновых задач"""
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    background_tasks.clear()
+
+    # Уведомления и рассылки отправляются до остановки очереди исходящих сообщений
+    await order_tracker.close()
+    await broadcaster.close()
+    await outbound_scheduler.close()
+
+    # Не теряем накопленные отметки активности
+    try:
+        await user_activity.flush()
+    except Exception as e:
+        logging.error(f"User activity flush on shutdown failed: {e}")
+
+async def on_webhook_startup(bot: Bot, dispatcher: Dispatcher):
+    """Регистрация webhook в Telegram при старте сервера"""
+    await bot.set_webhook(
+        url=f"{config.WEBHOOK_URL.rstrip('/')}{config.WEBHOOK_PATH}",
+        secret_token=config.WEBHOOK_SECRET or None,
+        allowed_updates=dispatcher.resolve_used_update_types()
+    )
+    logging.info(f"Webhook установлен: {config.WEBHOOK_URL}{config.WEBHOOK_PATH}")
+
+async def run_polling(dp: Dispatcher, bot: Bot):
+    """Запуск бота в режиме long polling"""
+    # Снимаем webhook, если он остался от предыдущего запуска
+    await bot.delete_webhook()
+
+    logging.info("Бот запущен в режиме polling!")
+    await dp.start_polling(bot, allowed_updates=dp.resolve_used_update_types())
+
+async def run_webhook(dp: Dispatcher, bot: Bot):
+    """Запуск aiohttp-сервера, принимающего обновления на WEBHOOK_PATH.
+
+    Сервер рассчитан на работу за reverse proxy (nginx и т.п.), который
+    терминирует TLS и проксирует WEBHOOK_PATH на WEBHOOK_HOST:WEBHOOK_PORT.
+    """
+    dp.startup.register(on_webhook_startup)
+
+    app = web.Application()
+    SimpleRequestHandler(
+        dispatcher=dp,
+        bot=bot,
+        # В фоне Telegram сразу получает 200 OK; иначе обработчик может
+        # вернуть метод API, который уйдёт прямо в ответе на webhook
+        handle_in_background=not config.WEBHOOK_IN_REQUEST,
+        secret_token=config.WEBHOOK_SECRET or None
+    ).register(app, path=config.WEBHOOK_PATH)
+    setup_application(app, dp, bot=bot)
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, host=config.WEBHOOK_HOST, port=config.WEBHOOK_PORT)
+    await site.start()
+
+    logging.info(f"Бот запущен в режиме webhook на {config.WEBHOOK_HOST}:{config.WEBHOOK_PORT}!")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+
+def create_bot() -> Bot:
+    """Бот с HTML-разметкой по умолчанию, очередью исходящих сообщений и замером запросов к Bot API"""
     bot = Bot(
         token=config.BOT_TOKEN,
         default=DefaultBotProperties(parse_mode=ParseMode.HTML)
     )
-    dp = Dispatcher()
+    # Очередь - внешний слой: в метрики Bot API попадает время запроса без ожидания в очереди
+    bot.session.middleware(OutboundSchedulerMiddleware(outbound_scheduler))
+    bot.session.middleware(TelegramMetricsMiddleware())
+    return bot
+
+def create_dispatcher() -> Dispatcher:
+    """Диспетчер со всеми middleware, обработчиками и фоновыми задачами"""
+    dp = Dispatcher(storage=create_storage())
+    dp.startup.register(on_startup)
+    dp.shutdown.register(on_shutdown)
+    dp.shutdown.register(close_redis)
 
-    # Регистрация всех обработчиков
+    # Регистрация middleware и всех обработчиков
+    register_all_middlewares(dp)
     register_all_handlers(dp)
+    return dp
+
+async def main():
+    # Настройка логирования
+    setup_logger()
+
+    # Несколько процессов-обработчиков: этот процесс только принимает обновления
+    if config.SHARD_WORKERS > 1:
+        await run_sharded(config.SHARD_WORKERS)
+        return
+
+    # Подключение к MongoDB
+    await MongoDB.connect()
+
+    # Инициализация бота и диспетчера
+    bot = create_bot()
+    if config.METRICS_PORT:
+        start_metrics_server(config.METRICS_PORT, config.METRICS_HOST)
+        logging.info(f"Метрики Prometheus: http://{config.METRICS_HOST}:{config.METRICS_PORT}/metrics")
+    dp = create_dispatcher()
 
-    # Запуск бота
-    logging.info("Бот запущен!")
-    await dp.start_polling(bot)
+    # Запуск бота: webhook, если задан WEBHOOK_URL, иначе polling
+    if config.WEBHOOK_URL:
+        await run_webhook(dp, bot)
+    else:
+        await run_polling(dp, bot)
 
 if __name__ == "__main__":
     asyncio.run(main())
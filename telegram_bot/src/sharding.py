@@ -0,0 +1,306 @@
+"""
+Шардированный режим: один процесс принимает обновления (webhook или polling)
+и раскладывает их по N процессам-обработчикам по user id. Обновления одного
+пользователя всегда попадают в один процесс и обрабатываются строго по
+очереди, обновления разных пользователей - параллельно.
+
+Каждый процесс-обработчик сам подключается к MongoDB и Redis (у каждого свой
+пул соединений) и отвечает в Telegram от своего экземпляра Bot. Ограничения
+частоты и дедупликация должны работать через Redis (STORAGE_BACKEND=redis),
+чтобы общие лимиты действовали на все процессы.
+"""
+
+import asyncio
+import functools
+import logging
+import multiprocessing
+import queue
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+from aiohttp import web
+from aiogram import Bot
+
+from config.config import config
+
+# Признак завершения для процесса-обработчика
+_STOP = None
+# Как долго ждать места в очереди, прежде чем снова проверить, жив ли процесс, сек
+PUT_TIMEOUT = 1.0
+
+class WorkerCrashed(RuntimeError):
+    """Процесс-обработчик падает слишком часто"""
+
+def shard_key(update: Dict[str, Any]) -> int:
+    """Ключ шардирования: id пользователя, иначе id чата, иначе update_id"""
+    for value in update.values():
+        if not isinstance(value, dict):
+            continue
+        user = value.get("from") or value.get("user")
+        if isinstance(user, dict) and "id" in user:
+            return user["id"]
+        chat = value.get("chat") or (value.get("message") or {}).get("chat")
+        if isinstance(chat, dict) and "id" in chat:
+            return chat["id"]
+    return update.get("update_id", 0)
+
+class UserSequencer:
+    """Параллельная обработка с сохранением порядка внутри ключа.
+
+    Задача ключа ждёт завершения предыдущей задачи того же ключа; число
+    одновременно выполняемых задач ограничено ``max_concurrency``.
+    """
+
+    def __init__(self, max_concurrency: int):
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self._tails: Dict[int, asyncio.Task] = {}
+
+    async def submit(self, key: int, coro: Awaitable) -> None:
+        """Поставить задачу в очередь ключа (ждёт, если заняты все слоты)"""
+        await self._slots.acquire()
+        previous = self._tails.get(key)
+        task = asyncio.create_task(self._run(previous, coro))
+        self._tails[key] = task
+        task.add_done_callback(lambda done: self._forget(key, done))
+
+    def _forget(self, key: int, task: asyncio.Task) -> None:
+        if self._tails.get(key) is task:
+            del self._tails[key]
+
+    async def _run(self, previous: Optional[asyncio.Task], coro: Awaitable) -> None:
+        try:
+            if previous is not None:
+                await asyncio.wait([previous])
+            await coro
+        except Exception as e:
+            logging.exception(f"Ошибка обработки обновления: {e}")
+        finally:
+            self._slots.release()
+
+    async def drain(self) -> None:
+        """Дождаться всех поставленных задач"""
+        while self._tails:
+            await asyncio.gather(*self._tails.values(), return_exceptions=True)
+
+def run_worker(index: int, updates: multiprocessing.Queue) -> None:
+    """Точка входа процесса-обработчика"""
+    asyncio.run(_worker_main(index, updates))
+
+async def _worker_main(index: int, updates: multiprocessing.Queue) -> None:
+    from lib.mongodb import MongoDB
+    from src.main import create_bot, create_dispatcher
+    from utils.logger import setup_logger
+    from utils.metrics import start_metrics_server
+
+    setup_logger()
+    # Очистка просроченных корзин и уведомления о заказах нужны только в одном процессе
+    if index > 0:
+        config.CART_SWEEPER_INTERVAL = 0
+        config.ORDER_NOTIFICATIONS = False
+
+    await MongoDB.connect()
+    bot = create_bot()
+    dp = create_dispatcher()
+    if config.METRICS_PORT:
+        # Каждый процесс отдаёт свои метрики на отдельном порту
+        start_metrics_server(config.METRICS_PORT + index + 1, config.METRICS_HOST)
+
+    await dp.emit_startup(bot=bot, dispatcher=dp)
+    logging.info(f"Обработчик #{index} запущен")
+
+    loop = asyncio.get_running_loop()
+    sequencer = UserSequencer(config.SHARD_WORKER_CONCURRENCY)
+    try:
+        while True:
+            item = await loop.run_in_executor(None, updates.get)
+            if item is _STOP:
+                break
+            key, update = item
+            await sequencer.submit(key, dp.feed_raw_update(bot, update))
+        await sequencer.drain()
+    finally:
+        await dp.emit_shutdown(bot=bot, dispatcher=dp)
+        await bot.session.close()
+        logging.info(f"Обработчик #{index} остановлен")
+
+class ShardRouter:
+    """Раскладывает обновления по очередям процессов-обработчиков и следит за процессами.
+
+    ``spawn(index)`` запускает процесс-обработчик и возвращает его очередь и
+    процесс. Упавший процесс перезапускается вместе с новой очередью (старая
+    могла остаться в неконсистентном состоянии, обновления в ней теряются);
+    если процесс падает чаще ``max_restarts`` раз за ``restart_window`` секунд,
+    выбрасывается WorkerCrashed. Запись в очередь никогда не блокируется
+    навсегда: пока очередь полна, процесс проверяется раз в PUT_TIMEOUT.
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        spawn: Callable[[int], Tuple[Any, Any]],
+        max_restarts: int = config.SHARD_MAX_RESTARTS,
+        restart_window: float = config.SHARD_RESTART_WINDOW
+    ):
+        self.spawn = spawn
+        self.max_restarts = max_restarts
+        self.restart_window = restart_window
+        self.queues: List[Any] = []
+        self.processes: List[Any] = []
+        for index in range(workers):
+            worker_queue, process = spawn(index)
+            self.queues.append(worker_queue)
+            self.processes.append(process)
+        # Запись в очередь одного процесса строго последовательна - порядок сохраняется
+        self._locks = [asyncio.Lock() for _ in range(workers)]
+        self._restarts: List[Deque[float]] = [deque() for _ in range(workers)]
+
+    def check_worker(self, index: int) -> None:
+        """Перезапустить процесс-обработчик, если он завершился"""
+        process = self.processes[index]
+        if process.is_alive():
+            return
+
+        now = time.monotonic()
+        restarts = self._restarts[index]
+        while restarts and now - restarts[0] > self.restart_window:
+            restarts.popleft()
+        if len(restarts) >= self.max_restarts:
+            raise WorkerCrashed(
+                f"Обработчик #{index} завершился с кодом {process.exitcode}: "
+                f"{len(restarts) + 1} падений за {self.restart_window} с"
+            )
+        restarts.append(now)
+
+        old_queue = self.queues[index]
+        logging.error(f"Обработчик #{index} завершился с кодом {process.exitcode}, перезапуск")
+        self.queues[index], self.processes[index] = self.spawn(index)
+        _discard_queue(old_queue)
+
+    def check_workers(self) -> None:
+        for index in range(len(self.processes)):
+            self.check_worker(index)
+
+    async def supervise(self, interval: float = PUT_TIMEOUT) -> None:
+        """Проверять процессы-обработчики и в отсутствие обновлений"""
+        while True:
+            self.check_workers()
+            await asyncio.sleep(interval)
+
+    async def dispatch(self, update: Dict[str, Any]) -> None:
+        key = shard_key(update)
+        shard = key % len(self.queues)
+        async with self._locks[shard]:
+            try:
+                self.queues[shard].put_nowait((key, update))
+                return
+            except queue.Full:
+                pass
+
+            # Очередь переполнена: ждём, не блокируя цикл событий, и проверяем процесс
+            loop = asyncio.get_running_loop()
+            while True:
+                self.check_worker(shard)
+                put = functools.partial(self.queues[shard].put, (key, update), timeout=PUT_TIMEOUT)
+                try:
+                    await loop.run_in_executor(None, put)
+                    return
+                except queue.Full:
+                    continue
+
+    async def stop(self) -> None:
+        """Остановить процессы-обработчики после уже поставленных обновлений"""
+        loop = asyncio.get_running_loop()
+        for worker_queue, process in zip(self.queues, self.processes):
+            try:
+                await loop.run_in_executor(None, functools.partial(worker_queue.put, _STOP, timeout=30))
+            except queue.Full:
+                logging.error(f"Обработчик {process.name} не разбирает очередь, завершаем принудительно")
+                process.terminate()
+        for process in self.processes:
+            await loop.run_in_executor(None, process.join, 30)
+
+def _discard_queue(worker_queue: Any) -> None:
+    """Закрыть очередь упавшего процесса, не дожидаясь отправки её содержимого"""
+    close = getattr(worker_queue, "close", None)
+    if close is not None:
+        worker_queue.cancel_join_thread()
+        close()
+
+async def run_sharded(workers: int) -> None:
+    """Запустить процессы-обработчики и принимать обновления для них"""
+    from src.main import create_dispatcher
+
+    context = multiprocessing.get_context("spawn")
+
+    def spawn(index: int) -> Tuple[multiprocessing.Queue, multiprocessing.Process]:
+        worker_queue = context.Queue(maxsize=config.SHARD_QUEUE_SIZE)
+        process = context.Process(target=run_worker, args=(index, worker_queue), name=f"bot-worker-{index}")
+        process.start()
+        return worker_queue, process
+
+    router = ShardRouter(workers, spawn)
+    # Диспетчер нужен только чтобы узнать, какие типы обновлений запрашивать
+    allowed_updates = create_dispatcher().resolve_used_update_types()
+    bot = Bot(token=config.BOT_TOKEN)
+
+    logging.info(f"Шардированный режим: {workers} процессов-обработчиков")
+    receive = _receive_webhook if config.WEBHOOK_URL else _receive_polling
+    receiver = asyncio.create_task(receive(bot, router, allowed_updates))
+    supervisor = asyncio.create_task(router.supervise())
+    try:
+        # Первым завершается приём (остановка) или надзор (WorkerCrashed) - тогда ошибка поднимается
+        done, _ = await asyncio.wait([receiver, supervisor], return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            task.result()
+    finally:
+        for task in (receiver, supervisor):
+            task.cancel()
+        await asyncio.gather(receiver, supervisor, return_exceptions=True)
+        await router.stop()
+        await bot.session.close()
+
+async def _receive_polling(bot: Bot, router: ShardRouter, allowed_updates: List[str]) -> None:
+    """Long polling в приёмном процессе"""
+    await bot.delete_webhook()
+    logging.info("Приём обновлений в режиме polling")
+
+    offset = None
+    while True:
+        try:
+            updates = await bot.get_updates(offset=offset, timeout=30, allowed_updates=allowed_updates)
+        except Exception as e:
+            logging.error(f"Ошибка получения обновлений: {e}")
+            await asyncio.sleep(5)
+            continue
+
+        for update in updates:
+            await router.dispatch(update.model_dump(mode="json", by_alias=True, exclude_none=True))
+            offset = update.update_id + 1
+
+async def _receive_webhook(bot: Bot, router: ShardRouter, allowed_updates: List[str]) -> None:
+    """Webhook в приёмном процессе: ответ 200 сразу, обработка - в процессах-обработчиках"""
+
+    async def handle(request: web.Request) -> web.Response:
+        if config.WEBHOOK_SECRET and request.headers.get("X-Telegram-Bot-Api-Secret-Token") != config.WEBHOOK_SECRET:
+            return web.Response(status=401)
+        await router.dispatch(await request.json())
+        return web.json_response({})
+
+    app = web.Application()
+    app.router.add_post(config.WEBHOOK_PATH, handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, host=config.WEBHOOK_HOST, port=config.WEBHOOK_PORT)
+    await site.start()
+
+    await bot.set_webhook(
+        url=f"{config.WEBHOOK_URL.rstrip('/')}{config.WEBHOOK_PATH}",
+        secret_token=config.WEBHOOK_SECRET or None,
+        allowed_updates=allowed_updates
+    )
+    logging.info(f"Приём обновлений через webhook на {config.WEBHOOK_HOST}:{config.WEBHOOK_PORT}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
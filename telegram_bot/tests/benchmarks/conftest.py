@@ -0,0 +1,78 @@
+"""Fixtures for pytest-benchmark micro-benchmarks.
+
+Run and store a baseline:
+    pytest tests/benchmarks --benchmark-only --benchmark-storage=tests/benchmarks/baseline --benchmark-save=baseline
+Compare against it:
+    pytest tests/benchmarks --benchmark-only --benchmark-storage=tests/benchmarks/baseline \
+        --benchmark-compare --benchmark-compare-fail=median:30%
+"""
+import random
+import pytest
+from datetime import datetime
+from bson import ObjectId
+
+pytest.importorskip("pytest_benchmark")
+
+CATALOG_SIZE = 300
+CATEGORIES = ["Классические костюмы", "Slim Fit костюмы", "Casual костюмы", "Праздничные костюмы", "Акции"]
+
+
+def make_product(i):
+    return {
+        "_id": ObjectId(),
+        "name": f"Костюм Classic & Co №{i}",
+        "description": "Классический костюм из шерсти <премиум> качества, однобортный пиджак и брюки прямого кроя",
+        "category": CATEGORIES[i % len(CATEGORIES)],
+        "price": 89990 + i * 1000,
+        "rating": 4.7,
+        "reviewCount": 23,
+        "materials": ["Шерсть", "Вискоза"],
+        "sizes": [{"name": size, "inStock": size != "XXL"} for size in ("XS", "S", "M", "L", "XL", "XXL")],
+        "colors": [
+            {"name": "Черный", "hexCode": "#000000", "inStock": True},
+            {"name": "Синий", "hexCode": "#000080", "inStock": True},
+            {"name": "Серый", "hexCode": "#808080", "inStock": False}
+        ],
+        "tags": ["костюм", "мужской", "шерсть"],
+        "isActive": True,
+        "createdAt": datetime(2025, 1, 15),
+        "updatedAt": datetime(2025, 1, 15)
+    }
+
+
+@pytest.fixture(scope="session")
+def catalog():
+    """Products of a realistic catalog, by id."""
+    return {str(product["_id"]): product for product in (make_product(i) for i in range(CATALOG_SIZE))}
+
+
+@pytest.fixture(scope="session")
+def product(catalog):
+    return next(iter(catalog.values()))
+
+
+@pytest.fixture
+def make_cart(catalog):
+    """Cart snapshot with the given number of items taken from the catalog."""
+    def factory(size):
+        products = random.Random(size).sample(list(catalog.values()), size)
+        items = [
+            {
+                "productId": product["_id"],
+                "name": product["name"],
+                "size": "M",
+                "color": "Черный",
+                "quantity": 2,
+                "price": product["price"],
+                "totalPrice": product["price"] * 2,
+                "addedAt": datetime(2025, 1, 15)
+            }
+            for product in products
+        ]
+        return {
+            "items": items,
+            "totalItems": sum(item["quantity"] for item in items),
+            "totalPrice": sum(item["totalPrice"] for item in items)
+        }
+
+    return factory
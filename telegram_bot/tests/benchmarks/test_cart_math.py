@@ -0,0 +1,24 @@
+import asyncio
+import pytest
+
+from services.cart_service import CartService, calculate_cart_totals
+
+
+class TestCartBenchmarks:
+    """Cart summary and totals benchmarks for carts of 1, 10 and 100 items."""
+
+    @pytest.mark.parametrize("size", [1, 10, 100])
+    def test_cart_summary(self, benchmark, make_cart, size):
+        cart = make_cart(size)
+        loop = asyncio.new_event_loop()
+        try:
+            summary = benchmark(lambda: loop.run_until_complete(CartService.get_cart_summary(cart)))
+        finally:
+            loop.close()
+        assert summary.count("Размер:") == size
+
+    @pytest.mark.parametrize("size", [1, 10, 100])
+    def test_cart_totals(self, benchmark, make_cart, size):
+        cart = make_cart(size)
+        totals = benchmark(calculate_cart_totals, cart["items"])
+        assert totals == {"totalItems": cart["totalItems"], "totalPrice": cart["totalPrice"]}
@@ -0,0 +1,33 @@
+from keyboards import main_menu
+from keyboards.main_menu import get_product_actions_keyboard
+
+
+class TestKeyboardBenchmarks:
+    """Keyboard building benchmarks: static builders and the product keyboard cache."""
+
+    def test_build_main_menu(self, benchmark):
+        keyboard = benchmark(main_menu._build_main_menu_buttons)
+        assert len(keyboard.inline_keyboard) == 3
+
+    def test_build_categories(self, benchmark):
+        keyboard = benchmark(main_menu._build_categories_keyboard)
+        assert len(keyboard.inline_keyboard) == 4
+
+    def test_static_keyboard_lookup(self, benchmark):
+        keyboard = benchmark(main_menu.get_categories_keyboard)
+        assert keyboard == main_menu.CATEGORIES_KEYBOARD
+        # A copy: changing it leaves the shared keyboard intact
+        keyboard.inline_keyboard.pop()
+        assert len(main_menu.CATEGORIES_KEYBOARD.inline_keyboard) == 4
+
+    def test_product_keyboard_uncached(self, benchmark, product):
+        build = main_menu._build_product_actions_keyboard.__wrapped__
+        keyboard = benchmark(build, str(product["_id"]), False)
+        assert len(keyboard.inline_keyboard) == 3
+
+    def test_product_keyboard_cached(self, benchmark, product):
+        product_id = str(product["_id"])
+        keyboard = benchmark(get_product_actions_keyboard, product_id)
+        assert keyboard == get_product_actions_keyboard(product_id)
+        keyboard.inline_keyboard[0][0].text = "changed"
+        assert get_product_actions_keyboard(product_id).inline_keyboard[0][0].text == "❤️ В избранное"
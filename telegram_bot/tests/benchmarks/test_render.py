@@ -0,0 +1,34 @@
+import pytest
+from datetime import datetime
+
+from handlers.cart import format_cart
+from handlers.catalog import format_product_card, get_product_variants
+from handlers.orders import format_orders_list
+
+
+class TestRenderBenchmarks:
+    """Rendering benchmarks for product cards, carts and order lists."""
+
+    @pytest.mark.parametrize("language", ["ru", "kk", "en"])
+    def test_product_card(self, benchmark, product, language):
+        text = benchmark(format_product_card, product, language, True)
+        assert "&lt;премиум&gt;" in text
+
+    def test_product_variants(self, benchmark, product):
+        sizes, colors = benchmark(get_product_variants, product)
+        assert len(sizes) == 5 and len(colors) == 2
+
+    @pytest.mark.parametrize("size", [1, 10, 100])
+    def test_cart(self, benchmark, catalog, make_cart, size):
+        cart = make_cart(size)
+        text = benchmark(format_cart, cart, catalog)
+        assert text.count("• <b>") == size
+
+    @pytest.mark.parametrize("size", [1, 20])
+    def test_orders_list(self, benchmark, size):
+        orders = [
+            {"orderNumber": f"ZG-{i:06d}", "createdAt": datetime(2025, 1, 15, 10, 30), "orderStatus": "shipped", "total": 189990}
+            for i in range(size)
+        ]
+        text = benchmark(format_orders_list, orders)
+        assert text.count("ZG-") == size
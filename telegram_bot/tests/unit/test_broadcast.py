@@ -0,0 +1,155 @@
+import asyncio
+
+import pytest
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError
+from aiogram.methods import SendMessage
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+from services import broadcast_service
+from services.broadcast_service import BroadcastService, Broadcaster
+
+
+class FakeBot:
+    """Bot recording sent messages; some chats blocked the bot or do not exist."""
+
+    def __init__(self, blocked=(), missing=(), unreachable=()):
+        self.blocked = set(blocked)
+        self.missing = set(missing)
+        self.unreachable = set(unreachable)
+        self.sent = []
+
+    async def send_message(self, chat_id, text, **kwargs):
+        await asyncio.sleep(0)
+        method = SendMessage(chat_id=chat_id, text=text)
+        if chat_id in self.blocked:
+            raise TelegramForbiddenError(method=method, message="Forbidden: bot was blocked by the user")
+        if chat_id in self.missing:
+            raise TelegramBadRequest(method=method, message="Bad Request: chat not found")
+        if chat_id in self.unreachable:
+            raise asyncio.TimeoutError()
+        self.sent.append(chat_id)
+
+
+@pytest.fixture
+def users_collection(monkeypatch):
+    collection = mongomock_motor.AsyncMongoMockClient()["ziggler_test"]["users"]
+    monkeypatch.setattr(broadcast_service, "get_users_collection", lambda: collection)
+    return collection
+
+
+async def run_campaign(broadcaster, bot, campaign_id):
+    assert await broadcaster.start(bot, campaign_id)
+    await asyncio.gather(*broadcaster._tasks.values())
+
+
+class TestBroadcast:
+    """Tests for streaming broadcasts with checkpoints."""
+
+    @pytest.mark.asyncio
+    async def test_campaign_counts(self, users_collection):
+        """Test only users with notifications enabled get the message and results are counted."""
+        await users_collection.insert_many(
+            [{"telegramId": i, "notificationsEnabled": i != 5} for i in range(1, 11)]
+        )
+        bot = FakeBot(blocked={2, 3}, missing={4})
+        campaign = await BroadcastService.create_campaign("Скидки!", created_by=1000)
+
+        await run_campaign(Broadcaster(concurrency=3, checkpoint_every=2, lease=60), bot, campaign["_id"])
+
+        campaign = await BroadcastService.get_campaign(str(campaign["_id"]))
+        assert campaign["total"] == 9
+        assert (campaign["delivered"], campaign["blocked"], campaign["failed"]) == (6, 2, 1)
+        assert campaign["status"] == "done"
+        assert campaign["leaseOwner"] is None
+        # Recipients plus the report to the admin
+        assert sorted(bot.sent) == [1, 6, 7, 8, 9, 10, 1000]
+
+    @pytest.mark.asyncio
+    async def test_network_errors_count_as_failed(self, users_collection):
+        """Test non-Telegram errors (timeouts, network) fail single messages, not the campaign."""
+        await users_collection.insert_many([{"telegramId": i, "notificationsEnabled": True} for i in range(1, 7)])
+        bot = FakeBot(unreachable={2, 5})
+        campaign = await BroadcastService.create_campaign("Скидки!", created_by=1000)
+
+        await run_campaign(Broadcaster(concurrency=2, checkpoint_every=2, lease=60), bot, campaign["_id"])
+
+        campaign = await BroadcastService.get_campaign(str(campaign["_id"]))
+        assert (campaign["delivered"], campaign["blocked"], campaign["failed"]) == (4, 0, 2)
+        assert campaign["status"] == "done"
+
+    @pytest.mark.asyncio
+    async def test_unexpected_error_counts_as_failed(self, users_collection, monkeypatch):
+        """Test an exception escaping deliver() is counted as failed instead of stopping the campaign."""
+        await users_collection.insert_many([{"telegramId": i, "notificationsEnabled": True} for i in range(1, 7)])
+        campaign = await BroadcastService.create_campaign("Скидки!", created_by=1000)
+        deliver = BroadcastService.deliver
+
+        async def deliver_or_crash(bot, chat_id, text, **kwargs):
+            if chat_id == 4:
+                raise RuntimeError("unexpected")
+            return await deliver(bot, chat_id, text, **kwargs)
+
+        monkeypatch.setattr(BroadcastService, "deliver", deliver_or_crash)
+        broadcaster = Broadcaster(concurrency=1, checkpoint_every=100, lease=60)
+        await run_campaign(broadcaster, FakeBot(), campaign["_id"])
+
+        campaign = await BroadcastService.get_campaign(str(campaign["_id"]))
+        assert (campaign["delivered"], campaign["failed"]) == (5, 1)
+        assert campaign["status"] == "done"
+
+    @pytest.mark.asyncio
+    async def test_stop_saves_checkpoint(self, users_collection):
+        """Test a stopped campaign keeps the completed sends and releases the lease."""
+        await users_collection.insert_many([{"telegramId": i, "notificationsEnabled": True} for i in range(1, 7)])
+        users = await users_collection.find({}).sort("_id", 1).to_list(None)
+        campaign = await BroadcastService.create_campaign("Скидки!", created_by=1000)
+        bot = FakeBot()
+        stuck = asyncio.Event()
+        send_message = bot.send_message
+
+        async def send_or_hang(chat_id, text, **kwargs):
+            if chat_id == 4:
+                stuck.set()
+                await asyncio.Event().wait()
+            await send_message(chat_id, text, **kwargs)
+
+        bot.send_message = send_or_hang
+        broadcaster = Broadcaster(concurrency=1, checkpoint_every=100, lease=60)
+        assert await broadcaster.start(bot, campaign["_id"])
+        await stuck.wait()
+        await broadcaster.close()
+
+        campaign = await BroadcastService.get_campaign(str(campaign["_id"]))
+        assert campaign["delivered"] == 3
+        assert campaign["lastUserId"] == users[2]["_id"]
+        assert campaign["status"] == "running"
+        assert campaign["leaseOwner"] is None
+
+    @pytest.mark.asyncio
+    async def test_resume_from_checkpoint(self, users_collection):
+        """Test an interrupted campaign continues after the last checkpoint."""
+        await users_collection.insert_many([{"telegramId": i, "notificationsEnabled": True} for i in range(1, 7)])
+        users = await users_collection.find({}).sort("_id", 1).to_list(None)
+        campaign = await BroadcastService.create_campaign("Новая коллекция", created_by=1000)
+        await broadcast_service.get_broadcasts_collection().update_one(
+            {"_id": campaign["_id"]},
+            {"$set": {"lastUserId": users[3]["_id"], "delivered": 4, "leaseOwner": "dead", "leaseUntil": None}}
+        )
+
+        assert await BroadcastService.get_orphaned_campaign_ids() == [campaign["_id"]]
+        bot = FakeBot()
+        await run_campaign(Broadcaster(concurrency=10, checkpoint_every=100, lease=60), bot, campaign["_id"])
+
+        campaign = await BroadcastService.get_campaign(str(campaign["_id"]))
+        assert bot.sent[:2] == [5, 6]
+        assert campaign["delivered"] == 6
+
+    @pytest.mark.asyncio
+    async def test_campaign_owned_by_one_process(self, users_collection):
+        """Test a campaign with a live lease is not taken by another process."""
+        campaign = await BroadcastService.create_campaign("Текст", created_by=1000)
+
+        assert await BroadcastService.claim_campaign(campaign["_id"], "first", lease=60)
+        assert await BroadcastService.claim_campaign(campaign["_id"], "second", lease=60) is None
+        assert not await BroadcastService.save_progress(campaign["_id"], "second", None, {"delivered": 1}, lease=60)
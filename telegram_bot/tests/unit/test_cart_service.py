@@ -0,0 +1,241 @@
+import datetime
+import os
+
+import pytest
+import pytest_asyncio
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+from config.config import config
+from services import cart_service
+from services.cart_service import CartService, cart_item_name
+from handlers.cart import format_cart
+from services.product_service import ProductService
+
+PRODUCTS = {
+    str(product_id): {"_id": product_id, "name": name, "price": price}
+    for product_id, name, price in [(ObjectId(), "Костюм", 50000), (ObjectId(), "Бабочка", 3000)]
+}
+SUIT, BOW = list(PRODUCTS)
+
+
+@pytest_asyncio.fixture(params=["fallback", "pipeline"])
+async def carts_collection(request, monkeypatch):
+    """Carts on mongomock (read-and-replace fallback) and, if TEST_MONGODB_URI is set, on mongod"""
+    if request.param == "fallback":
+        collection = mongomock_motor.AsyncMongoMockClient()["ziggler_test"]["carts"]
+        monkeypatch.setattr(config, "CART_PIPELINE_UPDATES", False)
+    else:
+        if not os.getenv("TEST_MONGODB_URI"):
+            pytest.skip("pipeline updates need a real mongod (TEST_MONGODB_URI)")
+        from motor.motor_asyncio import AsyncIOMotorClient
+        collection = AsyncIOMotorClient(os.environ["TEST_MONGODB_URI"])["ziggler_test"]["carts"]
+        monkeypatch.setattr(config, "CART_PIPELINE_UPDATES", True)
+
+    async def get_product_by_id(product_id):
+        return PRODUCTS.get(product_id)
+
+    monkeypatch.setattr(cart_service, "get_carts_collection", lambda: collection)
+    monkeypatch.setattr(ProductService, "get_product_by_id", get_product_by_id)
+    await collection.delete_many({"userId": {"$in": [1, 2]}})
+    yield collection
+    await collection.delete_many({"userId": {"$in": [1, 2]}})
+
+
+def _lines(cart):
+    return [(str(item["productId"]), item["size"], item["color"], item["quantity"]) for item in cart["items"]]
+
+
+class TestCartUpdates:
+    """Tests for atomic cart mutations."""
+
+    @pytest.mark.asyncio
+    async def test_add_new_line_creates_cart(self, carts_collection):
+        """Test the first add creates the cart with a compact item and totals."""
+        cart = await CartService.add_to_cart(SUIT, "M", "Черный", 2, user_id=1)
+
+        assert _lines(cart) == [(SUIT, "M", "Черный", 2)]
+        assert cart["items"][0]["name"] == "Костюм"
+        assert cart["items"][0]["totalPrice"] == 100000
+        assert (cart["totalItems"], cart["totalPrice"]) == (2, 100000)
+        assert cart["expiresAt"] > datetime.datetime.utcnow()
+        assert await carts_collection.count_documents({"userId": 1}) == 1
+
+    @pytest.mark.asyncio
+    async def test_add_merges_same_variant(self, carts_collection):
+        """Test adding the same product variant increases its quantity."""
+        await CartService.add_to_cart(SUIT, "M", "Черный", 1, user_id=1)
+        cart = await CartService.add_to_cart(SUIT, "M", "Черный", 2, user_id=1)
+
+        assert _lines(cart) == [(SUIT, "M", "Черный", 3)]
+        assert (cart["totalItems"], cart["totalPrice"]) == (3, 150000)
+
+    @pytest.mark.asyncio
+    async def test_add_other_variant_appends_line(self, carts_collection):
+        """Test another size or color of the same product is a separate line."""
+        await CartService.add_to_cart(SUIT, "M", "Черный", 1, user_id=1)
+        await CartService.add_to_cart(SUIT, "L", "Черный", 1, user_id=1)
+        await CartService.add_to_cart(SUIT, "M", "Синий", 1, user_id=1)
+        cart = await CartService.add_to_cart(BOW, "M", "Черный", 1, user_id=1)
+
+        assert _lines(cart) == [
+            (SUIT, "M", "Черный", 1), (SUIT, "L", "Черный", 1), (SUIT, "M", "Синий", 1), (BOW, "M", "Черный", 1)
+        ]
+        assert (cart["totalItems"], cart["totalPrice"]) == (4, 153000)
+
+    @pytest.mark.asyncio
+    async def test_update_quantity_and_remove(self, carts_collection):
+        """Test a quantity update recalculates totals and quantity 0 removes the line."""
+        await CartService.add_to_cart(SUIT, "M", "Черный", 1, user_id=1)
+        await CartService.add_to_cart(BOW, "M", "Черный", 1, user_id=1)
+
+        cart = await CartService.update_cart_item(BOW, "M", "Черный", 4, user_id=1)
+        assert _lines(cart) == [(SUIT, "M", "Черный", 1), (BOW, "M", "Черный", 4)]
+        assert (cart["totalItems"], cart["totalPrice"]) == (5, 62000)
+
+        cart = await CartService.update_cart_item(SUIT, "M", "Черный", 0, user_id=1)
+        assert _lines(cart) == [(BOW, "M", "Черный", 4)]
+        assert (cart["totalItems"], cart["totalPrice"]) == (4, 12000)
+
+        with pytest.raises(ValueError):
+            await CartService.update_cart_item(SUIT, "M", "Черный", 1, user_id=1)
+        with pytest.raises(ValueError):
+            await CartService.update_cart_item(SUIT, "M", "Черный", 1, user_id=2)
+
+    @pytest.mark.asyncio
+    async def test_add_to_expired_cart_starts_over(self, carts_collection):
+        """Test adding to an expired cart replaces its items and renews the expiry."""
+        past = datetime.datetime.utcnow() - datetime.timedelta(days=1)
+        await carts_collection.insert_one({
+            "userId": 1,
+            "items": [{"productId": ObjectId(BOW), "name": "Бабочка", "size": "M", "color": "Черный",
+                       "quantity": 5, "price": 3000, "totalPrice": 15000}],
+            "totalItems": 5,
+            "totalPrice": 15000,
+            "createdAt": past - datetime.timedelta(days=7),
+            "expiresAt": past
+        })
+
+        cart = await CartService.add_to_cart(SUIT, "M", "Черный", 1, user_id=1)
+
+        assert _lines(cart) == [(SUIT, "M", "Черный", 1)]
+        assert (cart["totalItems"], cart["totalPrice"]) == (1, 50000)
+        assert cart["createdAt"] > past
+        assert cart["expiresAt"] > datetime.datetime.utcnow()
+        assert await carts_collection.count_documents({"userId": 1}) == 1
+        with pytest.raises(ValueError):
+            await CartService.update_cart_item(BOW, "M", "Черный", 1, user_id=1)
+
+
+    @pytest.mark.asyncio
+    async def test_clear_invalidates_stale_replace(self, carts_collection, monkeypatch):
+        """Test a change based on a read from before the clear is retried instead of restoring the items."""
+        if config.CART_PIPELINE_UPDATES:
+            pytest.skip("pipeline updates do not read the cart first")
+        await CartService.add_to_cart(SUIT, "M", "Черный", 1, user_id=1)
+        stale = await carts_collection.find_one({"userId": 1})
+        await CartService.clear_cart(user_id=1)
+
+        reads = [stale]
+        find_one = carts_collection.find_one
+
+        async def read_stale_once(query, *args, **kwargs):
+            return reads.pop() if reads else await find_one(query, *args, **kwargs)
+
+        monkeypatch.setattr(carts_collection, "find_one", read_stale_once)
+        cart = await CartService.add_to_cart(BOW, "M", "Черный", 1, user_id=1)
+
+        assert _lines(cart) == [(BOW, "M", "Черный", 1)]
+
+
+class TestCartIndexes:
+    """Tests for cart owner indexes."""
+
+    @pytest.mark.asyncio
+    async def test_legacy_owner_index_replaced_by_unique(self, carts_collection):
+        """Test the plain userId index of earlier versions is replaced, so uniqueness is enforced."""
+        if "userId_unique" in await carts_collection.index_information():
+            await carts_collection.drop_index("userId_unique")
+        await carts_collection.create_index("userId")
+
+        await CartService.ensure_indexes()
+
+        indexes = await carts_collection.index_information()
+        assert "userId_1" not in indexes
+        assert indexes["userId_unique"]["unique"]
+        await carts_collection.insert_one({"userId": 1})
+        with pytest.raises(DuplicateKeyError):
+            await carts_collection.insert_one({"userId": 1})
+        # Repeated startup keeps the indexes
+        await CartService.ensure_indexes()
+
+    @pytest.mark.asyncio
+    async def test_duplicate_carts_merged_before_unique_index(self, carts_collection):
+        """Test duplicate carts of a user are merged, so the unique index builds and the items survive."""
+        if "userId_unique" in await carts_collection.index_information():
+            await carts_collection.drop_index("userId_unique")
+        await carts_collection.create_index("userId")
+        now = datetime.datetime.utcnow()
+        alive = now + datetime.timedelta(days=1)
+
+        def line(product_id, quantity):
+            return {"productId": ObjectId(product_id), "name": "", "size": "M", "color": "Черный",
+                    "quantity": quantity, "price": PRODUCTS[product_id]["price"]}
+
+        await carts_collection.insert_many([
+            {"userId": 1, "items": [line(SUIT, 1)], "expiresAt": alive, "updatedAt": now},
+            {"userId": 1, "items": [line(SUIT, 2), line(BOW, 1)], "expiresAt": alive,
+             "updatedAt": now - datetime.timedelta(hours=1)},
+            {"userId": 1, "items": [line(BOW, 5)], "expiresAt": now - datetime.timedelta(days=1), "updatedAt": now},
+            {"userId": 2, "items": [], "expiresAt": alive, "updatedAt": now}
+        ])
+
+        await CartService.ensure_indexes()
+
+        carts = await carts_collection.find({"userId": 1}).to_list(None)
+        assert len(carts) == 1
+        assert sorted(_lines(carts[0])) == sorted([(SUIT, "M", "Черный", 3), (BOW, "M", "Черный", 1)])
+        assert carts[0]["totalPrice"] == 3 * 50000 + 3000
+        assert await carts_collection.count_documents({"userId": 2}) == 1
+        assert "userId_1" not in await carts_collection.index_information()
+
+    @pytest.mark.asyncio
+    async def test_session_carts_not_unique(self, carts_collection):
+        """Test guest carts of the website keep a plain sessionId index."""
+        await CartService.ensure_indexes()
+
+        assert not (await carts_collection.index_information())["sessionId_1"].get("unique")
+
+
+class TestLegacyCartItems:
+    """Tests for carts saved before items got a compact name/price snapshot."""
+
+    LEGACY_CART = {
+        "items": [{
+            "productId": ObjectId(SUIT),
+            "product": {"name": "Костюм Classic", "price": 50000, "images": []},
+            "size": "M",
+            "color": "Черный",
+            "quantity": 2,
+            "price": 50000,
+            "totalPrice": 100000
+        }],
+        "totalItems": 2,
+        "totalPrice": 100000
+    }
+
+    def test_item_name_falls_back_to_embedded_product(self):
+        """Test the name is taken from the embedded product of a legacy item."""
+        assert cart_item_name(self.LEGACY_CART["items"][0]) == "Костюм Classic"
+        assert cart_item_name({"name": "Бабочка"}) == "Бабочка"
+
+    @pytest.mark.asyncio
+    async def test_summary_of_legacy_cart(self):
+        """Test the text summary renders a legacy cart."""
+        assert "Костюм Classic" in await CartService.get_cart_summary(self.LEGACY_CART)
+
+    def test_format_legacy_cart_without_product(self):
+        """Test a legacy item of a deleted product is rendered by its embedded name."""
+        assert "Костюм Classic" in format_cart(self.LEGACY_CART, {})
@@ -0,0 +1,141 @@
+import datetime
+
+import pytest
+from bson import ObjectId
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+from services import catalog_cache as catalog_cache_module
+from services.catalog_cache import CatalogCache
+from services.search_index import SearchIndex
+
+NOW = datetime.datetime(2024, 5, 1, 12, 0)
+
+
+def make_product(name, updated_at=NOW, **fields):
+    return {"_id": ObjectId(), "name": name, "isActive": True, "updatedAt": updated_at, **fields}
+
+
+@pytest.fixture
+def search_index(monkeypatch):
+    index = SearchIndex()
+    monkeypatch.setattr(catalog_cache_module, "search_index", index)
+    return index
+
+
+@pytest.fixture
+def collections(monkeypatch, search_index):
+    db = mongomock_motor.AsyncMongoMockClient()["ziggler_test"]
+    monkeypatch.setattr(catalog_cache_module, "get_products_collection", lambda: db["products"])
+    monkeypatch.setattr(catalog_cache_module, "get_categories_collection", lambda: db["categories"])
+    return db["products"], db["categories"]
+
+
+class TestProductChanges:
+    """Tests for applying product changes to the catalog cache."""
+
+    def test_change_bumps_version_and_indexes(self, search_index):
+        """Test a new product version is cached, indexed and invalidates list results."""
+        cache = CatalogCache()
+        cache.set_query("page", ["old"], cache.version)
+        product = make_product("Костюм Classic")
+
+        cache.apply_product_change(str(product["_id"]), product)
+
+        assert cache.version == 1
+        assert cache.get_query("page") is None
+        assert cache.get_product(str(product["_id"])) is product
+        assert [found["name"] for found in search_index.search("classic")] == ["Костюм Classic"]
+
+    def test_replay_is_noop_after_cache_expiry(self, search_index):
+        """Test a replayed or older copy changes nothing, even after the cached product expired."""
+        cache = CatalogCache()
+        product = make_product("Костюм")
+        product_id = str(product["_id"])
+        cache.apply_product_change(product_id, product)
+        cache.products.clear()
+
+        cache.apply_product_change(product_id, dict(product))
+        cache.apply_product_change(product_id, {**product, "updatedAt": NOW - datetime.timedelta(minutes=1)})
+        assert cache.version == 1
+
+        cache.apply_product_change(product_id, {**product, "updatedAt": NOW + datetime.timedelta(minutes=1)})
+        assert cache.version == 2
+
+    def test_delete_drops_product(self, search_index):
+        """Test a deleted product leaves the cache and the search index."""
+        cache = CatalogCache()
+        product = make_product("Бабочка")
+        product_id = str(product["_id"])
+        cache.apply_product_change(product_id, product)
+
+        cache.apply_product_change(product_id, None)
+
+        assert cache.version == 2
+        assert cache.get_product(product_id) is None
+        assert search_index.search("бабочка") == []
+
+
+class TestPolling:
+    """Tests for updatedAt polling without change streams."""
+
+    @pytest.mark.asyncio
+    async def test_unchanged_catalog_keeps_version(self, collections):
+        """Test repeated polls of an unchanged catalog never invalidate list results."""
+        products, _ = collections
+        await products.insert_many([make_product("Костюм"), make_product("Бабочка")])
+        cache = CatalogCache()
+
+        for _ in range(3):
+            await cache.poll_changes()
+            cache.products.clear()
+
+        assert cache.version == 0
+
+    @pytest.mark.asyncio
+    async def test_update_applied_once(self, collections):
+        """Test an updated product is applied on the next poll and not again after."""
+        products, _ = collections
+        product = make_product("Костюм")
+        await products.insert_one(product)
+        cache = CatalogCache()
+        await cache.poll_changes()
+
+        later = NOW + datetime.timedelta(minutes=1)
+        await products.update_one({"_id": product["_id"]}, {"$set": {"price": 1000, "updatedAt": later}})
+        await cache.poll_changes()
+        await cache.poll_changes()
+
+        assert cache.version == 1
+        assert cache.get_product(str(product["_id"]))["price"] == 1000
+
+    @pytest.mark.asyncio
+    async def test_delete_detected(self, collections, search_index):
+        """Test a product deleted between polls is dropped from the cache and the index."""
+        products, _ = collections
+        product = make_product("Бабочка")
+        await products.insert_many([product, make_product("Костюм")])
+        cache = CatalogCache()
+        await cache.poll_changes()
+        cache.apply_product_change(str(product["_id"]), await products.find_one({"_id": product["_id"]}))
+        version = cache.version
+
+        await products.delete_one({"_id": product["_id"]})
+        await cache.poll_changes()
+
+        assert cache.version == version + 1
+        assert cache.get_product(str(product["_id"])) is None
+        assert search_index.search("бабочка") == []
+
+    @pytest.mark.asyncio
+    async def test_category_change_invalidates(self, collections):
+        """Test a category change invalidates list results."""
+        _, categories = collections
+        await categories.insert_one({"name": "Акции", "updatedAt": NOW})
+        cache = CatalogCache()
+        await cache.poll_changes()
+
+        await categories.insert_one({"name": "Новинки", "updatedAt": NOW + datetime.timedelta(minutes=1)})
+        await cache.poll_changes()
+
+        assert cache.version == 1
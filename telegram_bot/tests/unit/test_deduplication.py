@@ -0,0 +1,51 @@
+import pytest
+from unittest.mock import AsyncMock
+from aiogram.types import CallbackQuery, Update, User
+
+from middlewares.deduplication import DeduplicationMiddleware, MemoryDedupWindow, RedisDedupWindow
+
+
+def callback_update(update_id, callback_id="cb-1"):
+    user = User(id=1, is_bot=False, first_name="Test")
+    return Update(
+        update_id=update_id,
+        callback_query=CallbackQuery(id=callback_id, from_user=user, chat_instance="1", data="cart")
+    )
+
+
+class TestDeduplication:
+    """Tests for the update deduplication middleware."""
+
+    @pytest.mark.asyncio
+    async def test_duplicate_update_dropped(self):
+        """Test a redelivered update does not reach the handler."""
+        middleware = DeduplicationMiddleware(MemoryDedupWindow(ttl=60, max_size=100))
+        handler = AsyncMock(return_value="ok")
+
+        assert await middleware(handler, callback_update(1), {}) == "ok"
+        assert await middleware(handler, callback_update(1), {}) is None
+        # Same button press redelivered under a new update_id
+        assert await middleware(handler, callback_update(2), {}) is None
+        assert handler.await_count == 1
+
+    @pytest.mark.asyncio
+    async def test_failed_update_can_be_retried(self):
+        """Test keys are released when processing fails."""
+        middleware = DeduplicationMiddleware(MemoryDedupWindow(ttl=60, max_size=100))
+        handler = AsyncMock(side_effect=[RuntimeError("db down"), "ok"])
+
+        with pytest.raises(RuntimeError):
+            await middleware(handler, callback_update(1), {})
+        assert await middleware(handler, callback_update(1), {}) == "ok"
+
+    @pytest.mark.asyncio
+    async def test_redis_window(self):
+        """Test the Redis window is shared between replicas."""
+        fakeredis = pytest.importorskip("fakeredis")
+        redis = fakeredis.FakeAsyncRedis()
+        first, second = RedisDedupWindow(redis, ttl=60), RedisDedupWindow(redis, ttl=60)
+
+        assert await first.add("u:1") is True
+        assert await second.add("u:1") is False
+        await second.discard("u:1")
+        assert await first.add("u:1") is True
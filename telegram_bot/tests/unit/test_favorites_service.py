@@ -0,0 +1,132 @@
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+import pytest
+from bson import ObjectId
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+from handlers import favorites
+from handlers.favorites import FAVORITES_PAGE_SIZE, format_favorites
+from services import favorites_service, product_service
+from services.catalog_cache import catalog_cache
+from services.favorites_service import FavoritesCache, FavoritesService
+
+
+@pytest.fixture
+def database(monkeypatch):
+    database = mongomock_motor.AsyncMongoMockClient()["ziggler_test"]
+    monkeypatch.setattr(favorites_service, "get_users_collection", lambda: database["users"])
+    monkeypatch.setattr(product_service, "get_products_collection", lambda: database["products"])
+    monkeypatch.setattr(favorites_service, "favorites_cache", FavoritesCache(100, 60, use_redis=False))
+    catalog_cache.products.clear()
+    return database
+
+
+class TestFavoritesService:
+    """Tests for favorites stored as per-user id sets."""
+
+    @pytest.mark.asyncio
+    async def test_add_remove_and_hydrate(self, database):
+        """Test favorites keep order, skip inactive products and are hydrated in one query."""
+        products = [{"_id": ObjectId(), "name": f"Костюм {i}", "price": 1000, "isActive": i != 1} for i in range(3)]
+        await database.products.insert_many(products)
+        ids = [str(product["_id"]) for product in products]
+
+        for product_id in ids + ids[:1]:
+            await FavoritesService.add_favorite(7, product_id)
+        await FavoritesService.remove_favorite(7, ids[2])
+        await FavoritesService.add_favorite(7, ids[2])
+
+        document = await favorites_service.get_favorites_collection().find_one({"userId": 7})
+        assert [str(product_id) for product_id in document["productIds"]] == [ids[0], ids[1], ids[2]]
+
+        favorites = await FavoritesService.get_favorite_products(7)
+        assert [product["name"] for product in favorites] == ["Костюм 2", "Костюм 0"]
+
+    @pytest.mark.asyncio
+    async def test_membership_from_cache(self, database):
+        """Test favorite checks after the first one do not read the database."""
+        product_id = str(ObjectId())
+        await FavoritesService.add_favorite(7, product_id)
+        await favorites_service.get_favorites_collection().delete_many({})
+
+        assert await FavoritesService.is_favorite(7, product_id) is True
+        assert await FavoritesService.is_favorite(7, str(ObjectId())) is False
+        assert await FavoritesService.get_favorite_ids(8) == {}
+
+    @pytest.mark.asyncio
+    async def test_redis_cache(self, monkeypatch):
+        """Test id sets are stored compactly in Redis and shared between processes."""
+        fakeredis = pytest.importorskip("fakeredis")
+        redis = fakeredis.FakeAsyncRedis()
+        monkeypatch.setattr(favorites_service, "get_redis", lambda: redis)
+        product_ids = [ObjectId(), ObjectId()]
+
+        await FavoritesCache(100, 60, use_redis=True).set(7, product_ids)
+
+        assert len(await redis.get("fav:7")) == 24
+        assert list(await FavoritesCache(100, 60, use_redis=True).get(7)) == [str(i) for i in product_ids]
+
+    @pytest.mark.asyncio
+    async def test_toggle(self, database):
+        """Test toggling adds and removes the product atomically and updates the cache."""
+        product_id = str(ObjectId())
+
+        assert await FavoritesService.toggle_favorite(7, product_id) is True
+        assert await FavoritesService.is_favorite(7, product_id) is True
+        assert await FavoritesService.toggle_favorite(7, product_id) is False
+        assert await FavoritesService.is_favorite(7, product_id) is False
+
+
+class TestFavoritesView:
+    """Tests for the favorites list text and its pages."""
+
+    def test_product_names_are_escaped(self):
+        """Test names with HTML characters do not break the markup."""
+        products = [{"name": "Tom & <Jerry>", "price": 89990, "rating": 4.5, "reviewCount": 3}]
+
+        text = format_favorites(products, "en")
+
+        assert "<b>Tom &amp; &lt;Jerry&gt;</b>" in text
+        assert "89,990 ₸" in text
+        assert "4.5/5 (3 reviews)" in text
+
+    @staticmethod
+    def callback(data):
+        return SimpleNamespace(
+            data=data,
+            from_user=SimpleNamespace(id=7),
+            message=SimpleNamespace(edit_text=AsyncMock()),
+            answer=AsyncMock()
+        )
+
+    @pytest.mark.asyncio
+    async def test_long_list_paginated(self, monkeypatch):
+        """Test a large favorites list is shown page by page within Telegram limits."""
+        products = [{"_id": ObjectId(), "name": "Костюм " + "x" * 100, "price": 50000, "rating": 4.5}
+                    for _ in range(2 * FAVORITES_PAGE_SIZE + 5)]
+        monkeypatch.setattr(FavoritesService, "get_favorite_products", AsyncMock(return_value=products))
+
+        callback = self.callback(f"favorites_page_{FAVORITES_PAGE_SIZE + 1}")
+        await favorites.callback_favorites_page(callback)
+
+        text = callback.message.edit_text.call_args[0][0]
+        markup = callback.message.edit_text.call_args[1]["reply_markup"]
+        buttons = [button for row in markup.inline_keyboard for button in row]
+        assert len(text) < 4096 and len(buttons) < 100
+        assert f"({len(products)} товаров)" in text
+        assert f"{FAVORITES_PAGE_SIZE + 1}. <b>" in text and f"{2 * FAVORITES_PAGE_SIZE + 1}. <b>" not in text
+        assert [button.callback_data for button in markup.inline_keyboard[-2]] == [
+            "favorites_page_1", f"favorites_page_{2 * FAVORITES_PAGE_SIZE + 1}"
+        ]
+
+        # After removing an item the same page is shown again
+        removed = self.callback(f"remove_fav_{products[-1]['_id']}_{2 * FAVORITES_PAGE_SIZE + 1}")
+        monkeypatch.setattr(FavoritesService, "remove_favorite", AsyncMock())
+        monkeypatch.setattr(FavoritesService, "get_favorite_products", AsyncMock(return_value=products[:-1]))
+        await favorites.callback_remove_favorite(removed)
+
+        FavoritesService.remove_favorite.assert_awaited_once_with(7, str(products[-1]["_id"]))
+        text = removed.message.edit_text.call_args[0][0]
+        assert f"{2 * FAVORITES_PAGE_SIZE + 1}. <b>" in text
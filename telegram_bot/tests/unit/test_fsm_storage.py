@@ -0,0 +1,73 @@
+import pytest
+from aiogram.fsm.state import State, StatesGroup
+from aiogram.fsm.storage.base import StorageKey
+
+from utils.fsm_storage import CompactRedisStorage
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+class OrderForm(StatesGroup):
+    phone = State()
+
+
+@pytest.fixture
+def redis():
+    return fakeredis.aioredis.FakeRedis()
+
+
+@pytest.fixture
+def key():
+    return StorageKey(bot_id=1, chat_id=123456789, user_id=123456789)
+
+
+class TestCompactRedisStorage:
+    """Tests for Redis FSM storage."""
+
+    @pytest.mark.asyncio
+    async def test_state_roundtrip(self, redis, key):
+        """Test setting and reading state."""
+        storage = CompactRedisStorage(redis)
+
+        await storage.set_state(key, OrderForm.phone)
+        assert await storage.get_state(key) == "OrderForm:phone"
+
+        await storage.set_state(key, None)
+        assert await storage.get_state(key) is None
+
+    @pytest.mark.asyncio
+    async def test_data_roundtrip(self, redis, key):
+        """Test data is stored compactly and read back."""
+        storage = CompactRedisStorage(redis)
+
+        await storage.set_data(key, {"city": "Алматы", "qty": 2})
+        assert await storage.get_data(key) == {"city": "Алматы", "qty": 2}
+
+        raw = await redis.hget(storage.build_key(key), "d")
+        assert raw == '{"city":"Алматы","qty":2}'.encode()
+
+        assert await storage.update_data(key, {"qty": 3}) == {"city": "Алматы", "qty": 3}
+
+    @pytest.mark.asyncio
+    async def test_ttl_and_cleanup(self, redis, key):
+        """Test idle keys expire and empty keys are removed."""
+        storage = CompactRedisStorage(redis, ttl=60)
+
+        await storage.set_state(key, "OrderForm:phone")
+        await storage.set_data(key, {"phone": "+77071234567"})
+        assert 0 < await redis.ttl(storage.build_key(key)) <= 60
+
+        await storage.set_state(key, None)
+        await storage.set_data(key, {})
+        assert not await redis.exists(storage.build_key(key))
+
+    @pytest.mark.asyncio
+    async def test_keys_are_isolated(self, redis, key):
+        """Test replicas sharing Redis see each other's state, but not other users'."""
+        replica_a = CompactRedisStorage(redis)
+        replica_b = CompactRedisStorage(redis)
+        other = StorageKey(bot_id=1, chat_id=42, user_id=42)
+
+        await replica_a.set_state(key, "OrderForm:phone")
+        assert await replica_b.get_state(key) == "OrderForm:phone"
+        assert await replica_b.get_state(other) is None
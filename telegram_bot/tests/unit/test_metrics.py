@@ -0,0 +1,45 @@
+import pytest
+
+prometheus_client = pytest.importorskip("prometheus_client")
+
+from utils.metrics import instrument_service
+
+
+def sample(name, **labels):
+    return prometheus_client.REGISTRY.get_sample_value(name, labels) or 0
+
+
+@instrument_service
+class DummyService:
+    @staticmethod
+    async def get_item(item_id: int):
+        """Return item"""
+        if item_id < 0:
+            raise ValueError("bad id")
+        return {"id": item_id}
+
+    @staticmethod
+    def sync_helper():
+        return "sync"
+
+
+class TestServiceMetrics:
+    """Tests for service call instrumentation."""
+
+    @pytest.mark.asyncio
+    async def test_calls_are_timed(self):
+        """Test successful and failed calls are counted separately."""
+        ok_before = sample("bot_service_call_duration_seconds_count", service="DummyService", method="get_item", status="ok")
+        error_before = sample("bot_service_call_duration_seconds_count", service="DummyService", method="get_item", status="error")
+
+        assert await DummyService.get_item(1) == {"id": 1}
+        with pytest.raises(ValueError):
+            await DummyService.get_item(-1)
+
+        assert sample("bot_service_call_duration_seconds_count", service="DummyService", method="get_item", status="ok") == ok_before + 1
+        assert sample("bot_service_call_duration_seconds_count", service="DummyService", method="get_item", status="error") == error_before + 1
+
+    def test_wrapper_keeps_metadata(self):
+        """Test sync methods are untouched and docstrings are kept."""
+        assert DummyService.sync_helper() == "sync"
+        assert DummyService.get_item.__doc__ == "Return item"
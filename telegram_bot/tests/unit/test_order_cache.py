@@ -0,0 +1,180 @@
+import asyncio
+import datetime
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+import pytest
+
+from services import order_cache
+from services.order_cache import OrderSnapshotCache
+
+
+def order(status, number="ZG1"):
+    return {
+        "orderNumber": number,
+        "userId": 7,
+        "orderStatus": status,
+        "total": 5000,
+        "createdAt": datetime.datetime(2024, 5, 1, 10, 0),
+        "items": [{"product": {"name": "Костюм"}, "quantity": 1}]
+    }
+
+
+class TestOrderSnapshotCache:
+    """Tests for the order snapshot cache."""
+
+    @pytest.mark.asyncio
+    async def test_active_orders_expire(self):
+        """Test terminal orders stay cached while active ones expire."""
+        cache = OrderSnapshotCache(maxsize=10, active_ttl=0.01, redis_ttl=60, use_redis=False)
+        await cache.put(order("delivered", "ZG1"))
+        await cache.put(order("confirmed", "ZG2"))
+        await asyncio.sleep(0.02)
+
+        assert (await cache.get("ZG1"))["order"]["orderStatus"] == "delivered"
+        assert await cache.get("ZG2") is None
+
+    @pytest.mark.asyncio
+    async def test_redis_spill(self, monkeypatch):
+        """Test a terminal order and its rendered text survive in Redis."""
+        fakeredis = pytest.importorskip("fakeredis")
+        redis = fakeredis.FakeAsyncRedis()
+        monkeypatch.setattr(order_cache, "get_redis", lambda: redis)
+
+        first = OrderSnapshotCache(maxsize=10, active_ttl=60, redis_ttl=60, use_redis=True)
+        await first.put(order("cancelled"))
+        await first.set_text(order("cancelled"), "ru", "📋 <b>Заказ #ZG1</b>")
+        await first.put(order("pending", "ZG2"))
+
+        # Another replica (or a restart) with an empty memory cache
+        second = OrderSnapshotCache(maxsize=10, active_ttl=60, redis_ttl=60, use_redis=True)
+        entry = await second.get("ZG1")
+        assert entry["order"]["items"][0]["product"]["name"] == "Костюм"
+        assert entry["texts"] == {"ru": "📋 <b>Заказ #ZG1</b>"}
+        assert await second.get("ZG2") is None
+
+        # A re-read document drops the texts rendered from the previous one
+        await second.put({**order("cancelled"), "updatedAt": datetime.datetime(2024, 5, 2)})
+        assert (await first.get("ZG1"))["texts"] == {"ru": "📋 <b>Заказ #ZG1</b>"}
+        first.entries.clear()
+        assert (await first.get("ZG1"))["texts"] == {}
+
+        second.invalidate("ZG1")
+        await asyncio.gather(*second._deletes)
+        assert await first.get("ZG1") is not None
+        first.invalidate("ZG1")
+        assert await first.get("ZG1") is None
+
+    @pytest.mark.asyncio
+    async def test_text_keyed_on_order_version(self):
+        """Test a rendered text is served only for the same status and update time."""
+        cache = OrderSnapshotCache(maxsize=10, active_ttl=60, redis_ttl=60, use_redis=False)
+        cached = order("shipped")
+        await cache.put(cached)
+        await cache.set_text(dict(cached), "ru", "shipped")
+
+        assert await cache.get_text(dict(cached), "ru") == "shipped"
+        assert await cache.get_text(dict(cached), "en") is None
+        assert await cache.get_text(order("delivered"), "ru") is None
+
+        updated = {**cached, "updatedAt": datetime.datetime(2024, 5, 2)}
+        assert await cache.get_text(updated, "ru") is None
+        await cache.set_text(updated, "ru", "updated")
+        assert await cache.get_text(cached, "ru") == "shipped"
+
+    @pytest.mark.asyncio
+    async def test_get_order_by_id_reads_once(self, monkeypatch):
+        """Test repeated detail views of a terminal order read Mongo once and check the owner."""
+        mongomock_motor = pytest.importorskip("mongomock_motor")
+        from services import order_service
+        from services.order_service import OrderService
+
+        collection = mongomock_motor.AsyncMongoMockClient()["ziggler_test"]["orders"]
+        monkeypatch.setattr(order_service, "get_orders_collection", lambda: collection)
+        monkeypatch.setattr(order_service, "order_snapshots", OrderSnapshotCache(10, 60, 60, use_redis=False))
+        await collection.insert_one(order("delivered"))
+
+        first = await OrderService.get_order_by_id("ZG1", 7)
+        await collection.delete_many({})
+
+        assert await OrderService.get_order_by_id("ZG1", 7) is first
+        assert await OrderService.get_order_by_id("ZG1", 8) is None
+
+
+class TestOrderDetailsView:
+    """Tests for the order details handler and its cached texts."""
+
+    @pytest.fixture
+    def view(self, monkeypatch):
+        mongomock_motor = pytest.importorskip("mongomock_motor")
+        from handlers import orders
+        from services import order_service
+        from services.order_tracking import OrderTracker
+
+        collection = mongomock_motor.AsyncMongoMockClient()["ziggler_test"]["orders"]
+        cache = OrderSnapshotCache(10, 60, 60, use_redis=False)
+        monkeypatch.setattr(order_service, "get_orders_collection", lambda: collection)
+        monkeypatch.setattr(order_service, "order_snapshots", cache)
+        monkeypatch.setattr(orders, "order_snapshots", cache)
+        monkeypatch.setattr(orders, "order_tracker", OrderTracker(cache_size=10, merge_window=0.01))
+        return SimpleNamespace(collection=collection, cache=cache)
+
+    @staticmethod
+    def full_order(status="delivered"):
+        return {
+            **order(status),
+            "updatedAt": datetime.datetime(2024, 5, 3, 12, 0),
+            "customerInfo": {"phone": "+77001234567", "email": "a&b@example.kz"},
+            "shippingAddress": {"street": "Абая <10>"},
+            "items": [{"product": {"name": "Костюм"}, "size": "M", "color": "Чёрный", "quantity": 2, "price": 2500}]
+        }
+
+    @staticmethod
+    def callback(data, user_id=7):
+        return SimpleNamespace(
+            data=data,
+            from_user=SimpleNamespace(id=user_id),
+            message=SimpleNamespace(edit_text=AsyncMock()),
+            answer=AsyncMock()
+        )
+
+    @pytest.mark.asyncio
+    async def test_callback_renders_details(self, view):
+        """Test tapping order details renders the full order, escaped, for its owner only."""
+        from handlers.orders import callback_order_details
+
+        await view.collection.insert_one(self.full_order())
+
+        callback = self.callback("order_details_ZG1")
+        await callback_order_details(callback, language="en")
+
+        text = callback.message.edit_text.call_args[0][0]
+        assert "<b>Order #ZG1</b>" in text
+        assert "Абая &lt;10&gt;" in text
+        assert "a&amp;b@example.kz" in text
+        assert "Костюм" in text and "2 × 2,500 ₸" in text
+        callback.answer.assert_awaited_once_with()
+
+        stranger = self.callback("order_details_ZG1", user_id=8)
+        await callback_order_details(stranger)
+        stranger.message.edit_text.assert_not_called()
+        stranger.answer.assert_awaited_once_with("Заказ не найден")
+
+    @pytest.mark.asyncio
+    async def test_details_text_cached_per_version(self, view):
+        """Test a miss renders and stores the text, a hit returns it, another version renders again."""
+        from handlers.orders import format_order_details, get_order_details_text
+        from services.order_service import OrderService
+
+        await view.collection.insert_one(self.full_order())
+        cached = await OrderService.get_order_by_id("ZG1", 7)
+
+        text = await get_order_details_text(cached, "ru")
+        assert text == format_order_details(cached, "ru")
+        assert await view.cache.get_text(cached, "ru") == text
+
+        await view.cache.set_text(cached, "ru", "stored")
+        assert await get_order_details_text(dict(cached), "ru") == "stored"
+
+        updated = {**cached, "updatedAt": datetime.datetime(2024, 5, 4)}
+        assert await get_order_details_text(updated, "ru") == format_order_details(updated, "ru")
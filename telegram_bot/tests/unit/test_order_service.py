@@ -0,0 +1,57 @@
+import datetime
+
+import pytest
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+from services import order_service
+from services.order_service import OrderService
+
+
+@pytest.fixture
+def orders_collection(monkeypatch):
+    collection = mongomock_motor.AsyncMongoMockClient()["ziggler_test"]["orders"]
+    monkeypatch.setattr(order_service, "get_orders_collection", lambda: collection)
+    return collection
+
+
+class TestUserOrders:
+    """Tests for keyset-paginated order summaries."""
+
+    @pytest.mark.asyncio
+    async def test_pages_cover_all_orders_newest_first(self, orders_collection):
+        """Test pages follow each other without gaps or repeats, even for equal createdAt."""
+        start = datetime.datetime(2024, 5, 1, 10, 0)
+        await orders_collection.insert_many([
+            {
+                "orderNumber": f"ZG{n:02d}",
+                "userId": 7,
+                # Pairs of orders share the same createdAt
+                "createdAt": start + datetime.timedelta(minutes=n // 2),
+                "orderStatus": "delivered",
+                "total": 1000,
+                "items": [{"product": {"name": "Костюм"}, "quantity": 1}]
+            }
+            for n in range(11)
+        ])
+        await orders_collection.insert_one({"orderNumber": "OTHER", "userId": 8, "createdAt": start})
+
+        numbers, cursor = [], None
+        while True:
+            page = await OrderService.get_user_orders(7, limit=4, cursor=cursor, with_total=True)
+            assert page["total"] == 11
+            assert all("items" not in order for order in page["orders"])
+            numbers += [order["orderNumber"] for order in page["orders"]]
+            cursor = page["next_cursor"]
+            if not page["has_more"]:
+                break
+
+        assert len(numbers) == len(set(numbers)) == 11
+        created = [int(number[2:]) // 2 for number in numbers]
+        assert created == sorted(created, reverse=True)
+
+    @pytest.mark.asyncio
+    async def test_invalid_cursor(self, orders_collection):
+        """Test a damaged continuation token is rejected."""
+        with pytest.raises(ValueError):
+            await OrderService.get_user_orders(7, cursor="broken")
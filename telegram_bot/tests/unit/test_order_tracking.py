@@ -0,0 +1,110 @@
+import asyncio
+import datetime
+
+import pytest
+
+from services.order_tracking import OrderTracker
+
+
+def order(status, updated_at=None, number="ZG1", user_id=7):
+    return {
+        "orderNumber": number,
+        "userId": user_id,
+        "orderStatus": status,
+        "createdAt": datetime.datetime(2024, 5, 1, 10, 0),
+        "updatedAt": updated_at or datetime.datetime(2024, 5, 1, 10, 0)
+    }
+
+
+@pytest.fixture
+def tracker():
+    tracker = OrderTracker(cache_size=100, merge_window=0.01)
+    tracker.sent = []
+
+    async def notify(user_id, order_number, status):
+        tracker.sent.append((user_id, order_number, status))
+
+    tracker.notify = notify
+    return tracker
+
+
+class TestOrderTracker:
+    """Tests for order status history and merged notifications."""
+
+    @pytest.mark.asyncio
+    async def test_rapid_transitions_merged(self, tracker):
+        """Test transitions within the merge window produce one message with the latest status."""
+        tracker.apply_status(order("pending"))
+        tracker.apply_status(order("confirmed"))
+        tracker.apply_status(order("preparing"))
+        await asyncio.sleep(0.05)
+
+        assert tracker.sent == [(7, "ZG1", "preparing")]
+        history = await tracker.get_history("ZG1", 7)
+        assert [status for status, _ in history["statuses"]] == ["pending", "confirmed", "preparing"]
+
+    @pytest.mark.asyncio
+    async def test_return_to_previous_status_not_sent(self, tracker):
+        """Test a status changed and changed back within the window is not announced."""
+        tracker.apply_status(order("shipping"))
+        tracker.apply_status(order("pending"))
+        tracker.apply_status(order("shipping"))
+        await asyncio.sleep(0.05)
+
+        assert tracker.sent == []
+
+    @pytest.mark.asyncio
+    async def test_history_cached_and_owner_checked(self, tracker, monkeypatch):
+        """Test the track button reads the order once and only for its owner."""
+        from services import order_tracking
+        reads = []
+
+        async def get_order_status(order_number, user_id):
+            reads.append(order_number)
+            return order("confirmed") if user_id == 7 else None
+
+        monkeypatch.setattr(order_tracking.OrderService, "get_order_status", get_order_status)
+
+        assert (await tracker.get_history("ZG1", 7))["statuses"][0][0] == "confirmed"
+        assert (await tracker.get_history("ZG1", 7))["statuses"][0][0] == "confirmed"
+        assert await tracker.get_history("ZG1", 8) is None
+        assert reads == ["ZG1"]
+
+    @pytest.mark.asyncio
+    async def test_polling_fallback(self, tracker, monkeypatch):
+        """Test polling by updatedAt detects status changes of known active orders."""
+        mongomock_motor = pytest.importorskip("mongomock_motor")
+        from services import order_tracking
+
+        collection = mongomock_motor.AsyncMongoMockClient()["ziggler_test"]["orders"]
+        monkeypatch.setattr(order_tracking, "get_orders_collection", lambda: collection)
+        start = datetime.datetime(2024, 5, 1, 10, 0)
+        await collection.insert_many([
+            order("confirmed", start, number="ZG1"),
+            order("delivered", start, number="ZG2")
+        ])
+
+        await tracker.poll_changes()
+        await collection.update_one(
+            {"orderNumber": "ZG1"},
+            {"$set": {"orderStatus": "shipping", "updatedAt": start + datetime.timedelta(hours=1)}}
+        )
+        await tracker.poll_changes()
+        # Unchanged orders returned by the $gte watermark are ignored
+        await tracker.poll_changes()
+        await asyncio.sleep(0.05)
+
+        assert tracker.sent == [(7, "ZG1", "shipping")]
+
+    @pytest.mark.asyncio
+    async def test_stale_copy_ignored(self, tracker):
+        """Test an older copy of an order does not roll the status history back."""
+        start = datetime.datetime(2024, 5, 1, 10, 0)
+        tracker.apply_status(order("pending", start))
+        tracker.apply_status(order("confirmed", start + datetime.timedelta(minutes=5)))
+        tracker.apply_status(order("pending", start))
+        await asyncio.sleep(0.05)
+
+        history = await tracker.get_history("ZG1", 7)
+        assert [status for status, _ in history["statuses"]] == ["pending", "confirmed"]
+        assert tracker.sent == [(7, "ZG1", "confirmed")]
@@ -0,0 +1,86 @@
+import asyncio
+
+import pytest
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import SendMessage
+
+from utils.outbound import OutboundScheduler, Priority, outbound_priority
+
+
+def make_sender(sent, fail_first=None):
+    """Fake next request middleware recording chat and text of every sent message."""
+    failures = dict(fail_first or {})
+
+    async def make_request(bot, method):
+        await asyncio.sleep(0)
+        if failures.get(method.text):
+            failures[method.text] -= 1
+            raise TelegramRetryAfter(method=method, message="Too Many Requests", retry_after=0.05)
+        sent.append((method.chat_id, method.text))
+        return method.text
+
+    return make_request
+
+
+class TestOutboundScheduler:
+    """Tests for the outbound message scheduler."""
+
+    @pytest.mark.asyncio
+    async def test_interactive_before_broadcast(self):
+        """Test queued interactive replies are sent before queued broadcasts."""
+        scheduler = OutboundScheduler(global_rate=1000, chat_rate=1000, chat_burst=1000)
+        # An empty global bucket makes everything wait in the queue first
+        scheduler.global_bucket.tokens = 0
+        sent = []
+        sender = make_sender(sent)
+
+        async def send(chat_id, text, priority):
+            with outbound_priority(priority):
+                return await scheduler.submit(None, SendMessage(chat_id=chat_id, text=text), sender)
+
+        results = await asyncio.gather(
+            send(1, "broadcast", Priority.BROADCAST),
+            send(2, "notification", Priority.NOTIFICATION),
+            send(3, "reply", Priority.INTERACTIVE)
+        )
+        await scheduler.close()
+
+        assert results == ["broadcast", "notification", "reply"]
+        assert [text for _, text in sent] == ["reply", "notification", "broadcast"]
+
+    @pytest.mark.asyncio
+    async def test_chat_order_and_rate(self):
+        """Test messages to one chat keep their order and respect the chat burst."""
+        scheduler = OutboundScheduler(global_rate=1000, chat_rate=0.001, chat_burst=2)
+        sent = []
+        sender = make_sender(sent)
+
+        tasks = [
+            asyncio.create_task(scheduler.submit(None, SendMessage(chat_id=chat_id, text=f"{chat_id}-{n}"), sender))
+            for n in range(3) for chat_id in (1, 2)
+        ]
+        await asyncio.sleep(0.05)
+
+        assert sorted(sent) == [(1, "1-0"), (1, "1-1"), (2, "2-0"), (2, "2-1")]
+        assert len(scheduler) == 2
+        await scheduler.close()
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        assert sum(isinstance(result, asyncio.CancelledError) for result in results) == 2
+
+    @pytest.mark.asyncio
+    async def test_retry_after(self):
+        """Test a RetryAfter pauses the chat and the request is repeated."""
+        scheduler = OutboundScheduler(global_rate=1000, chat_rate=1000, chat_burst=1000, max_retries=1)
+        sent = []
+        sender = make_sender(sent, fail_first={"a": 1, "never": 5})
+
+        first = asyncio.create_task(scheduler.submit(None, SendMessage(chat_id=1, text="a"), sender))
+        second = asyncio.create_task(scheduler.submit(None, SendMessage(chat_id=1, text="b"), sender))
+
+        assert await first == "a"
+        assert await second == "b"
+        assert sent == [(1, "a"), (1, "b")]
+
+        with pytest.raises(TelegramRetryAfter):
+            await scheduler.submit(None, SendMessage(chat_id=2, text="never"), sender)
+        await scheduler.close()
@@ -0,0 +1,39 @@
+import pytest
+from datetime import datetime
+from bson import ObjectId
+
+from utils.pagination import encode_cursor, decode_cursor
+
+
+class TestPaginationCursor:
+    """Tests for keyset pagination tokens."""
+
+    def test_id_cursor_roundtrip(self):
+        """Test cursor with only _id."""
+        last_id = ObjectId()
+        token = encode_cursor(last_id)
+
+        assert len(token) == 16
+        assert decode_cursor(token) == (last_id, None)
+
+    def test_date_cursor_roundtrip(self):
+        """Test cursor with _id and a sort date (millisecond precision)."""
+        last_id = ObjectId()
+        created_at = datetime(2025, 1, 15, 10, 30, 45, 123456)
+        token = encode_cursor(last_id, created_at)
+
+        assert len(token) == 27
+        assert decode_cursor(token) == (last_id, datetime(2025, 1, 15, 10, 30, 45, 123000))
+
+    def test_cursor_fits_callback_data(self):
+        """Test token is safe for Telegram callback_data."""
+        token = encode_cursor(ObjectId(), datetime(2025, 1, 15))
+        assert len(f"catpage_classic_{token}".encode()) <= 64
+        assert "=" not in token
+
+    def test_invalid_cursor(self):
+        """Test damaged tokens are rejected."""
+        with pytest.raises(ValueError):
+            decode_cursor("not-a-cursor")
+        with pytest.raises(ValueError):
+            decode_cursor("!!!")
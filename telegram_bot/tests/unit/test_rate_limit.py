@@ -0,0 +1,46 @@
+import pytest
+
+from utils.rate_limit import MemoryRateLimiter, RedisRateLimiter, TokenBucket, parse_limits
+
+
+class TestTokenBucket:
+    """Tests for token buckets and rate limiters."""
+
+    def test_bucket_burst_then_empty(self):
+        """Test a full bucket allows a burst of capacity tokens."""
+        bucket = TokenBucket(rate=0.001, capacity=3)
+
+        assert [bucket.consume() for _ in range(4)] == [True, True, True, False]
+        assert bucket.delay() > 0
+
+    def test_parse_limits(self):
+        """Test limits parsing from config strings."""
+        assert parse_limits("catalog=2/5, cart=1,") == {"catalog": (2.0, 5.0), "cart": (1.0, 1.0)}
+
+    @pytest.mark.asyncio
+    async def test_memory_limiter_all_or_nothing(self):
+        """Test a token is taken from every bucket only if all have one."""
+        limiter = MemoryRateLimiter()
+        user_a = ("cart:1", (0.001, 1))
+        user_b = ("cart:2", (0.001, 1))
+        shared = ("cart:global", (0.001, 2))
+
+        assert await limiter.acquire([user_a, shared]) is True
+        assert await limiter.acquire([user_a, shared]) is False
+        # The rejected request did not consume the global token
+        assert await limiter.acquire([user_b, shared]) is True
+        assert await limiter.acquire([("cart:3", (0.001, 1)), shared]) is False
+
+    @pytest.mark.asyncio
+    async def test_redis_limiter(self):
+        """Test the Lua limiter shares buckets through Redis."""
+        fakeredis = pytest.importorskip("fakeredis")
+        pytest.importorskip("lupa")
+
+        redis = fakeredis.FakeAsyncRedis()
+        first, second = RedisRateLimiter(redis), RedisRateLimiter(redis)
+        limits = [("cart:1", (0.001, 2))]
+
+        assert await first.acquire(limits) is True
+        assert await second.acquire(limits) is True
+        assert await first.acquire(limits) is False
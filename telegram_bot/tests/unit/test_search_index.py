@@ -0,0 +1,74 @@
+import pytest
+from bson import ObjectId
+
+from services.search_index import SearchIndex, normalize
+
+
+def make_product(name, description="", tags=None, rating=0.0, is_active=True):
+    return {
+        "_id": ObjectId(),
+        "name": name,
+        "description": description,
+        "tags": tags or [],
+        "rating": rating,
+        "isActive": is_active
+    }
+
+
+@pytest.fixture
+def index():
+    index = SearchIndex()
+    index.upsert(make_product("Классический чёрный костюм", "Шерсть 100%", ["classic"], rating=4.8))
+    index.upsert(make_product("Синий костюм Slim Fit", "Современный крой", ["slim"], rating=4.6))
+    index.upsert(make_product("Белая рубашка", "Под классический костюм", rating=4.9))
+    return index
+
+
+class TestNormalize:
+    """Tests for search text normalization."""
+
+    def test_case_and_yo(self):
+        assert normalize("Чёрный") == normalize("черный")
+
+    def test_kazakh_letters(self):
+        assert normalize("Қара") == normalize("кара")
+
+    def test_transliteration(self):
+        assert normalize("костюм") == normalize("kostyum")
+
+
+class TestSearchIndex:
+    """Tests for the in-memory product search index."""
+
+    def test_exact_match(self, index):
+        names = [p["name"] for p in index.search("slim")]
+        assert names == ["Синий костюм Slim Fit"]
+
+    def test_prefix_match(self, index):
+        names = [p["name"] for p in index.search("руба")]
+        assert names == ["Белая рубашка"]
+
+    def test_all_tokens_required(self, index):
+        names = [p["name"] for p in index.search("черный костюм")]
+        assert names == ["Классический чёрный костюм"]
+
+    def test_name_ranked_above_description(self, index):
+        names = [p["name"] for p in index.search("классический")]
+        assert names[0] == "Классический чёрный костюм"
+        assert "Белая рубашка" in names
+
+    def test_latin_query_finds_cyrillic(self, index):
+        assert len(index.search("kostyum")) == 3
+
+    def test_incremental_updates(self, index):
+        product = make_product("Праздничный смокинг")
+        index.upsert(product)
+        assert index.search("смокинг") == [product]
+
+        index.upsert({**product, "isActive": False})
+        assert index.search("смокинг") == []
+
+        index.upsert({**product, "name": "Вечерний смокинг"})
+        index.remove(str(product["_id"]))
+        assert index.search("смокинг") == []
+        assert index.search("вечерний") == []
@@ -0,0 +1,149 @@
+import asyncio
+import queue
+
+import pytest
+
+from src import sharding
+from src.sharding import ShardRouter, UserSequencer, WorkerCrashed, shard_key
+
+
+class FakeProcess:
+    """Worker process stand-in that can be killed."""
+
+    def __init__(self, name):
+        self.name = name
+        self.alive = True
+        self.exitcode = None
+
+    def is_alive(self):
+        return self.alive
+
+    def kill(self):
+        self.alive = False
+        self.exitcode = -9
+
+    def terminate(self):
+        self.kill()
+
+    def join(self, timeout=None):
+        pass
+
+
+def make_router(workers=2, queue_size=1, **kwargs):
+    spawned = []
+
+    def spawn(index):
+        spawned.append(index)
+        return queue.Queue(maxsize=queue_size), FakeProcess(f"bot-worker-{index}")
+
+    return ShardRouter(workers, spawn, **kwargs), spawned
+
+
+def update(user_id):
+    return {"update_id": user_id, "message": {"message_id": 1, "from": {"id": user_id}, "chat": {"id": user_id}}}
+
+
+class TestSharding:
+    """Tests for update sharding by user."""
+
+    def test_shard_key_from_user(self):
+        """Test updates are keyed by the sender."""
+        message = {"update_id": 1, "message": {"message_id": 1, "from": {"id": 77}, "chat": {"id": -100}}}
+        callback = {"update_id": 2, "callback_query": {"id": "1", "from": {"id": 77}, "data": "cart"}}
+
+        assert shard_key(message) == 77
+        assert shard_key(callback) == 77
+
+    def test_shard_key_fallbacks(self):
+        """Test chat id and update_id fallbacks."""
+        channel_post = {"update_id": 3, "channel_post": {"message_id": 1, "chat": {"id": -100}}}
+
+        assert shard_key(channel_post) == -100
+        assert shard_key({"update_id": 4}) == 4
+
+    @pytest.mark.asyncio
+    async def test_sequencer_keeps_per_user_order(self):
+        """Test updates of one user run in order while users run concurrently."""
+        sequencer = UserSequencer(max_concurrency=10)
+        log = []
+
+        async def handle(user, n, delay):
+            await asyncio.sleep(delay)
+            log.append((user, n))
+
+        await sequencer.submit(1, handle(1, 1, 0.03))
+        await sequencer.submit(1, handle(1, 2, 0.0))
+        await sequencer.submit(2, handle(2, 1, 0.0))
+        await sequencer.drain()
+
+        assert log == [(2, 1), (1, 1), (1, 2)]
+
+    @pytest.mark.asyncio
+    async def test_sequencer_survives_errors(self):
+        """Test a failed update does not block the next one of the same user."""
+        sequencer = UserSequencer(max_concurrency=1)
+        done = []
+
+        async def fail():
+            raise RuntimeError("boom")
+
+        async def ok():
+            done.append(True)
+
+        await sequencer.submit(1, fail())
+        await sequencer.submit(1, ok())
+        await sequencer.drain()
+
+        assert done == [True]
+
+
+class TestShardRouter:
+    """Tests for routing updates to worker processes and supervising them."""
+
+    @pytest.mark.asyncio
+    async def test_dispatch_by_user(self):
+        """Test updates go to the queue of the user's shard."""
+        router, _ = make_router(queue_size=10)
+
+        await router.dispatch(update(4))
+        await router.dispatch(update(7))
+
+        assert router.queues[0].get_nowait() == (4, update(4))
+        assert router.queues[1].get_nowait() == (7, update(7))
+
+    @pytest.mark.asyncio
+    async def test_dead_worker_with_full_queue_is_restarted(self, monkeypatch):
+        """Test a full queue of a dead worker does not block dispatching forever."""
+        monkeypatch.setattr(sharding, "PUT_TIMEOUT", 0.01)
+        router, spawned = make_router()
+        await router.dispatch(update(2))
+        router.processes[0].kill()
+
+        await asyncio.wait_for(router.dispatch(update(4)), timeout=1)
+
+        assert spawned == [0, 1, 0]
+        assert router.processes[0].is_alive()
+        assert router.queues[0].get_nowait() == (4, update(4))
+
+    def test_supervise_restarts_idle_worker(self):
+        """Test a dead worker is restarted even without updates for it."""
+        router, spawned = make_router()
+        router.processes[1].kill()
+
+        router.check_workers()
+
+        assert spawned == [0, 1, 1]
+        assert all(process.is_alive() for process in router.processes)
+
+    @pytest.mark.asyncio
+    async def test_crash_loop_fails_loudly(self):
+        """Test a worker crashing too often stops the bot instead of restarting forever."""
+        router, _ = make_router(max_restarts=2, restart_window=60)
+
+        for _ in range(2):
+            router.processes[0].kill()
+            router.check_workers()
+        router.processes[0].kill()
+
+        with pytest.raises(WorkerCrashed):
+            await router.supervise(interval=0)
@@ -0,0 +1,49 @@
+import pytest
+
+from utils.message_texts import MESSAGE_TEXTS
+from utils.templates import Template, TEMPLATES, get_template, render
+
+
+class TestTemplates:
+    """Tests for compiled message templates."""
+
+    def test_render_formats_and_escapes(self):
+        """Test string fields are escaped and format specs applied."""
+        template = Template("<b>{name}</b> {price:,} ₸")
+
+        assert template.render(name="Tom & <Jerry>", price=89990) == "<b>Tom &amp; &lt;Jerry&gt;</b> 89,990 ₸"
+
+    def test_raw_field_is_not_escaped(self):
+        """Test {field!h} inserts a ready HTML fragment."""
+        template = Template("{name}{extra!h}")
+
+        assert template.render(name="<i>", extra="<i>x</i>") == "&lt;i&gt;<i>x</i>"
+
+    def test_unsupported_conversion(self):
+        """Test only the raw conversion is accepted."""
+        with pytest.raises(ValueError):
+            Template("{name!r}")
+
+    def test_render_to_appends_parts(self):
+        """Test several renders can share one output list."""
+        out = []
+        item = Template("• {name}\n")
+        for name in ("A", "B"):
+            item.render_to(out, {"name": name})
+
+        assert "".join(out) == "• A\n• B\n"
+
+    def test_language_fallback(self):
+        """Test unknown language falls back to Russian."""
+        assert get_template("cart_header", "de") is TEMPLATES["ru"]["cart_header"]
+        assert render("status_delivered", "en") == "Delivered"
+
+    def test_all_languages_have_same_fields(self):
+        """Test translations use the same template fields as Russian."""
+        def fields(template):
+            return sorted(step[1] for step in template._steps if step[1] is not None)
+
+        for language in MESSAGE_TEXTS:
+            assert TEMPLATES[language].keys() == TEMPLATES["ru"].keys()
+            for name, template in TEMPLATES[language].items():
+                assert fields(template) == fields(TEMPLATES["ru"][name]), (language, name)
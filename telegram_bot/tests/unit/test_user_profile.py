@@ -0,0 +1,156 @@
+import pytest
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+from aiogram.types import User
+
+from middlewares.user_profile import UserProfileMiddleware
+from services import user_service
+from services.user_service import UserService, user_profiles
+
+
+@pytest.fixture
+def users_collection(monkeypatch):
+    collection = mongomock_motor.AsyncMongoMockClient()["ziggler_test"]["users"]
+    monkeypatch.setattr(user_service, "get_users_collection", lambda: collection)
+    user_profiles.clear()
+    yield collection
+    user_profiles.clear()
+
+
+class TestUserProfile:
+    """Tests for the cached user profile and the profile middleware."""
+
+    @pytest.mark.asyncio
+    async def test_profile_is_cached(self, users_collection):
+        """Test the profile is read once and holds only profile fields."""
+        await users_collection.insert_one({"telegramId": 1, "language": "kk", "addresses": [{"city": "Алматы"}]})
+
+        profile = await UserService.get_user_profile(1)
+        await users_collection.delete_one({"telegramId": 1})
+
+        assert await UserService.get_user_profile(1) is profile
+        assert profile["language"] == "kk"
+        assert "addresses" not in profile
+
+    @pytest.mark.asyncio
+    async def test_unknown_user_not_cached(self, users_collection):
+        """Test a user not yet saved is read again on the next update."""
+        assert await UserService.get_user_profile(2) is None
+        await users_collection.insert_one({"telegramId": 2, "language": "en"})
+
+        assert (await UserService.get_user_profile(2))["language"] == "en"
+
+    @pytest.mark.asyncio
+    async def test_update_settings_invalidates(self, users_collection):
+        """Test a settings write is visible on the next profile read."""
+        await users_collection.insert_one({"telegramId": 3, "language": "ru", "notificationsEnabled": True})
+        await UserService.get_user_profile(3)
+
+        await UserService.update_user_settings(3, {"language": "en", "notificationsEnabled": False})
+
+        profile = await UserService.get_user_profile(3)
+        assert profile["language"] == "en"
+        assert profile["notificationsEnabled"] is False
+
+    @pytest.mark.asyncio
+    async def test_update_returns_new_profile(self, users_collection):
+        """Test settings writes return the new profile and refresh the cache with it."""
+        await users_collection.insert_one({"telegramId": 5, "language": "ru", "addresses": []})
+        await UserService.get_user_profile(5)
+
+        profile = await UserService.update_user_settings(5, {"language": "kk"})
+
+        assert profile["language"] == "kk"
+        assert "addresses" not in profile
+        assert await UserService.get_user_profile(5) is profile
+        assert await UserService.update_user_settings(404, {"language": "kk"}) is None
+
+    @pytest.mark.asyncio
+    async def test_unknown_setting_rejected(self, users_collection):
+        """Test only known top-level settings can be written."""
+        await users_collection.insert_one({"telegramId": 7, "language": "ru"})
+
+        with pytest.raises(ValueError):
+            await UserService.update_user_settings(7, {"isAdmin": True})
+
+    @pytest.mark.asyncio
+    async def test_update_preferences_keeps_subdocument(self, users_collection):
+        """Test preferences are stored as a subdocument and leave top-level settings alone."""
+        await users_collection.insert_one({"telegramId": 8, "language": "kk"})
+
+        await UserService.update_user_preferences(8, {"language": "en", "sizes": ["M"]})
+
+        user = await users_collection.find_one({"telegramId": 8})
+        assert user["preferences"] == {"language": "en", "sizes": ["M"]}
+        assert user["language"] == "kk"
+
+    @pytest.mark.asyncio
+    async def test_toggle_notifications(self, users_collection):
+        """Test repeated toggles flip the stored flag, a missing flag counts as enabled."""
+        await users_collection.insert_one({"telegramId": 6})
+
+        assert (await UserService.toggle_notifications(6))["notificationsEnabled"] is False
+        assert (await UserService.toggle_notifications(6))["notificationsEnabled"] is True
+        assert (await UserService.get_user_profile(6))["notificationsEnabled"] is True
+        assert await UserService.toggle_notifications(404) is None
+
+    @pytest.mark.asyncio
+    async def test_add_address_returns_addresses(self, users_collection):
+        """Test an address is appended as is and the new list is returned."""
+        await users_collection.insert_one({"telegramId": 7})
+
+        await UserService.add_user_address(7, {"city": "Алматы"})
+        addresses = await UserService.add_user_address(7, {"city": "$city"})
+
+        assert [address["city"] for address in addresses] == ["Алматы", "$city"]
+        assert (await users_collection.find_one({"telegramId": 7}))["addresses"] == addresses
+        assert await UserService.add_user_address(404, {"city": "Шымкент"}) is None
+
+    @pytest.mark.asyncio
+    async def test_add_address_moves_default(self, users_collection):
+        """Test a new default address clears the previous default in the same update."""
+        await users_collection.insert_one({"telegramId": 7, "addresses": [
+            {"id": "1", "city": "Алматы", "isDefault": True},
+            {"id": "2", "city": "Шымкент"}
+        ]})
+
+        try:
+            addresses = await UserService.add_user_address(7, {"city": "Астана", "isDefault": True})
+        except NotImplementedError:
+            pytest.skip("mongomock does not support $mergeObjects")
+
+        assert [address["city"] for address in addresses] == ["Алматы", "Шымкент", "Астана"]
+        assert [address["isDefault"] for address in addresses] == [False, False, True]
+        assert (await users_collection.find_one({"telegramId": 7}))["addresses"] == addresses
+
+    @pytest.mark.asyncio
+    async def test_middleware_injects_profile(self, users_collection):
+        """Test handlers get the profile and language, loaded once per update."""
+        await users_collection.insert_one({"telegramId": 4, "language": "kk"})
+        middleware = UserProfileMiddleware()
+        seen = []
+
+        async def handler(event, data):
+            seen.append((data["user_profile"], data["language"]))
+
+        data = {"event_from_user": User(id=4, is_bot=False, first_name="Test")}
+        await middleware(handler, object(), data)
+        user_profiles.clear()
+        await users_collection.update_one({"telegramId": 4}, {"$set": {"language": "en"}})
+        await middleware(handler, object(), data)
+
+        assert seen[0][1] == "kk"
+        assert seen[1] == seen[0]
+
+    @pytest.mark.asyncio
+    async def test_middleware_without_user(self, users_collection):
+        """Test updates without a sender get no profile."""
+        seen = []
+
+        async def handler(event, data):
+            seen.append((data["user_profile"], data["language"]))
+
+        await UserProfileMiddleware()(handler, object(), {})
+
+        assert seen == [(None, None)]
@@ -0,0 +1,55 @@
+import pytest
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+from services import user_service
+from services.user_service import UserActivityBuffer, UserService
+
+
+@pytest.fixture
+def users_collection(monkeypatch):
+    collection = mongomock_motor.AsyncMongoMockClient()["ziggler_test"]["users"]
+    monkeypatch.setattr(user_service, "get_users_collection", lambda: collection)
+    return collection
+
+
+class TestUserUpsert:
+    """Tests for atomic user upsert and the activity buffer."""
+
+    @pytest.mark.asyncio
+    async def test_create_then_update_keeps_settings(self, users_collection):
+        """Test repeated /start keeps createdAt and user-chosen settings."""
+        telegram_data = {"id": 42, "username": "old", "first_name": "Test"}
+        created = await UserService.create_or_update_user(telegram_data)
+        await users_collection.update_one({"telegramId": 42}, {"$set": {"language": "kk"}})
+
+        updated = await UserService.create_or_update_user({**telegram_data, "username": "new"})
+
+        assert updated["_id"] == created["_id"]
+        assert updated["createdAt"] == created["createdAt"]
+        assert updated["username"] == "new"
+        assert updated["language"] == "kk"
+        assert await users_collection.count_documents({}) == 1
+
+    @pytest.mark.asyncio
+    async def test_buffer_merges_touches(self, users_collection):
+        """Test touches of one user are merged into a single write."""
+        buffer = UserActivityBuffer(max_size=100)
+        buffer.touch(1, {"username": "a", "first_name": "A"})
+        buffer.touch(1)
+        buffer.touch(2)
+
+        assert len(buffer) == 2
+        assert await buffer.flush() == 2
+        assert len(buffer) == 0
+
+        user = await users_collection.find_one({"telegramId": 1})
+        assert user["username"] == "a"
+        assert user["notificationsEnabled"] is True
+        assert "lastSeenAt" in user
+        assert "username" not in await users_collection.find_one({"telegramId": 2})
+
+    @pytest.mark.asyncio
+    async def test_flush_empty_buffer(self, users_collection):
+        """Test flushing an empty buffer does nothing."""
+        assert await UserActivityBuffer(max_size=10).flush() == 0
@@ -0,0 +1,73 @@
+import json
+from typing import Any, Dict, Optional
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+from redis.asyncio import Redis
+
+STATE_FIELD = "s"
+DATA_FIELD = "d"
+
+def _encode(data: Dict[str, Any]) -> bytes:
+    """Компактная сериализация данных FSM (без пробелов, UTF-8 без экранирования)"""
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode()
+
+class CompactRedisStorage(BaseStorage):
+    """FSM-хранилище в Redis.
+
+    Состояние и данные одного ключа лежат в одном hash (поля ``s`` и ``d``),
+    каждая запись выполняется одним pipeline вместе с продлением TTL, поэтому
+    незавершённые диалоги сами удаляются через ``ttl`` секунд бездействия.
+    Хранилище общее для всех реплик бота и переживает их перезапуск.
+    """
+
+    def __init__(self, redis: Redis, ttl: Optional[int] = None, prefix: str = "fsm", owns_client: bool = False):
+        self.redis = redis
+        self.ttl = ttl
+        self.prefix = prefix
+        self.owns_client = owns_client
+
+    @classmethod
+    def from_url(cls, url: str, **kwargs: Any) -> "CompactRedisStorage":
+        """Создать хранилище с собственным подключением к Redis"""
+        return cls(Redis.from_url(url), owns_client=True, **kwargs)
+
+    def build_key(self, key: StorageKey) -> str:
+        parts = [self.prefix, str(key.bot_id), str(key.chat_id), str(key.user_id)]
+        if key.thread_id:
+            parts.append(str(key.thread_id))
+        parts.append(key.destiny)
+        return ":".join(parts)
+
+    async def _write(self, key: StorageKey, field: str, value: Optional[bytes]) -> None:
+        redis_key = self.build_key(key)
+        async with self.redis.pipeline(transaction=False) as pipe:
+            if value is None:
+                # Пустой hash Redis удаляет сам, отдельный DEL не нужен
+                pipe.hdel(redis_key, field)
+            else:
+                pipe.hset(redis_key, field, value)
+                if self.ttl:
+                    pipe.expire(redis_key, self.ttl)
+            await pipe.execute()
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        if isinstance(state, State):
+            state = state.state
+        await self._write(key, STATE_FIELD, state.encode() if state else None)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        value = await self.redis.hget(self.build_key(key), STATE_FIELD)
+        return value.decode() if isinstance(value, bytes) else value
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        await self._write(key, DATA_FIELD, _encode(data) if data else None)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        value = await self.redis.hget(self.build_key(key), DATA_FIELD)
+        if not value:
+            return {}
+        return json.loads(value)
+
+    async def close(self) -> None:
+        if self.owns_client:
+            await self.redis.aclose()
@@ -0,0 +1,233 @@
+# Тексты сообщений по языкам (коды как в get_language_name).
+# Синтаксис шаблонов описан в utils/templates.py.
+
+MESSAGE_TEXTS = {
+    "ru": {
+        # Карточка товара
+        "product_card": (
+            "<b>{name}</b>\n\n"
+            "{rating!h}"
+            "💰 {price:,} ₸\n\n"
+            "📝 <b>Описание:</b>\n{description}\n\n"
+            "⚡ <b>Характеристики:</b>\n"
+            "{materials!h}"
+            "• Страна: Выполнено в Корее\n"
+            "• Рекомендация: Брать на размер больше"
+        ),
+        "product_rating": "⭐ {rating:.1f}/5 ({reviews} отзывов)\n\n",
+        "product_no_description": "Описание товара отсутствует",
+        "product_materials": "• Материалы: {materials}\n",
+        "product_sizes": "\n📏 <b>Размеры:</b> {sizes}",
+        "product_colors": "\n🎨 <b>Цвета:</b> {colors}",
+
+        # Корзина
+        "cart_header": "🛒 <b>Ваша корзина</b>\n\n",
+        "cart_item": (
+            "• <b>{name}</b>\n"
+            "{unavailable!h}"
+            "   Размер: {size}, Цвет: {color}\n"
+            "   Количество: {quantity} × {price:,} ₸ = {total:,} ₸\n\n"
+        ),
+        "cart_item_unavailable": "   ⚠️ Товар больше не доступен\n",
+        "cart_total": "💰 <b>Итого: {total:,} ₸</b>\n\n",
+        "cart_delivery": "🚚 Доставка: {cost:,} ₸\n💰 <b>К оплате: {to_pay:,} ₸</b>\n\n",
+        "cart_free_delivery": "🚚 Доставка: <b>Бесплатно</b> (от {threshold:,} ₸)\n\n",
+
+        # Заказы
+        "orders_header": "📋 <b>Мои заказы ({count})</b>\n\n",
+        "order_list_item": (
+            "{index}. <b>Заказ #{number}</b>\n"
+            "   📅 {date}\n"
+            "   {emoji} {status}\n"
+            "   💰 {total:,} ₸\n\n"
+        ),
+        "order_details": (
+            "📋 <b>Заказ #{number}</b>\n\n"
+            "📅 Дата: {date}\n"
+            "{emoji} Статус: {status}\n"
+            "💰 Сумма: {total:,} ₸\n"
+            "📍 Адрес: {address}\n"
+            "📱 Телефон: {phone}\n"
+            "{email!h}"
+            "{notes!h}"
+            "\n<b>Товары:</b>\n"
+        ),
+        "order_email": "📧 Email: {email}\n",
+        "order_notes": "📝 Примечание: {notes}\n",
+        "order_item": (
+            "• {name}\n"
+            "   Размер: {size}, Цвет: {color}\n"
+            "   Количество: {quantity} × {price:,} ₸\n\n"
+        ),
+        "order_status_update": "{emoji} <b>Заказ #{number}</b>: {status}",
+        "order_tracking": (
+            "🚚 <b>Отслеживание заказа #{number}</b>\n\n"
+            "📍 <b>Текущий статус:</b> {emoji} {status}\n\n"
+            "📦 <b>История:</b>\n"
+        ),
+        "order_tracking_step": "✅ {status} - {date}\n",
+        "order_tracking_expected": "⏳ {status} - Ожидается\n",
+        "order_tracking_footer": "\n<i>Об изменении статуса мы сообщим отдельным сообщением</i>",
+        "favorites_header": "❤️ <b>Избранное ({count} товаров)</b>\n\n",
+        "favorites_item": "{index}. <b>{name}</b>\n   💰 {price:,} ₸\n",
+        "favorites_item_rating": "   ⭐ {rating:.1f}/5 ({reviews} отзывов)\n",
+        "status_pending": "Ожидает подтверждения",
+        "status_confirmed": "Подтверждён",
+        "status_preparing": "Готовится",
+        "status_shipping": "В пути",
+        "status_delivered": "Доставлен",
+        "status_cancelled": "Отменён",
+        "status_returned": "Возвращён",
+        "status_unknown": "Неизвестный статус",
+    },
+    "kk": {
+        "product_card": (
+            "<b>{name}</b>\n\n"
+            "{rating!h}"
+            "💰 {price:,} ₸\n\n"
+            "📝 <b>Сипаттамасы:</b>\n{description}\n\n"
+            "⚡ <b>Ерекшеліктері:</b>\n"
+            "{materials!h}"
+            "• Ел: Кореяда жасалған\n"
+            "• Ұсыныс: Бір өлшем үлкенін алыңыз"
+        ),
+        "product_rating": "⭐ {rating:.1f}/5 ({reviews} пікір)\n\n",
+        "product_no_description": "Тауар сипаттамасы жоқ",
+        "product_materials": "• Материалдар: {materials}\n",
+        "product_sizes": "\n📏 <b>Өлшемдер:</b> {sizes}",
+        "product_colors": "\n🎨 <b>Түстер:</b> {colors}",
+
+        "cart_header": "🛒 <b>Сіздің себетіңіз</b>\n\n",
+        "cart_item": (
+            "• <b>{name}</b>\n"
+            "{unavailable!h}"
+            "   Өлшемі: {size}, Түсі: {color}\n"
+            "   Саны: {quantity} × {price:,} ₸ = {total:,} ₸\n\n"
+        ),
+        "cart_item_unavailable": "   ⚠️ Тауар енді қолжетімсіз\n",
+        "cart_total": "💰 <b>Барлығы: {total:,} ₸</b>\n\n",
+        "cart_delivery": "🚚 Жеткізу: {cost:,} ₸\n💰 <b>Төлеуге: {to_pay:,} ₸</b>\n\n",
+        "cart_free_delivery": "🚚 Жеткізу: <b>Тегін</b> ({threshold:,} ₸ бастап)\n\n",
+
+        "orders_header": "📋 <b>Менің тапсырыстарым ({count})</b>\n\n",
+        "order_list_item": (
+            "{index}. <b>Тапсырыс #{number}</b>\n"
+            "   📅 {date}\n"
+            "   {emoji} {status}\n"
+            "   💰 {total:,} ₸\n\n"
+        ),
+        "order_details": (
+            "📋 <b>Тапсырыс #{number}</b>\n\n"
+            "📅 Күні: {date}\n"
+            "{emoji} Күйі: {status}\n"
+            "💰 Сомасы: {total:,} ₸\n"
+            "📍 Мекенжай: {address}\n"
+            "📱 Телефон: {phone}\n"
+            "{email!h}"
+            "{notes!h}"
+            "\n<b>Тауарлар:</b>\n"
+        ),
+        "order_email": "📧 Email: {email}\n",
+        "order_notes": "📝 Ескертпе: {notes}\n",
+        "order_item": (
+            "• {name}\n"
+            "   Өлшемі: {size}, Түсі: {color}\n"
+            "   Саны: {quantity} × {price:,} ₸\n\n"
+        ),
+        "order_status_update": "{emoji} <b>Тапсырыс #{number}</b>: {status}",
+        "order_tracking": (
+            "🚚 <b>Тапсырысты бақылау #{number}</b>\n\n"
+            "📍 <b>Ағымдағы күйі:</b> {emoji} {status}\n\n"
+            "📦 <b>Тарихы:</b>\n"
+        ),
+        "order_tracking_step": "✅ {status} - {date}\n",
+        "order_tracking_expected": "⏳ {status} - Күтілуде\n",
+        "order_tracking_footer": "\n<i>Күйі өзгергенде біз бөлек хабарлама жібереміз</i>",
+        "favorites_header": "❤️ <b>Таңдаулылар ({count} тауар)</b>\n\n",
+        "favorites_item": "{index}. <b>{name}</b>\n   💰 {price:,} ₸\n",
+        "favorites_item_rating": "   ⭐ {rating:.1f}/5 ({reviews} пікір)\n",
+        "status_pending": "Растауды күтуде",
+        "status_confirmed": "Расталды",
+        "status_preparing": "Дайындалуда",
+        "status_shipping": "Жолда",
+        "status_delivered": "Жеткізілді",
+        "status_cancelled": "Бас тартылды",
+        "status_returned": "Қайтарылды",
+        "status_unknown": "Белгісіз күй",
+    },
+    "en": {
+        "product_card": (
+            "<b>{name}</b>\n\n"
+            "{rating!h}"
+            "💰 {price:,} ₸\n\n"
+            "📝 <b>Description:</b>\n{description}\n\n"
+            "⚡ <b>Details:</b>\n"
+            "{materials!h}"
+            "• Country: Made in Korea\n"
+            "• Tip: Take one size up"
+        ),
+        "product_rating": "⭐ {rating:.1f}/5 ({reviews} reviews)\n\n",
+        "product_no_description": "No description available",
+        "product_materials": "• Materials: {materials}\n",
+        "product_sizes": "\n📏 <b>Sizes:</b> {sizes}",
+        "product_colors": "\n🎨 <b>Colors:</b> {colors}",
+
+        "cart_header": "🛒 <b>Your cart</b>\n\n",
+        "cart_item": (
+            "• <b>{name}</b>\n"
+            "{unavailable!h}"
+            "   Size: {size}, Color: {color}\n"
+            "   Quantity: {quantity} × {price:,} ₸ = {total:,} ₸\n\n"
+        ),
+        "cart_item_unavailable": "   ⚠️ No longer available\n",
+        "cart_total": "💰 <b>Total: {total:,} ₸</b>\n\n",
+        "cart_delivery": "🚚 Delivery: {cost:,} ₸\n💰 <b>To pay: {to_pay:,} ₸</b>\n\n",
+        "cart_free_delivery": "🚚 Delivery: <b>Free</b> (from {threshold:,} ₸)\n\n",
+
+        "orders_header": "📋 <b>My orders ({count})</b>\n\n",
+        "order_list_item": (
+            "{index}. <b>Order #{number}</b>\n"
+            "   📅 {date}\n"
+            "   {emoji} {status}\n"
+            "   💰 {total:,} ₸\n\n"
+        ),
+        "order_details": (
+            "📋 <b>Order #{number}</b>\n\n"
+            "📅 Date: {date}\n"
+            "{emoji} Status: {status}\n"
+            "💰 Amount: {total:,} ₸\n"
+            "📍 Address: {address}\n"
+            "📱 Phone: {phone}\n"
+            "{email!h}"
+            "{notes!h}"
+            "\n<b>Items:</b>\n"
+        ),
+        "order_email": "📧 Email: {email}\n",
+        "order_notes": "📝 Note: {notes}\n",
+        "order_item": (
+            "• {name}\n"
+            "   Size: {size}, Color: {color}\n"
+            "   Quantity: {quantity} × {price:,} ₸\n\n"
+        ),
+        "order_status_update": "{emoji} <b>Order #{number}</b>: {status}",
+        "order_tracking": (
+            "🚚 <b>Tracking order #{number}</b>\n\n"
+            "📍 <b>Current status:</b> {emoji} {status}\n\n"
+            "📦 <b>History:</b>\n"
+        ),
+        "order_tracking_step": "✅ {status} - {date}\n",
+        "order_tracking_expected": "⏳ {status} - Expected\n",
+        "order_tracking_footer": "\n<i>We will message you when the status changes</i>",
+        "favorites_header": "❤️ <b>Favorites ({count} items)</b>\n\n",
+        "favorites_item": "{index}. <b>{name}</b>\n   💰 {price:,} ₸\n",
+        "favorites_item_rating": "   ⭐ {rating:.1f}/5 ({reviews} reviews)\n",
+        "status_pending": "Awaiting confirmation",
+        "status_confirmed": "Confirmed",
+        "status_preparing": "Being prepared",
+        "status_shipping": "On the way",
+        "status_delivered": "Delivered",
+        "status_cancelled": "Cancelled",
+        "status_returned": "Returned",
+        "status_unknown": "Unknown status",
+    },
+}
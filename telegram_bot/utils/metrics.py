@@ -0,0 +1,74 @@
+import functools
+import inspect
+import time
+from typing import Optional
+
+from prometheus_client import Counter, Gauge, Histogram, start_http_server
+
+# Границы корзин гистограмм, сек: от быстрых чтений из кэша до медленных запросов к API
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+HANDLER_DURATION = Histogram(
+    "bot_handler_duration_seconds", "Время работы обработчика",
+    ["handler", "status"], buckets=LATENCY_BUCKETS
+)
+SERVICE_CALL_DURATION = Histogram(
+    "bot_service_call_duration_seconds", "Время вызова метода сервиса (MongoDB и кэши)",
+    ["service", "method", "status"], buckets=LATENCY_BUCKETS
+)
+TELEGRAM_REQUEST_DURATION = Histogram(
+    "bot_telegram_request_duration_seconds", "Время запроса к Telegram Bot API",
+    ["method", "status"], buckets=LATENCY_BUCKETS
+)
+THROTTLED_UPDATES = Counter(
+    "bot_throttled_updates_total", "Обновления, отброшенные ограничением частоты", ["group"]
+)
+DUPLICATE_UPDATES = Counter(
+    "bot_duplicate_updates_total", "Повторно доставленные обновления, отброшенные дедупликацией"
+)
+OUTBOUND_QUEUE_DEPTH = Gauge(
+    "bot_outbound_queue_depth", "Исходящие запросы, ожидающие отправки", ["priority"]
+)
+OUTBOUND_WAIT = Histogram(
+    "bot_outbound_wait_seconds", "Время ожидания исходящего запроса в очереди",
+    ["priority"], buckets=LATENCY_BUCKETS
+)
+OUTBOUND_RETRY_AFTER = Counter(
+    "bot_outbound_retry_after_total", "Ответы Telegram 429 (RetryAfter) на исходящие запросы"
+)
+BROADCAST_MESSAGES = Counter(
+    "bot_broadcast_messages_total", "Сообщения рассылок и уведомлений по результату", ["result"]
+)
+
+def instrument_service(cls):
+    """Декоратор класса сервиса: замеряет все его async staticmethod.
+
+    Вызовы попадают в SERVICE_CALL_DURATION с метками сервиса и метода.
+    """
+    for name, attribute in list(vars(cls).items()):
+        if name.startswith("_") or not isinstance(attribute, staticmethod):
+            continue
+        if inspect.iscoroutinefunction(attribute.__func__):
+            setattr(cls, name, staticmethod(_timed(cls.__name__, name, attribute.__func__)))
+    return cls
+
+def _timed(service: str, method: str, func):
+    ok = SERVICE_CALL_DURATION.labels(service, method, "ok")
+    error = SERVICE_CALL_DURATION.labels(service, method, "error")
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            result = await func(*args, **kwargs)
+        except Exception:
+            error.observe(time.perf_counter() - started)
+            raise
+        ok.observe(time.perf_counter() - started)
+        return result
+
+    return wrapper
+
+def start_metrics_server(port: int, host: Optional[str] = None) -> None:
+    """HTTP-эндпоинт /metrics в формате Prometheus (в отдельном потоке)"""
+    start_http_server(port, addr=host or "127.0.0.1")
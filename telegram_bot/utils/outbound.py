@@ -0,0 +1,234 @@
+import asyncio
+import contextvars
+import enum
+import logging
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, Iterator, List, Optional, Set
+
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import Response, TelegramMethod
+from aiogram.methods.base import TelegramType
+
+from config.config import config
+from utils.cache import TTLCache
+from utils.metrics import OUTBOUND_QUEUE_DEPTH, OUTBOUND_RETRY_AFTER, OUTBOUND_WAIT
+from utils.rate_limit import TokenBucket
+
+class Priority(enum.IntEnum):
+    """Класс исходящего сообщения: меньше - важнее"""
+    INTERACTIVE = 0   # ответы на действия пользователя
+    NOTIFICATION = 1  # уведомления о заказах
+    BROADCAST = 2     # рассылки
+
+_priority: contextvars.ContextVar[Priority] = contextvars.ContextVar("outbound_priority", default=Priority.INTERACTIVE)
+
+@contextmanager
+def outbound_priority(priority: Priority) -> Iterator[None]:
+    """Отправлять запросы внутри блока с указанным приоритетом"""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+class _Job:
+    __slots__ = ("chat_id", "priority", "bot", "method", "make_request", "future", "queued_at", "attempts")
+
+    def __init__(self, chat_id, priority, bot, method, make_request, future):
+        self.chat_id = chat_id
+        self.priority = priority
+        self.bot = bot
+        self.method = method
+        self.make_request = make_request
+        self.future = future
+        self.queued_at = time.monotonic()
+        self.attempts = 0
+
+class OutboundScheduler:
+    """Очередь исходящих запросов с лимитами Telegram.
+
+    Запрос уходит, когда есть токен в общей корзине (~30 сообщений/сек на
+    бота) и в корзине чата, а в этот чат не выполняется другой запрос -
+    так сохраняется порядок сообщений в чате. Из готовых к отправке первым
+    уходит запрос более важного класса, внутри класса - более ранний.
+    На RetryAfter чат ставится на паузу и запрос повторяется.
+    """
+
+    def __init__(self, global_rate: float, chat_rate: float, chat_burst: float, max_retries: int = 3):
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.max_retries = max_retries
+        self._queues: Dict[Priority, Deque[_Job]] = {priority: deque() for priority in Priority}
+        self._chat_buckets = TTLCache(maxsize=100000)
+        self._paused_until: Dict[Any, float] = {}
+        self._busy_chats: Set[Any] = set()
+        self._wakeup = asyncio.Event()
+        self._runner: Optional[asyncio.Task] = None
+        self._in_flight: Set[asyncio.Task] = set()
+
+    def __len__(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    async def submit(self, bot: Bot, method: TelegramMethod, make_request: NextRequestMiddlewareType) -> Any:
+        """Поставить запрос в очередь и дождаться его результата"""
+        if self._runner is None or self._runner.done():
+            self._runner = asyncio.create_task(self._run())
+
+        job = _Job(method.chat_id, _priority.get(), bot, method, make_request, asyncio.get_running_loop().create_future())
+        self._enqueue(job)
+        return await job.future
+
+    def _enqueue(self, job: _Job, front: bool = False) -> None:
+        queue = self._queues[job.priority]
+        if front:
+            queue.appendleft(job)
+        else:
+            queue.append(job)
+        OUTBOUND_QUEUE_DEPTH.labels(job.priority.name.lower()).set(len(queue))
+        self._wakeup.set()
+
+    def _chat_bucket(self, chat_id: Any) -> TokenBucket:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = TokenBucket(self.chat_rate, self.chat_burst)
+        # Наполнившаяся корзина не отличается от новой - её можно вытеснить
+        self._chat_buckets.set(chat_id, bucket, ttl=self.chat_burst / self.chat_rate)
+        return bucket
+
+    def _next_job(self) -> tuple:
+        """Следующий готовый к отправке запрос или (None, через сколько секунд проверить снова)"""
+        wait = self.global_bucket.delay()
+        if wait > 0:
+            return None, wait
+
+        now = time.monotonic()
+        wait = None
+        for priority in Priority:
+            queue = self._queues[priority]
+            # Чаты, у которых уже есть более ранний запрос в очереди этого класса
+            seen: Set[Any] = set()
+            for job in list(queue):
+                if job.future.done():
+                    # Отправитель уже не ждёт результата (отменён)
+                    queue.remove(job)
+                    continue
+                if job.chat_id in seen or job.chat_id in self._busy_chats:
+                    seen.add(job.chat_id)
+                    continue
+                seen.add(job.chat_id)
+
+                paused_until = self._paused_until.get(job.chat_id, 0)
+                if paused_until > now:
+                    wait = _earliest(wait, paused_until - now)
+                    continue
+                chat_wait = self._chat_bucket(job.chat_id).delay()
+                if chat_wait > 0:
+                    wait = _earliest(wait, chat_wait)
+                    continue
+
+                queue.remove(job)
+                OUTBOUND_QUEUE_DEPTH.labels(priority.name.lower()).set(len(queue))
+                return job, None
+        return None, wait
+
+    async def _run(self) -> None:
+        while True:
+            job, wait = self._next_job()
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=wait)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            self.global_bucket.consume()
+            self._chat_bucket(job.chat_id).consume()
+            self._busy_chats.add(job.chat_id)
+            task = asyncio.create_task(self._execute(job))
+            self._in_flight.add(task)
+            task.add_done_callback(self._in_flight.discard)
+
+    async def _execute(self, job: _Job) -> None:
+        if job.attempts == 0:
+            OUTBOUND_WAIT.labels(job.priority.name.lower()).observe(time.monotonic() - job.queued_at)
+        job.attempts += 1
+        try:
+            result = await job.make_request(job.bot, job.method)
+        except TelegramRetryAfter as e:
+            OUTBOUND_RETRY_AFTER.inc()
+            if job.attempts > self.max_retries:
+                self._finish(job, error=e)
+                return
+            logging.warning(f"RetryAfter {e.retry_after}s для чата {job.chat_id}")
+            self._paused_until[job.chat_id] = time.monotonic() + e.retry_after
+            # Лимит мог быть превышен и в целом по боту - сбавляем общий темп
+            self.global_bucket.tokens = 0
+            self._busy_chats.discard(job.chat_id)
+            self._enqueue(job, front=True)
+            return
+        except BaseException as e:
+            self._finish(job, error=e)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            return
+        self._finish(job, result=result)
+
+    def _finish(self, job: _Job, result: Any = None, error: Optional[BaseException] = None) -> None:
+        self._busy_chats.discard(job.chat_id)
+        self._paused_until.pop(job.chat_id, None)
+        self._wakeup.set()
+        if job.future.done():
+            return
+        if error is not None:
+            job.future.set_exception(error)
+        else:
+            job.future.set_result(result)
+
+    async def close(self) -> None:
+        """Остановить планировщик; запросы, оставшиеся в очереди, отменяются"""
+        tasks: List[asyncio.Task] = list(self._in_flight)
+        if self._runner is not None:
+            tasks.append(self._runner)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for queue in self._queues.values():
+            while queue:
+                job = queue.popleft()
+                if not job.future.done():
+                    job.future.cancel()
+
+def _earliest(wait: Optional[float], candidate: float) -> float:
+    return candidate if wait is None else min(wait, candidate)
+
+class OutboundSchedulerMiddleware(BaseRequestMiddleware):
+    """Пропускает запросы к чатам (отправка, редактирование) через OutboundScheduler.
+
+    Запросы без chat_id (ответы на нажатия кнопок, служебные методы) идут сразу.
+    """
+
+    def __init__(self, scheduler: OutboundScheduler):
+        self.scheduler = scheduler
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType]
+    ) -> Response[TelegramType]:
+        if getattr(method, "chat_id", None) is None:
+            return await make_request(bot, method)
+        return await self.scheduler.submit(bot, method, make_request)
+
+outbound_scheduler = OutboundScheduler(
+    global_rate=config.OUTBOUND_GLOBAL_RATE,
+    chat_rate=config.OUTBOUND_CHAT_RATE,
+    chat_burst=config.OUTBOUND_CHAT_BURST,
+    max_retries=config.OUTBOUND_MAX_RETRIES
+)
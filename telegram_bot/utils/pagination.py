@@ -0,0 +1,35 @@
+import base64
+import binascii
+import datetime
+import struct
+from typing import Optional, Tuple
+from bson import ObjectId
+
+_EPOCH = datetime.datetime(1970, 1, 1)
+
+def encode_cursor(last_id: ObjectId, sort_value: Optional[datetime.datetime] = None) -> str:
+    """Непрозрачный токен продолжения для keyset-пагинации.
+
+    Содержит ``_id`` последнего документа страницы и, если сортировка идёт
+    по дате, её значение (с точностью до миллисекунд, как в BSON). Токен
+    короткий (16 или 27 символов) и помещается в callback_data.
+    """
+    raw = last_id.binary
+    if sort_value is not None:
+        sort_value = sort_value.replace(tzinfo=None)
+        raw += struct.pack(">q", (sort_value - _EPOCH) // datetime.timedelta(milliseconds=1))
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(token: str) -> Tuple[ObjectId, Optional[datetime.datetime]]:
+    """Разобрать токен продолжения; ValueError, если токен повреждён"""
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+    except (binascii.Error, ValueError):
+        raise ValueError("Invalid cursor")
+
+    if len(raw) == 12:
+        return ObjectId(raw), None
+    if len(raw) == 20:
+        (milliseconds,) = struct.unpack(">q", raw[12:])
+        return ObjectId(raw[:12]), _EPOCH + datetime.timedelta(milliseconds=milliseconds)
+    raise ValueError("Invalid cursor")
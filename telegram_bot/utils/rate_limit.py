@@ -0,0 +1,132 @@
+import math
+import time
+from typing import Dict, Sequence, Tuple
+
+from redis.asyncio import Redis
+
+from utils.cache import TTLCache
+
+# Лимит: (скорость пополнения, токенов/сек; ёмкость корзины, токенов)
+Limit = Tuple[float, float]
+
+class TokenBucket:
+    """Корзина токенов: ``rate`` токенов в секунду, не больше ``capacity``"""
+
+    __slots__ = ("rate", "capacity", "tokens", "updated_at")
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def available(self, tokens: float = 1.0) -> bool:
+        self._refill(time.monotonic())
+        return self.tokens >= tokens
+
+    def consume(self, tokens: float = 1.0) -> bool:
+        """Списать токены, если их хватает"""
+        if not self.available(tokens):
+            return False
+        self.tokens -= tokens
+        return True
+
+    def delay(self, tokens: float = 1.0) -> float:
+        """Через сколько секунд хватит токенов (0 - уже хватает)"""
+        self._refill(time.monotonic())
+        if self.tokens >= tokens:
+            return 0.0
+        return (tokens - self.tokens) / self.rate
+
+class MemoryRateLimiter:
+    """Корзины токенов в памяти процесса (лимиты действуют в пределах одной реплики).
+
+    Корзина, простоявшая достаточно долго, чтобы наполниться, ничем не
+    отличается от новой, поэтому такие записи вытесняются.
+    """
+
+    def __init__(self, max_keys: int = 100000):
+        self._buckets = TTLCache(maxsize=max_keys)
+
+    async def acquire(self, limits: Sequence[Tuple[str, Limit]]) -> bool:
+        """Списать по токену из каждой корзины; всё или ничего"""
+        buckets = []
+        for key, (rate, capacity) in limits:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = TokenBucket(rate, capacity)
+            buckets.append((key, bucket))
+
+        allowed = all(bucket.available() for _, bucket in buckets)
+        for key, bucket in buckets:
+            if allowed:
+                bucket.tokens -= 1
+            self._buckets.set(key, bucket, ttl=bucket.capacity / bucket.rate)
+        return allowed
+
+# KEYS - корзины, ARGV - пары (скорость, ёмкость) для каждой из них.
+# Токен списывается из всех корзин, только если он есть в каждой.
+_ACQUIRE_SCRIPT = """
+local now = redis.call('TIME')
+now = tonumber(now[1]) + tonumber(now[2]) / 1000000
+local tokens = {}
+local allowed = 1
+for i, key in ipairs(KEYS) do
+    local rate = tonumber(ARGV[2 * i - 1])
+    local capacity = tonumber(ARGV[2 * i])
+    local bucket = redis.call('HMGET', key, 't', 'ts')
+    local value = tonumber(bucket[1]) or capacity
+    local updated_at = tonumber(bucket[2]) or now
+    value = math.min(capacity, value + math.max(0, now - updated_at) * rate)
+    if value < 1 then
+        allowed = 0
+    end
+    tokens[i] = value
+end
+for i, key in ipairs(KEYS) do
+    local value = tokens[i]
+    if allowed == 1 then
+        value = value - 1
+    end
+    redis.call('HSET', key, 't', tostring(value), 'ts', tostring(now))
+    redis.call('PEXPIRE', key, ARGV[2 * #KEYS + i])
+end
+return allowed
+"""
+
+class RedisRateLimiter:
+    """Корзины токенов в Redis: лимиты общие для всех реплик бота.
+
+    Проверка и списание выполняются одним Lua-скриптом, время берётся
+    у Redis, так что расхождение часов реплик не влияет на лимиты.
+    """
+
+    def __init__(self, redis: Redis, prefix: str = "throttle"):
+        self.redis = redis
+        self.prefix = prefix
+        self._script = redis.register_script(_ACQUIRE_SCRIPT)
+
+    async def acquire(self, limits: Sequence[Tuple[str, Limit]]) -> bool:
+        """Списать по токену из каждой корзины; всё или ничего"""
+        keys = [f"{self.prefix}:{key}" for key, _ in limits]
+        args = []
+        for _, (rate, capacity) in limits:
+            args += [rate, capacity]
+        # Время жизни ключа - время полного наполнения корзины
+        args += [math.ceil(capacity / rate * 1000) for _, (rate, capacity) in limits]
+        return bool(await self._script(keys=keys, args=args))
+
+def parse_limits(value: str) -> Dict[str, Limit]:
+    """Разобрать лимиты вида "catalog=2/5,cart=1/3" -> {"catalog": (2.0, 5.0), ...}"""
+    limits = {}
+    for item in value.split(","):
+        if not item.strip():
+            continue
+        group, _, limit = item.partition("=")
+        rate, _, capacity = limit.partition("/")
+        limits[group.strip()] = (float(rate), float(capacity or rate))
+    return limits
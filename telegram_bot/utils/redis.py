@@ -0,0 +1,19 @@
+from typing import Optional
+from redis.asyncio import Redis
+from config.config import config
+
+_redis: Optional[Redis] = None
+
+def get_redis() -> Redis:
+    """Общий клиент Redis (один пул соединений на процесс)"""
+    global _redis
+    if _redis is None:
+        _redis = Redis.from_url(config.REDIS_URL)
+    return _redis
+
+async def close_redis() -> None:
+    """Закрыть общий клиент Redis"""
+    global _redis
+    if _redis is not None:
+        await _redis.aclose()
+        _redis = None
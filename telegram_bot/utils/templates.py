@@ -0,0 +1,77 @@
+import html
+import string
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+from utils.message_texts import MESSAGE_TEXTS
+
+DEFAULT_LANGUAGE = "ru"
+
+# Поля шаблона экранируются; "{name!h}" вставляет уже готовый HTML-фрагмент
+RAW_CONVERSION = "h"
+
+@lru_cache(maxsize=8192)
+def escape(value: str) -> str:
+    """Экранирование текста для parse_mode=HTML.
+
+    Названия товаров, цвета и размеры повторяются от сообщения к сообщению,
+    поэтому результат кэшируется.
+    """
+    return html.escape(value, quote=False)
+
+class Template:
+    """Шаблон сообщения, разобранный один раз при загрузке модуля.
+
+    Синтаксис - как у str.format: "{price:,}", "{rating:.1f}". Строковые
+    значения экранируются, "{name!h}" вставляет значение как есть.
+    """
+
+    __slots__ = ("source", "_steps")
+
+    def __init__(self, source: str):
+        self.source = source
+        steps: List[Tuple[str, Optional[str], str, bool]] = []
+        for literal, field, spec, conversion in string.Formatter().parse(source):
+            if conversion not in (None, RAW_CONVERSION):
+                raise ValueError(f"Unsupported conversion !{conversion} in template: {source!r}")
+            steps.append((literal, field, spec or "", conversion == RAW_CONVERSION))
+        self._steps = tuple(steps)
+
+    def render_to(self, out: List[str], values: Dict[str, Any]) -> None:
+        """Дописать части сообщения в out (для сборки длинных сообщений одним join)"""
+        append = out.append
+        for literal, field, spec, raw in self._steps:
+            if literal:
+                append(literal)
+            if field is None:
+                continue
+            value = values[field]
+            if raw:
+                append(value)
+            elif isinstance(value, str):
+                append(escape(format(value, spec) if spec else value))
+            else:
+                append(format(value, spec))
+
+    def render(self, **values: Any) -> str:
+        out: List[str] = []
+        self.render_to(out, values)
+        return "".join(out)
+
+# Шаблоны компилируются один раз для каждого языка
+TEMPLATES: Dict[str, Dict[str, Template]] = {
+    language: {name: Template(source) for name, source in texts.items()}
+    for language, texts in MESSAGE_TEXTS.items()
+}
+
+def get_template(name: str, language: Optional[str] = None) -> Template:
+    """Шаблон на языке пользователя; если перевода нет - на русском"""
+    templates = TEMPLATES.get(language or DEFAULT_LANGUAGE) or TEMPLATES[DEFAULT_LANGUAGE]
+    template = templates.get(name)
+    if template is None:
+        template = TEMPLATES[DEFAULT_LANGUAGE][name]
+    return template
+
+def render(name: str, language: Optional[str] = None, **values: Any) -> str:
+    """Отрендерить шаблон name на языке language"""
+    return get_template(name, language).render(**values)